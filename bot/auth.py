@@ -4,23 +4,28 @@ from typing import Optional
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from bot.services.roles import get_allowed_ids, get_admin_ids, get_allowed_map
+from bot.services.roles import AuthSnapshot, get_auth_snapshot, peek_auth_snapshot
+from bot.services.async_storage import run_blocking
 
 def auth_is_locked() -> bool:
     """
     Si FORCE_LOCK=1, el bot SIEMPRE está bloqueado (requiere whitelist),
     incluso si no hay admins/allowed en hojas/entorno.
     """
-    import os
-    if os.environ.get("FORCE_LOCK", "0").strip() == "1":
-        return True
-    return bool(get_admin_ids() or get_allowed_ids())
+    return get_auth_snapshot().locked
+
+async def _auth_snapshot() -> AuthSnapshot:
+    # Sin salir del event loop mientras la cache de las hojas esté vigente
+    snap = peek_auth_snapshot()
+    if snap is None:
+        snap = await run_blocking(get_auth_snapshot)
+    return snap
 
 def get_display_for_uid(uid: int, update: Optional[Update] = None) -> str:
     """Nombre para mostrar: primero Sheet (Usuarios permitidos/Admins), luego username/full_name si está en el update, sino uid."""
-    m = get_allowed_map()
-    if uid in m and m[uid]:
-        return m[uid]
+    name = get_auth_snapshot().names.get(uid)
+    if name:
+        return name
     if update and update.effective_user:
         u = update.effective_user
         if u.username:
@@ -29,15 +34,28 @@ def get_display_for_uid(uid: int, update: Optional[Update] = None) -> str:
             return u.full_name
     return str(uid)
 
+def owner_label(update: Update) -> str:
+    """Etiqueta de dueño para reservas: "<uid> (<nombre>)", igual desde el menú y desde /get_pendientes."""
+    uid = update.effective_user.id if update.effective_user else None
+    if uid is None:
+        return "Sin usuario"
+    uid_str = str(uid)
+    display = get_display_for_uid(uid, update) or ""
+    return f"{uid_str} ({display})" if display and display != uid_str else uid_str
+
+def _is_allowed(uid: Optional[int]) -> bool:
+    # Si no hay nadie configurado, no restringimos (modo desarrollo)
+    return get_auth_snapshot().decide(uid)[0]
+
+def _is_admin(uid: Optional[int]) -> bool:
+    return get_auth_snapshot().decide(uid)[1]
+
 def require_auth(fn):
     @wraps(fn)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        # Si no hay nadie configurado, no restringimos (modo desarrollo)
-        if not auth_is_locked():
-            return await fn(update, context, *args, **kwargs)
         u = update.effective_user
         uid = u.id if u else None
-        if uid is None or uid not in get_allowed_ids():
+        if not (await _auth_snapshot()).decide(uid)[0]:
             try:
                 if getattr(update, "callback_query", None):
                     await update.callback_query.answer("⛔ Acceso denegado", show_alert=True)
@@ -57,7 +75,7 @@ def require_admin(fn):
     @wraps(fn)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         u = update.effective_user
-        if not (u and u.id in get_admin_ids()):
+        if not (await _auth_snapshot()).decide(u.id if u else None)[1]:
             try:
                 if getattr(update, "callback_query", None):
                     await update.callback_query.answer("⛔ Solo administradores", show_alert=True)
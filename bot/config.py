@@ -17,7 +17,8 @@ logging.basicConfig(
 )
 
 # CSV headers and indices
-CSV_HEADERS = ["Nombre", "Apellido", "Teléfono", "DNI", "Estado", "Observación"]
+# ID: identificador estable de cada contacto, lo asigna el bot (columna oculta en la hoja)
+CSV_HEADERS = ["Nombre", "Apellido", "Teléfono", "DNI", "Estado", "Observación", "ID"]
 IDX = {h: i for i, h in enumerate(CSV_HEADERS)}
 
 # Google Contacts export headers
@@ -33,6 +34,46 @@ GOOGLE_HEADERS = [
 # Storage configuration
 CSV_DEFAULT = os.environ.get("LISTA_CSV", "lista.csv").strip() or "lista.csv"
 USE_SHEETS = os.environ.get("USE_SHEETS", "1").strip() != "0"
+# Backend de la lista: sheets | csv | sqlite (por defecto según USE_SHEETS)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "").strip().lower() or ("sheets" if USE_SHEETS else "csv")
+SQLITE_PATH = os.environ.get("LISTA_SQLITE", "lista.db").strip() or "lista.db"
+# Hilos para I/O de almacenamiento y updates procesados en paralelo (usuarios distintos)
+STORAGE_WORKERS = int(os.environ.get("STORAGE_WORKERS", "8"))
+CONCURRENT_UPDATES = int(os.environ.get("CONCURRENT_UPDATES", "32"))
+# Ventana (segundos) para agrupar escrituras a Sheets en un batch_update; 0 = escribir al instante
+SHEETS_WRITE_WINDOW = float(os.environ.get("SHEETS_WRITE_WINDOW", "0.5"))
+# Backend CSV: fsync agrupado del journal (segundos) y cantidad de registros que dispara la compactación
+CSV_JOURNAL_FSYNC_WINDOW = float(os.environ.get("CSV_JOURNAL_FSYNC_WINDOW", "0.05"))
+CSV_JOURNAL_COMPACT_AT = int(os.environ.get("CSV_JOURNAL_COMPACT_AT", "1000"))
+# Reservas "En contacto": duración del lease (minutos; 0 = no vencen) y cada cuánto se barren (segundos)
+RESERVATION_LEASE_MINUTES = float(os.environ.get("RESERVATION_LEASE_MINUTES", "30"))
+RESERVATION_SWEEP_SECONDS = float(os.environ.get("RESERVATION_SWEEP_SECONDS", "60"))
+# Cada cuánto se releen las hojas de roles en segundo plano (segundos)
+ROLES_REFRESH_SECONDS = float(os.environ.get("ROLES_REFRESH_SECONDS", os.environ.get("SHEETS_CACHE_TTL", "30")))
+# Límite de clics por usuario (token bucket: FLOOD_RATE por segundo, ráfaga de FLOOD_BURST; 0 = sin límite)
+# y segundos de silencio para usuarios no autorizados después del primer "Acceso denegado"
+FLOOD_RATE = float(os.environ.get("FLOOD_RATE", "2"))
+FLOOD_BURST = int(os.environ.get("FLOOD_BURST", "10"))
+FLOOD_DENY_COOLDOWN = float(os.environ.get("FLOOD_DENY_COOLDOWN", "600"))
+# Salida hacia Telegram: mensajes por segundo (global y por chat privado, con ráfaga), por minuto en grupos,
+# llamadas simultáneas a la Bot API y reintentos ante RetryAfter
+OUTBOUND_GLOBAL_RATE = float(os.environ.get("OUTBOUND_GLOBAL_RATE", "25"))
+OUTBOUND_CHAT_RATE = float(os.environ.get("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.environ.get("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GROUP_PER_MINUTE = float(os.environ.get("OUTBOUND_GROUP_PER_MINUTE", "20"))
+OUTBOUND_MAX_CONCURRENT = int(os.environ.get("OUTBOUND_MAX_CONCURRENT", "16"))
+OUTBOUND_MAX_RETRIES = int(os.environ.get("OUTBOUND_MAX_RETRIES", "3"))
+# Difusiones: archivo con el progreso (para retomar tras un reinicio) y envíos en paralelo por tanda
+BROADCAST_STATE = os.environ.get("BROADCAST_STATE", "broadcast_state.json").strip() or "broadcast_state.json"
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", "8"))
+# Si una tanda falla: reintentos con espera exponencial desde BROADCAST_RETRY_SECONDS; agotados, queda 'failed'
+BROADCAST_MAX_ATTEMPTS = int(os.environ.get("BROADCAST_MAX_ATTEMPTS", "5"))
+BROADCAST_RETRY_SECONDS = float(os.environ.get("BROADCAST_RETRY_SECONDS", "30"))
+# Exportaciones: tamaño (bytes) a partir del cual se envían en .zip (0 = nunca) y máximo en memoria antes de pasar a disco
+EXPORT_COMPRESS_OVER = int(os.environ.get("EXPORT_COMPRESS_OVER", "2000000"))
+EXPORT_SPOOL_MAX = int(os.environ.get("EXPORT_SPOOL_MAX", str(16 * 1024 * 1024)))
+# Exportaciones delta: archivo con la marca de cada usuario y la huella de cada fila (sobrevive a reinicios)
+EXPORT_STATE = os.environ.get("EXPORT_STATE", "export_state.json").strip() or "export_state.json"
 
 # Sheets tabs for roles
 SHEET_ALLOWED = os.environ.get("SHEET_ALLOWED", "Usuarios permitidos").strip() or "Usuarios permitidos"
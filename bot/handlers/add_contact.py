@@ -3,7 +3,8 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKe
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, CommandHandler, filters
 
 from bot.states import ADD_NOMBRE, ADD_APELLIDO, ADD_TELEFONO, ADD_DNI, ADD_ESTADO, ADD_CANCEL_CONFIRM
-from bot.services.lista import _clean_phone, append_contact_any
+from bot.services.contact import _clean_phone
+from bot.services.async_storage import run_blocking, aappend_contact_any
 from bot.utils.pagination import _format_persona
 
 # Import menu to allow returning to it
@@ -82,7 +83,7 @@ async def _finalize_new_contact(update: Update, context: ContextTypes.DEFAULT_TY
         estado,
         observacion,
     ]
-    result = append_contact_any(row)
+    result = await aappend_contact_any(row)
     verb = "actualizado" if result == "updated" else "agregado"
     message = update.effective_message
 
@@ -113,7 +114,7 @@ async def on_cancel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     q = update.callback_query
     await q.answer()
     if q.data == "CANCEL:CONFIRM":
-        release_reservation(context)
+        await run_blocking(release_reservation, context)
         await cmd_menu(update, context)
         return ConversationHandler.END
     else:
@@ -4,11 +4,22 @@ from telegram.ext import ContextTypes, ConversationHandler
 from bot.auth import require_admin
 from bot.states import ADM_ADD_ID, ADM_DEL_ID, ADM_ADM_ADD_ID, ADM_ADM_DEL_ID
 from bot.config import SHEET_ALLOWED, SHEET_ADMINS
-from bot.services.roles import _append_id_name_to_sheet, _remove_id_from_sheet
+from bot.services.async_storage import run_blocking, aappend_id_name_to_sheet, aremove_id_from_sheet
+from bot.services.importer import import_contacts
+from bot.services import broadcast
+from bot.handlers.jobs import schedule_broadcast, broadcast_summary
 
 
 ADMIN_BACK_KB = InlineKeyboardMarkup([[InlineKeyboardButton("↩️ Volver al panel", callback_data="MENU:ADMIN")]])
 
+IMPORT_HELP = (
+    "📥 *Importar contactos*\n\n"
+    "Mandá un archivo `.csv` o `.xlsx` a este chat. La primera fila debe tener los "
+    "encabezados: Nombre, Apellido, Teléfono, DNI y, opcionalmente, Estado y Observación.\n"
+    "Se actualizan los contactos que ya existen (mismo Teléfono o DNI) y se agregan los nuevos "
+    "como *Pendiente*."
+)
+
 @require_admin
 async def admin_add_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
@@ -68,6 +79,7 @@ async def admin_cancel_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("👥 Ver usuarios permitidos", callback_data="ADMIN:LIST")],
         [InlineKeyboardButton("➕ Agregar ID usuarios permitidos", callback_data="ADMIN:ADD")],
         [InlineKeyboardButton("➖ Quitar ID usuarios permitidos", callback_data="ADMIN:DEL")],
+        [InlineKeyboardButton("📥 Importar contactos", callback_data="ADMIN:IMPORT")],
         [InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")],
     ]
     await q.message.reply_text("🔐 Panel de administración", reply_markup=InlineKeyboardMarkup(kb))
@@ -85,7 +97,7 @@ async def admin_add_id_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ADM_ADD_ID
     uid = int(parts[0])
     name = " ".join(parts[1:]).strip() if len(parts) > 1 else ""
-    _append_id_name_to_sheet(SHEET_ALLOWED, uid, name)
+    await aappend_id_name_to_sheet(SHEET_ALLOWED, uid, name)
     shown = f"{uid} - {name}" if name else str(uid)
     await update.message.reply_text(f"✅ Agregado a usuarios permitidos: {shown}", reply_markup=ADMIN_BACK_KB)
     return ConversationHandler.END
@@ -97,7 +109,7 @@ async def admin_del_id_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Debe ser un número. Probá otra vez o tocá *Cancelar*.", parse_mode="Markdown")
         return ADM_DEL_ID
     uid = int(text)
-    ok = _remove_id_from_sheet(SHEET_ALLOWED, uid)
+    ok = await aremove_id_from_sheet(SHEET_ALLOWED, uid)
     if ok:
         await update.message.reply_text(f"✅ Quitado de usuarios permitidos: {uid}", reply_markup=ADMIN_BACK_KB)
     else:
@@ -116,7 +128,7 @@ async def admin_add_admin_text(update: Update, context: ContextTypes.DEFAULT_TYP
         return ADM_ADM_ADD_ID
     uid = int(parts[0])
     name = " ".join(parts[1:]).strip() if len(parts) > 1 else ""
-    _append_id_name_to_sheet(SHEET_ADMINS, uid, name)
+    await aappend_id_name_to_sheet(SHEET_ADMINS, uid, name)
     shown = f"{uid} - {name}" if name else str(uid)
     await update.message.reply_text(f"✅ Agregado a Admins: {shown}", reply_markup=ADMIN_BACK_KB)
     return ConversationHandler.END
@@ -128,10 +140,78 @@ async def admin_del_admin_text(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("⚠️ Debe ser un número. Probá de nuevo.")
         return ADM_ADM_DEL_ID
     uid = int(text)
-    ok = _remove_id_from_sheet(SHEET_ADMINS, uid)
+    ok = await aremove_id_from_sheet(SHEET_ADMINS, uid)
     if ok:
         await update.message.reply_text(f"✅ Quitado de Admins: {uid}", reply_markup=ADMIN_BACK_KB)
     else:
         await update.message.reply_text(f"ℹ️ El ID {uid} no estaba en Admins.", reply_markup=ADMIN_BACK_KB)
     return ConversationHandler.END
 
+
+@require_admin
+async def on_import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    doc = update.message.document
+    name = doc.file_name or ""
+    if not name.lower().endswith((".csv", ".xlsx")):
+        return await update.message.reply_text("⚠️ Mandá un archivo .csv o .xlsx.")
+    await update.message.reply_text(f"⏳ Importando {name}…")
+    tg_file = await doc.get_file()
+    data = bytes(await tg_file.download_as_bytearray())
+    try:
+        result = await run_blocking(import_contacts, data, name)
+    except (ValueError, RuntimeError) as e:
+        return await update.message.reply_text(f"⚠️ {e}", reply_markup=ADMIN_BACK_KB)
+    lines = [
+        f"✅ Importación de {name}",
+        f"• nuevos: {result['new']}",
+        f"• actualizados: {result['updated']}",
+        f"• sin cambios: {result['unchanged']}",
+        f"• rechazados: {result['rejected']}",
+    ]
+    if result["errors"]:
+        lines += ["", "Rechazos:"] + [f"• {e}" for e in result["errors"]]
+        if result["rejected"] > len(result["errors"]):
+            lines.append(f"• … y {result['rejected'] - len(result['errors'])} más")
+    await update.message.reply_text("\n".join(lines), reply_markup=ADMIN_BACK_KB)
+
+
+BROADCAST_HELP = (
+    "Uso: /broadcast [todos|voluntarios|admins] <mensaje>\n"
+    "Por defecto va a todos los usuarios permitidos. En el mensaje podés usar "
+    "{nombre} y {user_id}.\n"
+    "Ej: /broadcast voluntarios Hola {nombre}, mañana abrimos a las 8."
+)
+
+@require_admin
+async def cmd_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = (update.message.text or "").split(None, 1)
+    body = text[1].strip() if len(text) > 1 else ""
+    audience = "todos"
+    first = body.split(None, 1)
+    if first and first[0].lower() in broadcast.AUDIENCES:
+        audience = first[0].lower()
+        body = first[1].strip() if len(first) > 1 else ""
+    if not body:
+        return await update.message.reply_text(BROADCAST_HELP)
+    try:
+        state = await run_blocking(broadcast.start_broadcast, body, audience, update.effective_chat.id)
+    except ValueError as e:
+        return await update.message.reply_text(f"⚠️ {e}")
+    schedule_broadcast(context.application)
+    await update.message.reply_text(
+        f"📣 Difusión a {len(state['recipients'])} destinatarios ({audience}) en marcha.\n"
+        "Te aviso cuando termine; /broadcast_status muestra el avance."
+    )
+
+@require_admin
+async def cmd_broadcast_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    state = await run_blocking(broadcast.load_state)
+    if not state:
+        return await update.message.reply_text("No hubo difusiones todavía.")
+    await update.message.reply_text(broadcast_summary(state))
+
+@require_admin
+async def cmd_broadcast_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if await run_blocking(broadcast.cancel_broadcast):
+        return await update.message.reply_text("🛑 Difusión cancelada; no se mandan más mensajes.")
+    await update.message.reply_text("No hay una difusión en curso.")
@@ -1,12 +1,29 @@
-from typing import List
+from typing import List, Optional
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
-from bot.auth import require_auth, get_display_for_uid
-from bot.config import CSV_HEADERS, IDX
-from bot.services.lista import read_lista_any, set_lista_any, filter_by_status, _pad_row
-from bot.services.exports import gen_contacts_any, gen_vcard_any
+from bot.auth import require_auth, require_admin, owner_label
+from bot.services.contact import Contact
+from bot.services.lista import lista_cache_stats
+from bot.services.snapshots import snapshot_stats
+from bot.utils.pagination import page_cache_stats
+from bot.utils.flood import flood_stats
+from bot.utils.ratelimit import BULK, outbound_stats
+from bot.services.estado import estado_cache_info
+from bot.services.async_storage import run_blocking, aread_lista_any, aread_by_status
+from bot.services.reservations import claim_pending, reservation_stats, lease_count
+from bot.services.exports import (
+    export_contacts_any,
+    export_vcard_any,
+    export_contacts_delta,
+    export_vcard_delta,
+    remember_file_id,
+    forget_file_id,
+    export_cache_stats,
+)
+from bot.services.export_marks import get_mark, set_mark
 
 
 
@@ -14,78 +31,119 @@ def _reply_with_menu(message, text):
     keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")]])
     return message.reply_text(text, reply_markup=keyboard)
 
-@require_auth
-async def cmd_get_lista(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rows = read_lista_any()
-    if not rows:
-        return await _reply_with_menu(update.message, "La lista está vacía.")
+async def _send_blocks(message, rows: List[Contact]):
+    """Manda la lista de a 20 filas por mensaje, como envío masivo (cede paso a los botones)."""
     block = []
     for i, r in enumerate(rows, 1):
-        r = _pad_row(r, len(CSV_HEADERS))
-        block.append(f"{r[IDX['Teléfono']]}: {r[IDX['Nombre']]}, {r[IDX['Apellido']]}")
+        block.append(f"{r.telefono}: {r.nombre}, {r.apellido}")
         if i % 20 == 0:
-            await update.message.reply_text("\n".join(block))
+            await message.reply_text("\n".join(block), rate_limit_args=BULK)
             block = []
     if block:
-        await update.message.reply_text("\n".join(block))
+        await message.reply_text("\n".join(block), rate_limit_args=BULK)
+
+@require_auth
+async def cmd_get_lista(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    rows = await aread_lista_any()
+    if not rows:
+        return await _reply_with_menu(update.message, "La lista está vacía.")
+    await _send_blocks(update.message, rows)
 
-async def _send_list_by_status(update: Update, rows: List[List[str]], titulo: str):
+async def _send_list_by_status(update: Update, rows: List[Contact], titulo: str):
     if not rows:
         return await _reply_with_menu(update.message, f"No hay personas {titulo.lower()}.")
     await update.message.reply_text(f"Esta es la lista de personas {titulo.lower()}:")
-    block = []
-    for i, r in enumerate(rows, 1):
-        r = _pad_row(r, len(CSV_HEADERS))
-        block.append(f"{r[IDX['Teléfono']]}: {r[IDX['Nombre']]}, {r[IDX['Apellido']]}")
-        if i % 20 == 0:
-            await update.message.reply_text("\n".join(block))
-            block = []
-    if block:
-        await update.message.reply_text("\n".join(block))
+    await _send_blocks(update.message, rows)
 
 @require_auth
 async def cmd_get_pendientes(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    all_rows = read_lista_any()
-    pendientes = filter_by_status(all_rows, "Pendiente")
-    if not pendientes:
+    if not await aread_by_status("Pendiente"):
+        return await _reply_with_menu(update.message, "No hay personas pendientes.")
+    who = await run_blocking(owner_label, update)
+    claimed = await run_blocking(claim_pending, who, 5)
+    if not claimed:
         return await _reply_with_menu(update.message, "No hay personas pendientes.")
-    uid = update.effective_user.id if update.effective_user else 0
-    who = get_display_for_uid(uid, update)
-    to_assign = pendientes[:5]
-    for r in to_assign:
-        # Modificar la fila original (referencia compartida con all_rows)
-        r[IDX["Estado"]] = f"En contacto - {who}"
-        r[IDX["Observación"]] = ""
-    set_lista_any(all_rows)
+    to_assign = [r for _, r in claimed]
     context.user_data["reserved_rows"] = to_assign
-    msg = "\n".join(f"{r[IDX['Teléfono']]}: {r[IDX['Nombre']]}, {r[IDX['Apellido']]}" for r in to_assign)
+    context.user_data["reserved_ids"] = [r.id for _, r in claimed]
+    context.user_data["reserved_owner"] = who
+    msg = "\n".join(f"{r.telefono}: {r.nombre}, {r.apellido}" for r in to_assign)
     await update.message.reply_text(f"Estos son tus pendientes asignados:\n\n{msg}")
 
 @require_auth
 async def cmd_get_aceptados(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rows = read_lista_any()
-    return await _send_list_by_status(update, filter_by_status(rows, "Aceptado"), "Aceptadas")
+    return await _send_list_by_status(update, await aread_by_status("Aceptado"), "Aceptadas")
 
 @require_auth
 async def cmd_get_rechazados(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rows = read_lista_any()
-    return await _send_list_by_status(update, filter_by_status(rows, "Rechazado"), "Rechazadas")
+    return await _send_list_by_status(update, await aread_by_status("Rechazado"), "Rechazadas")
+
+_EXPORTS = {
+    "contacts": (export_contacts_any, export_contacts_delta, (), "Google Contacts"),
+    "vcard": (export_vcard_any, export_vcard_delta, ("General",), "vCard"),
+}
+_DELTA_ARGS = {"nuevos", "delta", "cambios"}
+
+
+async def send_export(message, kind: str, uid: Optional[int] = None, delta: bool = False):
+    """
+    Manda la exportación como documento al chat de message: por file_id si la
+    misma ya se subió antes, si no generándola en memoria y subiéndola.
+
+    Con delta=True manda sólo lo nuevo o cambiado desde la última exportación
+    del usuario uid (la marca se guarda en disco con export_marks).
+    """
+    build, build_delta, args, titulo = _EXPORTS[kind]
+    since = await run_blocking(get_mark, uid, kind) if uid is not None else None
+    if delta and since is not None:
+        export = await run_blocking(build_delta, since, *args)
+        if not export.rows:
+            await run_blocking(set_mark, uid, kind, export.mark)
+            return await message.reply_text("No hay contactos nuevos ni modificados desde tu última exportación.")
+        sent = await _upload_export(message, export, f"{titulo} (nuevos o modificados): {export.rows} contactos")
+        await run_blocking(set_mark, uid, kind, export.mark)
+        return sent
+    export = await run_blocking(build, *args)
+    caption = f"{titulo}: {export.rows} contactos"
+    if delta:
+        caption += " (primera exportación: va la lista completa)"
+    sent = await _send_full_export(message, export, caption, build, args)
+    if uid is not None:
+        await run_blocking(set_mark, uid, kind, export.mark)
+    return sent
+
+
+async def _send_full_export(message, export, caption, build, args):
+    if export.file_id:
+        try:
+            return await message.reply_document(document=export.file_id, caption=caption)
+        except BadRequest:
+            forget_file_id(export)
+            export = await run_blocking(build, *args)
+    sent = await _upload_export(message, export, caption)
+    if sent.document:
+        remember_file_id(export, sent.document.file_id)
+    return sent
+
+
+async def _upload_export(message, export, caption):
+    if export.filename.endswith(".zip"):
+        caption += " (comprimido)"
+    with export.file:
+        export.file.seek(0)
+        return await message.reply_document(document=InputFile(export.file, filename=export.filename), caption=caption)
 
 @require_auth
 async def cmd_gen_contacts(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    import os
-    out = os.path.join("export", "contacts.csv")
-    os.makedirs("export", exist_ok=True)
-    gen_contacts_any(out)
-    await update.message.reply_text(f"Archivo escrito: {out}")
+    """/gen_contacts [nuevos]"""
+    delta = bool(context.args) and context.args[0].lower() in _DELTA_ARGS
+    await send_export(update.message, "contacts", update.effective_user.id, delta=delta)
 
 @require_auth
 async def cmd_vcard(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    import os
-    out = os.path.join("export", "lista.vcf")
-    os.makedirs("export", exist_ok=True)
-    gen_vcard_any(out, etiqueta="General")
-    await update.message.reply_text(f"Archivo escrito: {out}")
+    """/vcard [nuevos]"""
+    delta = bool(context.args) and context.args[0].lower() in _DELTA_ARGS
+    await send_export(update.message, "vcard", update.effective_user.id, delta=delta)
 
 @require_auth
 async def cmd_whoami(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -94,3 +152,59 @@ async def cmd_whoami(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await update.message.reply_text("No se pudo determinar tu usuario.")
     name = u.full_name or (f"@{u.username}" if u.username else "")
     await update.message.reply_text(f"Tu user_id: {u.id}\nNombre: {name}")
+
+@require_admin
+async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    r = reservation_stats()
+    c = lista_cache_stats()
+    s = snapshot_stats()
+    p = page_cache_stats()
+    e = estado_cache_info()
+    x = export_cache_stats()
+    f = flood_stats()
+    o = outbound_stats()
+    lines = [
+        "📊 Métricas desde el último arranque",
+        "",
+        "Reservas:",
+        f"• pedidos de tanda: {r['requests']}",
+        f"• filas intentadas / ganadas: {r['attempted']} / {r['claimed']}",
+        f"• conflictos (otro voluntario ganó la fila): {r['conflicts']}",
+        f"• reintentos: {r['retries']}",
+        f"• liberadas: {r['released']}",
+        f"• vencidas por lease: {r['expired']} (leases activos: {lease_count()})",
+        "",
+        "Cache de la lista:",
+        f"• aciertos / fallos: {c['hits']} / {c['misses']}",
+        f"• servidas vencidas (SWR): {c['stale']}",
+        f"• recargas del backend: {c['reloads']}",
+        f"• revalidaciones solo de Estado (Sheets): {c['estado_refreshes']}",
+        "",
+        "Snapshots compartidos:",
+        f"• vivos: {s['snapshots']} ({s['rows']} filas)",
+        f"• sesiones que los referencian: {s['refs']}",
+        "",
+        "Páginas renderizadas:",
+        f"• aciertos / fallos: {p['hits']} / {p['misses']}",
+        f"• en cache / descartadas: {p['size']} / {p['evictions']}",
+        "",
+        "Estados analizados:",
+        f"• aciertos / fallos: {e.hits} / {e.misses}",
+        f"• valores distintos: {e.currsize}",
+        "",
+        "Exportaciones:",
+        f"• reenviadas por file_id: {x['hits']}",
+        f"• generadas / con contenido idéntico al anterior: {x['generated']} / {x['same_content']}",
+        "",
+        "Control de floods:",
+        f"• updates que pasaron: {f['passed']}",
+        f"• frenados por exceso de clics: {f['throttled']}",
+        f"• no autorizados avisados / descartados en silencio: {f['denied']} / {f['denied_dropped']}",
+        f"• usuarios silenciados ahora: {f['silenced']}",
+        "",
+        "Envíos a Telegram:",
+        f"• enviados / demorados por los límites: {o['sent']} / {o['delayed']}",
+        f"• masivos: {o['bulk']}",
+        f"• RetryAfter recibidos: {o['retry_after']}",
+    ]
+    await update.message.reply_text("\n".join(lines))
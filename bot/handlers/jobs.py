@@ -0,0 +1,103 @@
+import asyncio
+import logging
+
+from telegram.error import Forbidden, TelegramError
+from telegram.ext import ContextTypes
+
+from bot.config import BROADCAST_CONCURRENCY, BROADCAST_MAX_ATTEMPTS, BROADCAST_RETRY_SECONDS
+from bot.services import broadcast
+from bot.services.async_storage import run_blocking, aget_allowed_map
+from bot.services.reservations import expire_leases
+from bot.services.roles import refresh_roles
+from bot.utils.ratelimit import BULK
+
+
+async def sweep_reservations(context: ContextTypes.DEFAULT_TYPE):
+    """Job periódico: libera las reservas 'En contacto' cuyo lease venció."""
+    try:
+        await run_blocking(expire_leases)
+    except Exception:
+        logging.exception("Falló el barrido de reservas vencidas.")
+
+
+async def refresh_roles_job(context: ContextTypes.DEFAULT_TYPE):
+    """Job periódico: relee Admins y Usuarios permitidos sin que ningún update espere."""
+    try:
+        await run_blocking(refresh_roles)
+    except Exception:
+        logging.exception("Falló el refresco de roles; se sigue usando la copia anterior.")
+
+
+async def _broadcast_one(bot, uid: int, text: str) -> str:
+    try:
+        await bot.send_message(uid, text, rate_limit_args=BULK)
+        return "delivered"
+    except Forbidden:
+        # Bloqueó al bot o nunca le escribió
+        return "blocked"
+    except TelegramError as e:
+        logging.warning("Difusión: no se pudo enviar a %s: %s", uid, e)
+        return "failed"
+
+
+async def broadcast_job(context: ContextTypes.DEFAULT_TYPE):
+    await run_broadcast(context.bot)
+
+
+def schedule_broadcast(application) -> None:
+    """Lanza la difusión activa en segundo plano (JobQueue si está, si no una tarea suelta)."""
+    if application.job_queue is not None:
+        application.job_queue.run_once(broadcast_job, 0, name="broadcast")
+    else:
+        application.create_task(run_broadcast(application.bot))
+
+
+async def run_broadcast(bot):
+    """
+    Manda la difusión activa desde su cursor, de a BROADCAST_CONCURRENCY por tanda.
+    Si algo falla se reintenta desde el cursor con espera exponencial; agotados
+    BROADCAST_MAX_ATTEMPTS intentos la difusión queda 'failed' y se avisa al admin.
+    """
+    state = await run_blocking(broadcast.load_state)
+    if not state or state["status"] != "running":
+        return
+    to = state["recipients"]
+    for attempt in range(1, BROADCAST_MAX_ATTEMPTS + 1):
+        try:
+            await _send_from_cursor(bot, state)
+            break
+        except Exception:
+            if attempt >= BROADCAST_MAX_ATTEMPTS:
+                logging.exception("Difusión abandonada en %s/%s tras %s intentos.", state["cursor"], len(to), attempt)
+                await run_blocking(broadcast.fail_broadcast, state)
+                break
+            delay = BROADCAST_RETRY_SECONDS * 2 ** (attempt - 1)
+            logging.exception("Difusión interrumpida en %s/%s; reintento en %.0fs.", state["cursor"], len(to), delay)
+            await asyncio.sleep(delay)
+    try:
+        await bot.send_message(state["chat_id"], broadcast_summary(state))
+    except TelegramError:
+        logging.warning("No se pudo avisar el fin de la difusión al admin.")
+
+
+async def _send_from_cursor(bot, state: dict) -> None:
+    names = await aget_allowed_map()
+    to = state["recipients"]
+    while state["status"] == "running" and state["cursor"] < len(to):
+        batch = to[state["cursor"]:state["cursor"] + BROADCAST_CONCURRENCY]
+        results = await asyncio.gather(
+            *(_broadcast_one(bot, uid, broadcast.render(state["text"], uid, names)) for uid in batch)
+        )
+        await run_blocking(broadcast.record_batch, state, list(results))
+
+
+def broadcast_summary(state: dict) -> str:
+    titulo = {"running": "⏳ Difusión en curso", "done": "✅ Difusión terminada",
+              "cancelled": "🛑 Difusión cancelada", "failed": "⚠️ Difusión interrumpida por errores"}.get(state["status"], "Difusión")
+    return (
+        f"{titulo} ({state['audience']})\n"
+        f"• enviados: {state['cursor']}/{len(state['recipients'])}\n"
+        f"• entregados: {state['delivered']}\n"
+        f"• bloquearon el bot: {state['blocked']}\n"
+        f"• fallidos: {state['failed']}"
+    )
@@ -1,166 +1,56 @@
-from typing import List
-import os
+from typing import List, Sequence
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
 
-from bot.auth import require_auth, get_display_for_uid
-from bot.config import USE_SHEETS, CSV_DEFAULT, CSV_HEADERS, IDX
-from bot.services.roles import get_admin_ids, get_admins_map, get_allowed_map
-from bot.services.lista import read_lista_any, set_lista_any, filter_by_status, _pad_row
-from bot.services.exports import gen_contacts_any, gen_vcard_any
-from bot.utils.pagination import _chunk_rows, _format_persona
-from bot.handlers.edit import show_editable_list, release_reservation
-
-
-def _current_user_label(update: Update) -> str:
-    uid = update.effective_user.id if update.effective_user else None
-    if uid is None:
-        return "Sin usuario"
-    uid_str = str(uid)
-    display = get_display_for_uid(uid, update) or ""
-    return f"{uid_str} ({display})" if display and display != uid_str else uid_str
-
-
-def _row_key(row):
-    padded = _pad_row(row, len(CSV_HEADERS))
-    return {"tel": padded[IDX["Teléfono"]].strip(), "dni": padded[IDX["DNI"]].strip()}
-
-
-def _matches_key(row, key) -> bool:
-    if not key:
-        return False
-    padded = _pad_row(row, len(CSV_HEADERS))
-    tel = padded[IDX["Teléfono"]].strip()
-    dni = padded[IDX["DNI"]].strip()
-    key_tel = (key.get("tel") or "").strip()
-    key_dni = (key.get("dni") or "").strip()
-    if key_tel and tel == key_tel:
-        return True
-    if key_dni and dni == key_dni:
-        return True
-    return False
-
-
-def _filter_rows_by_estado(rows, estado):
-    filtered = []
-    for idx, row in enumerate(rows):
-        padded = _pad_row(row, len(CSV_HEADERS))
-        if padded[IDX["Estado"]] == estado:
-            filtered.append((idx, padded))
-    return filtered
-
-
-def _reserve_estado_for_user(update: Update, context: ContextTypes.DEFAULT_TYPE, estado: str, limit: int = 5):
-    all_rows = read_lista_any()
-    matches = _filter_rows_by_estado(all_rows, estado)
-    if not matches:
-        return []
-    selected = []
-    for abs_idx, _ in matches[:limit]:
-        padded = _pad_row(all_rows[abs_idx], len(CSV_HEADERS))
-        padded[IDX["Estado"]] = f"En contacto - {_current_user_label(update)}"
-        padded[IDX["Observación"]] = ""
-        all_rows[abs_idx] = padded
-        selected.append(padded)
-    set_lista_any(all_rows)
-    context.user_data["reserved_rows"] = selected
-    context.user_data["reserved_owner"] = _current_user_label(update)
-    return selected
-
-    if not key:
-        return False
-    padded = _pad_row(row, len(CSV_HEADERS))
-    tel = padded[IDX["Teléfono"]].strip()
-    dni = padded[IDX["DNI"]].strip()
-    key_tel = (key.get("tel") or "").strip()
-    key_dni = (key.get("dni") or "").strip()
-    if key_tel and tel == key_tel:
-        return True
-    if key_dni and dni == key_dni:
-        return True
-    return False
-
-
-def _pending_positions(all_rows: List[List[str]]):
-    positions = []
-    for idx, row in enumerate(all_rows):
-        padded = _pad_row(row, len(CSV_HEADERS))
-        if padded[IDX["Estado"]] == "Pendiente":
-            positions.append((idx, padded))
-    return positions
-
-
-def _reserve_pendientes_for_user(update: Update, context: ContextTypes.DEFAULT_TYPE, limit: int = 5) -> List[List[str]]:
-    preferred_indices = context.user_data.get("pending_preview_indices") or []
-    preferred_keys = context.user_data.get("pending_preview_keys") or []
-    all_rows = read_lista_any()
-    pending_positions = _pending_positions(all_rows)
-    if not pending_positions:
-        return []
-    max_items = min(limit, len(pending_positions)) if limit else len(pending_positions)
-    selected_indices: List[int] = []
-    used = set()
-
-    def try_add_index(abs_idx: int) -> bool:
-        if abs_idx in used or not (0 <= abs_idx < len(all_rows)):
-            return False
-        padded = _pad_row(all_rows[abs_idx], len(CSV_HEADERS))
-        if padded[IDX["Estado"]] != "Pendiente":
-            return False
-        used.add(abs_idx)
-        selected_indices.append(abs_idx)
-        return True
-
-    for abs_idx in preferred_indices:
-        if len(selected_indices) >= max_items:
-            break
-        try_add_index(abs_idx)
-
-    if len(selected_indices) < max_items and preferred_keys:
-        for key in preferred_keys:
-            if len(selected_indices) >= max_items:
-                break
-            for abs_idx, row in pending_positions:
-                if abs_idx in used:
-                    continue
-                if _matches_key(row, key) and try_add_index(abs_idx):
-                    break
-
-    if len(selected_indices) < max_items:
-        for abs_idx, _ in pending_positions:
-            if len(selected_indices) >= max_items:
-                break
-            try_add_index(abs_idx)
-
-    if not selected_indices:
+from bot.auth import require_auth, owner_label
+from bot.config import STORAGE_BACKEND, SQLITE_PATH, CSV_DEFAULT
+from bot.services.contact import Contact
+from bot.services.lista import read_positions_by_status, get_contact_store
+from bot.services.reservations import claim_pending
+from bot.services.snapshots import open_view, share_view, view_rows, view_key, close_view
+from bot.services.async_storage import (
+    run_blocking,
+    aget_admin_ids,
+    aget_admins_map,
+    aget_allowed_map,
+)
+from bot.utils.pagination import _format_persona, _page_bounds, cached_page
+from bot.handlers.commands import send_export
+from bot.handlers.edit import show_editable_list, release_reservation, _active_reserved_rows
+
+
+def _pending_positions():
+    return read_positions_by_status("Pendiente")
+
+
+def _reserve_pendientes_for_user(update: Update, context: ContextTypes.DEFAULT_TYPE, limit: int = 5) -> List[Contact]:
+    # La tanda que se le mostró, por ID: sigue valiendo aunque las filas se hayan movido
+    preferred = get_contact_store().positions_of(context.user_data.get("pending_preview_ids") or ())
+
+    who = owner_label(update)
+    claimed = claim_pending(who, limit=limit, preferred=preferred)
+    if not claimed:
         return []
 
-    who = _current_user_label(update)
     context.user_data["reserved_owner"] = who
-    selected_rows: List[List[str]] = []
-    for abs_idx in selected_indices:
-        padded = _pad_row(all_rows[abs_idx], len(CSV_HEADERS))
-        padded[IDX["Estado"]] = f"En contacto - {who}"
-        padded[IDX["Observación"]] = ""
-        all_rows[abs_idx] = padded
-        selected_rows.append(padded)
-
-    set_lista_any(all_rows)
+    selected_rows: List[Contact] = [row for _, row in claimed]
     context.user_data["reserved_rows"] = selected_rows
-    context.user_data["reserved_indices"] = selected_indices
-    context.user_data.pop("pending_preview_keys", None)
+    context.user_data["reserved_ids"] = [row.id for _, row in claimed]
     context.user_data.pop("pending_preview_limit", None)
-    context.user_data.pop("pending_preview_indices", None)
+    context.user_data.pop("pending_preview_ids", None)
     return selected_rows
 
 
 @require_auth
 async def cmd_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # al volver al menú, devolvemos reservas sin procesar
-    release_reservation(context)
-    backend = "Google Sheets" if USE_SHEETS else f"CSV ({CSV_DEFAULT})"
+    await run_blocking(release_reservation, context)
+    # y soltamos las vistas de lista/editor para que sus snapshots puedan descartarse
+    close_view(context.user_data, "list_view")
+    close_view(context.user_data, "edit_view")
+    backend = {"sheets": "Google Sheets", "sqlite": f"SQLite ({SQLITE_PATH})"}.get(STORAGE_BACKEND, f"CSV ({CSV_DEFAULT})")
 
     kb = [
         [InlineKeyboardButton("📋 Ver lista", callback_data="MENU:LISTA")],
@@ -175,7 +65,7 @@ async def cmd_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("➕ Agregar Nuevo Contacto", callback_data="MENU:ADD")],    ]
 
     # Panel admin solo para admins
-    if update.effective_user and update.effective_user.id in get_admin_ids():
+    if update.effective_user and update.effective_user.id in await aget_admin_ids():
         kb.append([InlineKeyboardButton("🔐 Administración", callback_data="MENU:ADMIN")])
 
     text = f"Bienvenido!!"
@@ -195,7 +85,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @require_auth
 async def on_menu_home(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    release_reservation(context)
+    await run_blocking(release_reservation, context)
     return await cmd_menu(update, context)
 
 @require_auth
@@ -204,42 +94,55 @@ async def on_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await q.answer()
     _, page_str = q.data.split(":", 1)
     page = int(page_str)
-    rows = context.user_data.get("list_rows", [])
+    rows = view_rows(context.user_data, "list_view")
     title = context.user_data.get("list_title", "Resultados")
     size = context.user_data.get("list_page_size", 10)
     if not rows:
         return await q.edit_message_text("No hay datos para paginar.")
     return await show_rows_with_pagination(
-        q, context, rows, title, page, size, allow_edit=context.user_data.get("list_allow_edit", True)
+        q, context, rows, title, page, size, allow_edit=context.user_data.get("list_allow_edit", True),
+        cache_key=view_key(context.user_data, "list_view"),
     )
 
-async def start_list_pagination(q, context, rows: List[List[str]], title: str, page_size=10, page=0, allow_edit=True):
-    context.user_data["list_rows"] = rows
+async def start_list_pagination(q, context, title: str, estado=None, page_size=10, page=0, allow_edit=True):
+    """Abre una vista compartida de la lista (completa o de un Estado) y muestra la página."""
+    rows = await run_blocking(open_view, context.user_data, "list_view", estado)
     context.user_data["list_title"] = title
     context.user_data["list_page_size"] = page_size
     context.user_data["list_allow_edit"] = allow_edit
-    return await show_rows_with_pagination(q, context, rows, title, page, page_size, allow_edit=allow_edit)
+    return await show_rows_with_pagination(
+        q, context, rows, title, page, page_size, allow_edit=allow_edit,
+        cache_key=view_key(context.user_data, "list_view"),
+    )
 
-async def show_rows_with_pagination(q, context, rows: List[List[str]], title="Resultados", page=0, page_size=10, allow_edit=True):
-    if not rows:
-        kb = InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")]])
-        return await q.edit_message_text(f"Sin resultados en *{title}*.", reply_markup=kb, parse_mode="Markdown")
-    pages = list(_chunk_rows(rows, page_size))
-    page = max(0, min(page, len(pages)-1))
-    body = [_format_persona(r) for r in pages[page]]
+def _render_list_page(rows: Sequence[Contact], title: str, page: int, pages: int, start: int, page_size: int, allow_edit: bool):
+    body = [_format_persona(r) for r in rows[start:start + page_size]]
     kb = []
     if page > 0:
         kb.append(InlineKeyboardButton("⬅️ Anterior", callback_data=f"PAGE:{page-1}"))
-    if page < len(pages)-1:
+    if page < pages-1:
         kb.append(InlineKeyboardButton("Siguiente ➡️", callback_data=f"PAGE:{page+1}"))
     nav = [kb] if kb else []
     if allow_edit:
         # Botón para editar un contacto puntual de la lista actual
         nav.append([InlineKeyboardButton("✏️ Editar estado de un contacto", callback_data=f"LISTEDIT:{page}")])
     nav.append([InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")])
-    text = f"*{title}* (página {page+1}/{len(pages)}):\n\n" + "\n".join(body)
+    text = f"*{title}* (página {page+1}/{pages}):\n\n" + "\n".join(body)
+    return text, InlineKeyboardMarkup(nav)
+
+async def show_rows_with_pagination(q, context, rows: Sequence[Contact], title="Resultados", page=0, page_size=10,
+                                    allow_edit=True, cache_key=None):
+    """cache_key (view_key de la vista mostrada) habilita el cache de páginas renderizadas."""
+    if not rows:
+        kb = InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")]])
+        return await q.edit_message_text(f"Sin resultados en *{title}*.", reply_markup=kb, parse_mode="Markdown")
+    page, pages, start = _page_bounds(len(rows), page, page_size)
+    text, markup = cached_page(
+        None if cache_key is None else ("list", cache_key, title, page_size, page, allow_edit),
+        lambda: _render_list_page(rows, title, page, pages, start, page_size, allow_edit),
+    )
     try:
-        return await q.edit_message_text(text, reply_markup=InlineKeyboardMarkup(nav), parse_mode="Markdown")
+        return await q.edit_message_text(text, reply_markup=markup, parse_mode="Markdown")
     except BadRequest as exc:
         if "Message is not modified" in str(exc):
             return None
@@ -254,23 +157,25 @@ async def on_list_edit_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
         page = int(page_str)
     except Exception:
         page = 0
-    rows = context.user_data.get("list_rows", [])
     title = context.user_data.get("list_title", "Resultados")
     if not context.user_data.get("list_allow_edit", True):
         kb = [[InlineKeyboardButton("Volver al menu", callback_data="MENU:HOME")]]
         return await q.edit_message_text("Esta lista es solo de lectura.", reply_markup=InlineKeyboardMarkup(kb))
     # Configurar el editor con la lista completa y el tamaño de página usado en la vista de lista
-    context.user_data["edit_base_rows"] = rows
+    rows = share_view(context.user_data, "list_view", "edit_view")
     context.user_data["edit_page_size"] = context.user_data.get("list_page_size", 10)
     context.user_data["edit_page"] = page
     context.user_data["edit_source"] = "list"
     context.user_data["edit_title"] = f"Cambiar estado (Lista: {title})"
-    return await show_editable_list(q, context, rows, title=context.user_data["edit_title"], page=page, page_size=context.user_data["edit_page_size"])
+    return await show_editable_list(
+        q, context, rows, title=context.user_data["edit_title"], page=page,
+        page_size=context.user_data["edit_page_size"], cache_key=view_key(context.user_data, "edit_view"),
+    )
 
 @require_auth
 async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from bot.handlers.admin import (
-        admin_add_start, admin_del_start, admin_add_admin_start, admin_del_admin_start
+        admin_add_start, admin_del_start, admin_add_admin_start, admin_del_admin_start, IMPORT_HELP
     )
     from bot.handlers.edit import (
         on_edit_page_callback, on_edit_pick_row, on_edit_set_state, send_reserved_vcf, send_reserved_as_contacts
@@ -284,7 +189,7 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await on_menu_home(update, context)
 
     if data == "MENU:ADMIN":
-        if not (update.effective_user and update.effective_user.id in get_admin_ids()):
+        if not (update.effective_user and update.effective_user.id in await aget_admin_ids()):
             return await q.edit_message_text("⛔ Solo administradores.")
         kb = [
             [InlineKeyboardButton("👑 Ver Admins", callback_data="ADMIN:ADM_LIST")],
@@ -293,15 +198,16 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             [InlineKeyboardButton("👥 Ver usuarios permitidos", callback_data="ADMIN:LIST")],
             [InlineKeyboardButton("➕ Agregar ID usuarios permitidos", callback_data="ADMIN:ADD")],
             [InlineKeyboardButton("➖ Quitar ID usuarios permitidos", callback_data="ADMIN:DEL")],
+            [InlineKeyboardButton("📥 Importar contactos", callback_data="ADMIN:IMPORT")],
             [InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")],
         ]
         return await q.edit_message_text("🔐 Panel de administración", reply_markup=InlineKeyboardMarkup(kb))
 
     # --- Admins panel actions ---
     if data == "ADMIN:ADM_LIST":
-        if not (update.effective_user and update.effective_user.id in get_admin_ids()):
+        if not (update.effective_user and update.effective_user.id in await aget_admin_ids()):
             return await q.edit_message_text("⛔ Solo administradores.")
-        amap = get_admins_map()
+        amap = await aget_admins_map()
         if not amap:
             return await q.edit_message_text("No hay admins configurados.")
         lines = [f"• {uid} - {name}" if name else f"• {uid}" for uid, name in sorted(amap.items())]
@@ -316,9 +222,9 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- Usuarios permitidos panel actions ---
     if data == "ADMIN:LIST":
-        if not (update.effective_user and update.effective_user.id in get_admin_ids()):
+        if not (update.effective_user and update.effective_user.id in await aget_admin_ids()):
             return await q.edit_message_text("⛔ Solo administradores.")
-        amap = get_allowed_map()
+        amap = await aget_allowed_map()
         if not amap:
             return await q.edit_message_text("Usuarios permitidos vacio (el bot esta libre).")
         lines = [f"• {uid} - {name}" if name else f"• {uid}" for uid, name in sorted(amap.items())]
@@ -332,6 +238,12 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if data == "ADMIN:DEL":
         return await admin_del_start(update, context)
 
+    if data == "ADMIN:IMPORT":
+        if not (update.effective_user and update.effective_user.id in await aget_admin_ids()):
+            return await q.edit_message_text("⛔ Solo administradores.")
+        kb = [[InlineKeyboardButton("⬅️ Volver", callback_data="MENU:ADMIN")]]
+        return await q.edit_message_text(IMPORT_HELP, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
+
     # --- Normal menu ---
     if data == "MENU:CANCEL_RESERVA":
         kb = [
@@ -342,7 +254,7 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                                          reply_markup=InlineKeyboardMarkup(kb), parse_mode="Markdown")
 
     if data == "MENU:CANCEL_CONFIRM":
-        release_reservation(context)
+        await run_blocking(release_reservation, context)
         return await cmd_menu(update, context)
 
     if data == "MENU:CANCEL_KEEP":
@@ -352,25 +264,19 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await cmd_menu(update, context)
 
     if data == "MENU:LISTA":
-        rows = read_lista_any()
-        return await start_list_pagination(q, context, rows, title="Lista completa", page_size=10, page=0, allow_edit=False)
+        return await start_list_pagination(q, context, title="Lista completa", page_size=10, page=0, allow_edit=False)
 
     if data.startswith("MENU:FILTRO:"):
         _, _, estado = data.split(":", 2)
 
         if estado == "Pendiente":
-            reserved = context.user_data.get("reserved_rows") or []
+            reserved = []
+            if context.user_data.get("reserved_rows") or context.user_data.get("reserved_owner"):
+                # Lo que sigue reservado a su nombre, desde el índice por dueño
+                reserved = await run_blocking(_active_reserved_rows, context)
             if reserved:
-                if not context.user_data.get("reserved_owner"):
-                    try:
-                        first_estado = _pad_row(reserved[0], len(CSV_HEADERS))[IDX["Estado"]].strip()
-                    except Exception:
-                        first_estado = ""
-                    if first_estado.startswith("En contacto - "):
-                        context.user_data["reserved_owner"] = first_estado.split("En contacto - ", 1)[1].strip()
-                context.user_data.pop("pending_preview_keys", None)
                 context.user_data.pop("pending_preview_limit", None)
-                context.user_data.pop("pending_preview_indices", None)
+                context.user_data.pop("pending_preview_ids", None)
                 msg = "\n".join(_format_persona(r) for r in reserved)
                 kb = [
                     [InlineKeyboardButton("✏️ Editar esta tanda", callback_data="MENU:EDIT")],
@@ -382,17 +288,15 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     f"Tus pendientes asignados ({len(reserved)}):\n\n{msg}",
                     reply_markup=InlineKeyboardMarkup(kb),
                 )
-            all_rows = read_lista_any()
-            pending_positions = _pending_positions(all_rows)
+            pending_positions = await run_blocking(_pending_positions)
             if not pending_positions:
                 context.user_data.pop("reserved_owner", None)
-                context.user_data.pop("pending_preview_indices", None)
+                context.user_data.pop("pending_preview_ids", None)
                 kb = InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Menú", callback_data="MENU:HOME")]])
                 return await q.edit_message_text("No hay personas pendientes.", reply_markup=kb)
             preview_positions = pending_positions[:5]
             preview = [row for _, row in preview_positions]
-            context.user_data["pending_preview_keys"] = [_row_key(r) for r in preview]
-            context.user_data["pending_preview_indices"] = [idx for idx, _ in preview_positions]
+            context.user_data["pending_preview_ids"] = [r.id for r in preview]
             context.user_data["pending_preview_limit"] = len(preview)
             context.user_data.pop("reserved_owner", None)
             msg = "\n".join(_format_persona(r) for r in preview)
@@ -406,8 +310,7 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return await q.edit_message_text(texto, reply_markup=InlineKeyboardMarkup(kb))
         else:
-            rows = filter_by_status(read_lista_any(), estado)
-            return await start_list_pagination(q, context, rows, title=f"{estado}s", page_size=10, page=0, allow_edit=False)
+            return await start_list_pagination(q, context, title=f"{estado}s", estado=estado, page_size=10, page=0, allow_edit=False)
 
     if data == "MENU:SAVE5":
         from bot.handlers.edit import send_reserved_vcf
@@ -417,31 +320,33 @@ async def on_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         from bot.handlers.edit import send_reserved_as_contacts
         return await send_reserved_as_contacts(update, context)
 
-    if data == "MENU:EXPORT_GC":
-        out = os.path.join("export", "contacts.csv")
-        os.makedirs("export", exist_ok=True)
-        gen_contacts_any(out)
-        return await q.edit_message_text(f"✅ Generado Google Contacts: `{out}`", parse_mode="Markdown")
-
-    if data == "MENU:VCARD":
-        out = os.path.join("export", "lista.vcf")
-        os.makedirs("export", exist_ok=True)
-        gen_vcard_any(out, etiqueta="General")
-        return await q.edit_message_text(f"✅ Generado vCard: `{out}`", parse_mode="Markdown")
+    if data in ("MENU:EXPORT_GC", "MENU:VCARD"):
+        kind, titulo = ("contacts", "Google Contacts") if data == "MENU:EXPORT_GC" else ("vcard", "vCard")
+        await q.edit_message_text(f"⏳ Generando {titulo}…")
+        try:
+            await send_export(q.message, kind, update.effective_user.id)
+        except Exception as e:
+            return await q.edit_message_text(f"No se pudo generar {titulo}: {e}")
+        return await q.edit_message_text(f"✅ {titulo} enviado.")
 
     if data == "MENU:EDIT":
         base = context.user_data.get("reserved_rows")
         if not base:
             limit = context.user_data.get("pending_preview_limit") or 5
-            base = _reserve_pendientes_for_user(update, context, limit=limit)
+            base = await run_blocking(_reserve_pendientes_for_user, update, context, limit=limit)
         if not base:
             return await q.edit_message_text("No hay pendientes disponibles para reservar en este momento.")
-        context.user_data["edit_base_rows"] = base
+        base = await run_blocking(
+            open_view, context.user_data, "edit_view", ids=context.user_data.get("reserved_ids") or ()
+        )
         context.user_data["edit_page_size"] = 5
         context.user_data["edit_page"] = 0
         context.user_data["edit_source"] = "pendientes"
         context.user_data["edit_title"] = "Cambiar estado (Pendientes)"
-        return await show_editable_list(q, context, base, title=context.user_data["edit_title"], page=0, page_size=5)
+        return await show_editable_list(
+            q, context, base, title=context.user_data["edit_title"], page=0, page_size=5,
+            cache_key=view_key(context.user_data, "edit_view"),
+        )
 
     # Fallback no-op
     return None
@@ -9,6 +9,7 @@ from telegram.ext import (
     ContextTypes,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
@@ -30,6 +31,10 @@ from bot.handlers.admin import (
     admin_add_admin_text,
     admin_del_admin_text,
     admin_cancel_cb,
+    on_import_document,
+    cmd_broadcast,
+    cmd_broadcast_status,
+    cmd_broadcast_cancel,
 )
 from bot.handlers.menu import (
     cmd_start,
@@ -46,8 +51,18 @@ from bot.handlers.commands import (
     cmd_gen_contacts,
     cmd_vcard,
     cmd_whoami,
+    cmd_stats,
 )
 from bot.handlers.errors import handle_error
+from bot.handlers.jobs import sweep_reservations, refresh_roles_job, schedule_broadcast
+from bot.services.sheets_writer import flush_pending_writes
+from bot.services.csv_journal import flush_csv_journals
+from bot.services.async_storage import shutdown_storage_pool, run_blocking
+from bot.services.broadcast import load_state as load_broadcast_state
+from bot.utils.concurrency import PerUserUpdateProcessor
+from bot.utils.flood import flood_guard
+from bot.utils.ratelimit import OutboundRateLimiter
+from bot.config import CONCURRENT_UPDATES, RESERVATION_LEASE_MINUTES, RESERVATION_SWEEP_SECONDS, ROLES_REFRESH_SECONDS, USE_SHEETS
 from bot.states import (
     EDIT_OBS,
     ADM_ADD_ID,
@@ -117,13 +132,37 @@ def build_admin_admins_conv():
         allow_reentry=True,
     )
 
+async def on_startup(app):
+    # Retomar una difusión que quedó a medias por un reinicio
+    state = await run_blocking(load_broadcast_state)
+    if state and state["status"] == "running":
+        logging.info("Retomando difusión desde %s/%s.", state["cursor"], len(state["recipients"]))
+        schedule_broadcast(app)
+
+async def on_shutdown(app):
+    # Esperar las operaciones de almacenamiento en curso y vaciar la cola write-behind
+    shutdown_storage_pool()
+    flush_pending_writes()
+    flush_csv_journals()
+
 def main():
     token = os.environ.get("TELEGRAM_BOT_TOKEN", "").strip()
     if not token:
         raise RuntimeError("Falta TELEGRAM_BOT_TOKEN.")
     mode = os.environ.get("TG_MODE", "polling").strip().lower()
 
-    app = ApplicationBuilder().token(token).build()
+    app = (
+        ApplicationBuilder()
+        .token(token)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .rate_limiter(OutboundRateLimiter())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+
+    # Antes que todo: descarta floods y usuarios no autorizados sin tocar los handlers
+    app.add_handler(TypeHandler(Update, flood_guard), group=-1)
 
     # Conversations
     app.add_handler(build_add_conv())
@@ -155,10 +194,30 @@ def main():
     app.add_handler(CommandHandler("gen_contacts", cmd_gen_contacts))
     app.add_handler(CommandHandler("vcard", cmd_vcard))
     app.add_handler(CommandHandler("whoami", cmd_whoami))
+    app.add_handler(CommandHandler("stats", cmd_stats))
+    app.add_handler(CommandHandler("broadcast", cmd_broadcast))
+    app.add_handler(CommandHandler("broadcast_status", cmd_broadcast_status))
+    app.add_handler(CommandHandler("broadcast_cancel", cmd_broadcast_cancel))
+
+    # Importación masiva (solo admins): un CSV/XLSX mandado como documento
+    app.add_handler(MessageHandler(
+        filters.Document.FileExtension("csv") | filters.Document.FileExtension("xlsx"), on_import_document
+    ))
 
     # Errores
     app.add_error_handler(handle_error)
 
+    # Tareas periódicas
+    if RESERVATION_LEASE_MINUTES > 0:
+        if app.job_queue is None:
+            logging.warning("Sin JobQueue (instalar python-telegram-bot[job-queue]): las reservas no vencen.")
+        else:
+            app.job_queue.run_repeating(sweep_reservations, interval=RESERVATION_SWEEP_SECONDS,
+                                        first=RESERVATION_SWEEP_SECONDS, name="reservation_sweeper")
+    if USE_SHEETS and app.job_queue is not None:
+        # Roles: primera lectura al arrancar y después en segundo plano (sin esa cola se refrescan al vencer)
+        app.job_queue.run_repeating(refresh_roles_job, interval=ROLES_REFRESH_SECONDS, first=0, name="roles_refresher")
+
     # Polling o Webhook
     if mode == "webhook":
         port = int(os.environ.get("PORT", "10000"))
@@ -0,0 +1,68 @@
+"""
+Fachada async del almacenamiento. gspread, CSV y SQLite son bloqueantes: acá se
+ejecutan en un pool de hilos acotado para no congelar el event loop mientras
+esperamos a Google Sheets.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, FrozenSet, List
+
+from bot.config import STORAGE_WORKERS
+from . import lista, roles
+from .contact import Contact
+from .contact_store import RowLike
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="storage")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Ejecuta fn(*args, **kwargs) en el pool de almacenamiento y espera el resultado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXECUTOR, partial(fn, *args, **kwargs))
+
+
+# --- Lista ---
+async def aread_lista_any(fresh: bool = False) -> List[Contact]:
+    return await run_blocking(lista.read_lista_any, fresh)
+
+
+async def aread_by_status(estado: str) -> List[Contact]:
+    return await run_blocking(lista.read_by_status, estado)
+
+
+async def aappend_contact_any(row: RowLike) -> str:
+    return await run_blocking(lista.append_contact_any, row)
+
+
+async def aupdate_estado_by_id(row_id: str, nuevo_estado: str, observacion: str = "") -> None:
+    return await run_blocking(lista.update_estado_by_id, row_id, nuevo_estado, observacion=observacion)
+
+
+# --- Roles ---
+async def aget_admins_map() -> Dict[int, str]:
+    return await run_blocking(roles.get_admins_map)
+
+
+async def aget_allowed_map() -> Dict[int, str]:
+    return await run_blocking(roles.get_allowed_map)
+
+
+async def aget_admin_ids() -> FrozenSet[int]:
+    return await run_blocking(roles.get_admin_ids)
+
+
+async def aget_allowed_ids() -> FrozenSet[int]:
+    return await run_blocking(roles.get_allowed_ids)
+
+
+async def aappend_id_name_to_sheet(title: str, uid: int, name: str = "") -> None:
+    return await run_blocking(roles._append_id_name_to_sheet, title, uid, name)
+
+
+async def aremove_id_from_sheet(title: str, uid: int) -> bool:
+    return await run_blocking(roles._remove_id_from_sheet, title, uid)
+
+
+def shutdown_storage_pool() -> None:
+    _EXECUTOR.shutdown(wait=True)
@@ -0,0 +1,132 @@
+"""
+Difusión de un mensaje a los voluntarios.
+
+El estado de la difusión en curso (texto, destinatarios congelados al empezar,
+cursor y conteos) vive en memoria y se guarda en BROADCAST_STATE (JSON,
+escritura atómica) después de cada tanda, así un reinicio retoma desde el
+cursor. Como mucho se reenvía la tanda que estaba en vuelo al caerse. Si el
+envío falla más veces de las permitidas queda en 'failed' y se puede empezar otra.
+
+Plantilla: {nombre} (nombre de la hoja de roles o, si no hay, el user_id) y
+{user_id}. Cualquier otra llave queda tal cual.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from bot.config import BROADCAST_STATE
+from .roles import get_auth_snapshot
+
+AUDIENCES = ("todos", "voluntarios", "admins")
+
+_LOCK = threading.Lock()
+# Difusión activa (la misma instancia la ven el job y los comandos)
+_ACTIVE: dict = {"state": None, "loaded": False}
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def render(template: str, uid: int, names: Dict[int, str]) -> str:
+    values = _KeepMissing(nombre=names.get(uid) or str(uid), user_id=str(uid))
+    try:
+        return template.format_map(values)
+    except (ValueError, IndexError):
+        # Llaves sueltas o posicionales: se manda el texto sin reemplazar
+        return template
+
+
+def recipients(audience: str) -> List[int]:
+    snap = get_auth_snapshot()
+    if audience == "admins":
+        ids = snap.admins
+    elif audience == "voluntarios":
+        ids = snap.allowed - snap.admins
+    else:
+        ids = snap.allowed
+    return sorted(ids)
+
+
+def _write(state: dict) -> None:
+    tmp = f"{BROADCAST_STATE}.tmp"
+    os.makedirs(os.path.dirname(BROADCAST_STATE) or ".", exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, BROADCAST_STATE)
+
+
+def load_state() -> Optional[dict]:
+    """Difusión activa o la última terminada; la lee del archivo la primera vez."""
+    with _LOCK:
+        if not _ACTIVE["loaded"]:
+            _ACTIVE["loaded"] = True
+            if os.path.exists(BROADCAST_STATE):
+                with open(BROADCAST_STATE, "r", encoding="utf-8") as f:
+                    _ACTIVE["state"] = json.load(f)
+        return _ACTIVE["state"]
+
+
+def start_broadcast(text: str, audience: str, chat_id: int) -> dict:
+    """Congela los destinatarios y deja la difusión lista para el job. ValueError si ya hay una."""
+    current = load_state()
+    if current and current["status"] == "running":
+        raise ValueError("Ya hay una difusión en curso; esperá a que termine o cancelala con /broadcast_cancel.")
+    to = recipients(audience)
+    if not to:
+        raise ValueError(f"No hay destinatarios en '{audience}'.")
+    state = {
+        "id": int(time.time()),
+        "text": text,
+        "audience": audience,
+        "recipients": to,
+        "cursor": 0,
+        "delivered": 0,
+        "failed": 0,
+        "blocked": 0,
+        "chat_id": chat_id,
+        "status": "running",
+    }
+    with _LOCK:
+        _ACTIVE["state"] = state
+        _write(state)
+    return state
+
+
+def cancel_broadcast() -> bool:
+    state = load_state()
+    if not state or state["status"] != "running":
+        return False
+    with _LOCK:
+        state["status"] = "cancelled"
+        _write(state)
+    return True
+
+
+def record_batch(state: dict, results: List[str]) -> None:
+    """Suma los resultados de una tanda, avanza el cursor y lo guarda."""
+    with _LOCK:
+        for r in results:
+            state[r] += 1
+        state["cursor"] += len(results)
+        if state["status"] == "running" and state["cursor"] >= len(state["recipients"]):
+            state["status"] = "done"
+        _write(state)
+
+
+def fail_broadcast(state: dict) -> None:
+    """Marca la difusión como 'failed'; en memoria aunque no se pueda guardar."""
+    with _LOCK:
+        if state["status"] != "running":
+            return
+        state["status"] = "failed"
+        try:
+            _write(state)
+        except OSError:
+            logging.exception("No se pudo guardar el estado 'failed' de la difusión.")
@@ -0,0 +1,106 @@
+import sys
+from typing import Iterator, List, Optional, Sequence, Union
+
+from bot.config import CSV_HEADERS
+
+
+def _pad_row(row: List[str], n: int) -> List[str]:
+    if len(row) < n:
+        return row + [""] * (n - len(row))
+    return row[:n]
+
+
+def _clean_phone(s: str) -> str:
+    return s.strip().replace(" ", "").replace("-", "")
+
+
+def _phone_key(s: str) -> str:
+    return _clean_phone(s or "")
+
+
+def _dni_key(s: str) -> str:
+    return (s or "").strip().replace(".", "")
+
+
+class Contact:
+    """
+    Una fila de la lista, normalizada una sola vez al cargar: las columnas de
+    CSV_HEADERS (con el ID estable) más las claves de Teléfono/DNI ya calculadas.
+    Es inmutable: los cambios se hacen con replace(), así el store y las copias
+    en user_data pueden compartir la misma instancia sin copiarla.
+    También se comporta como secuencia (row[IDX[...]], list(row), csv.writer).
+    """
+
+    __slots__ = ("nombre", "apellido", "telefono", "dni", "estado", "observacion", "id", "tel_key", "dni_key")
+    _FIELDS = ("nombre", "apellido", "telefono", "dni", "estado", "observacion", "id")
+
+    def __init__(self, nombre="", apellido="", telefono="", dni="", estado="", observacion="", id=""):
+        self.nombre = nombre
+        self.apellido = apellido
+        self.telefono = telefono
+        self.dni = dni
+        # Estado y Observación se repiten mucho entre filas: una sola copia de cada valor
+        self.estado = sys.intern(estado)
+        self.observacion = sys.intern(observacion)
+        self.id = id.strip()
+        self.tel_key = _phone_key(telefono)
+        self.dni_key = _dni_key(dni)
+
+    @classmethod
+    def from_row(cls, row: Union["Contact", Sequence[str]]) -> "Contact":
+        if isinstance(row, Contact):
+            return row
+        return cls(*_pad_row([str(v) for v in row], len(CSV_HEADERS)))
+
+    def replace(self, **changes) -> "Contact":
+        values = {f: getattr(self, f) for f in self._FIELDS}
+        values.update(changes)
+        return Contact(**values)
+
+    def with_estado(self, estado: str, observacion: Optional[str] = None) -> "Contact":
+        if observacion is None:
+            return self.replace(estado=estado)
+        return self.replace(estado=estado, observacion=observacion)
+
+    def to_list(self) -> List[str]:
+        return [getattr(self, f) for f in self._FIELDS]
+
+    def same_person(self, other: "Contact") -> bool:
+        """Coincide Teléfono o DNI (normalizados); sin claves, la fila completa."""
+        if not self.tel_key and not self.dni_key:
+            return self == other
+        return bool(
+            (self.tel_key and self.tel_key == other.tel_key)
+            or (self.dni_key and self.dni_key == other.dni_key)
+        )
+
+    # --- compatibilidad con filas List[str] ---
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.to_list()[i]
+        return getattr(self, self._FIELDS[i])
+
+    def __iter__(self) -> Iterator[str]:
+        return (getattr(self, f) for f in self._FIELDS)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Contact):
+            return all(getattr(self, f) == getattr(other, f) for f in self._FIELDS)
+        if isinstance(other, (list, tuple)):
+            return self.to_list() == _pad_row(list(other), len(CSV_HEADERS))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"Contact({', '.join(repr(v) for v in self)})"
+
+    def __getstate__(self):
+        return self.to_list()
+
+    def __setstate__(self, state):
+        Contact.__init__(self, *state)
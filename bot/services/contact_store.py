@@ -0,0 +1,203 @@
+import threading
+import time
+from bisect import insort
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from .contact import Contact, _phone_key, _dni_key
+from .estado import owner_key_for, parse_estado
+
+RowLike = Union[Contact, Sequence[str]]
+
+
+class ContactStore:
+    """
+    Copia en memoria de la lista (objetos Contact compartidos, no copias) con
+    índices hash por ID, por Teléfono y DNI normalizados, por Estado y por dueño
+    de reserva ("En contacto - <dueño>"). Las posiciones son las mismas que
+    devuelve read_lista_any() (fila de datos 0 = fila 2 de la hoja / CSV).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows: List[Contact] = []
+        self._by_phone: Dict[str, List[int]] = {}
+        self._by_dni: Dict[str, List[int]] = {}
+        self._by_estado: Dict[str, Set[int]] = {}
+        self._by_id: Dict[str, int] = {}
+        self._max_id = 0
+        # Clave del dueño (id de Telegram o etiqueta) -> posiciones reservadas
+        self._by_owner: Dict[str, Set[int]] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.version = 0
+
+    # --- carga ---
+    def load(self, rows: List[RowLike]) -> None:
+        with self._lock:
+            self._rows = [Contact.from_row(r) for r in rows]
+            self._by_phone, self._by_dni, self._by_estado, self._by_owner = {}, {}, {}, {}
+            self._by_id, self._max_id = {}, 0
+            for i, r in enumerate(self._rows):
+                self._index(i, r)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+            self.version += 1
+
+    def touch(self) -> None:
+        """Marca la copia como recién validada sin recargarla."""
+        with self._lock:
+            self.loaded_at = time.monotonic()
+
+    # --- índices ---
+    def _index(self, i: int, row: Contact) -> None:
+        if row.tel_key:
+            insort(self._by_phone.setdefault(row.tel_key, []), i)
+        if row.dni_key:
+            insort(self._by_dni.setdefault(row.dni_key, []), i)
+        self._by_estado.setdefault(row.estado, set()).add(i)
+        if row.id:
+            # Si dos filas traen el mismo ID (copiada a mano), vale la primera
+            self._by_id.setdefault(row.id, i)
+            if row.id.isdigit():
+                self._max_id = max(self._max_id, int(row.id))
+        owner = parse_estado(row.estado).owner_key
+        if owner:
+            self._by_owner.setdefault(owner, set()).add(i)
+
+    def _unindex(self, i: int, row: Contact) -> None:
+        if self._by_id.get(row.id) == i:
+            del self._by_id[row.id]
+        for index, key in ((self._by_phone, row.tel_key), (self._by_dni, row.dni_key)):
+            bucket = index.get(key)
+            if bucket and i in bucket:
+                bucket.remove(i)
+                if not bucket:
+                    del index[key]
+        for index, key in ((self._by_estado, row.estado), (self._by_owner, parse_estado(row.estado).owner_key)):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.discard(i)
+                if not bucket:
+                    del index[key]
+
+    # --- lectura ---
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rows(self) -> List[Contact]:
+        """Lista nueva con las mismas instancias (inmutables): no copia las filas."""
+        with self._lock:
+            return list(self._rows)
+
+    def snapshot(self) -> Tuple[int, List[Contact]]:
+        """(versión, filas) leídos juntos, sin que una escritura se cuele en el medio."""
+        with self._lock:
+            return self.version, list(self._rows)
+
+    def row(self, i: int) -> Contact:
+        with self._lock:
+            return self._rows[i]
+
+    def position_of(self, row_id: str) -> int:
+        """Posición del contacto con ese ID; -1 si no existe."""
+        with self._lock:
+            return self._by_id.get(str(row_id), -1)
+
+    def positions_of(self, row_ids) -> List[int]:
+        """Posiciones de los IDs que siguen existiendo, en el mismo orden."""
+        with self._lock:
+            found = (self._by_id.get(str(r), -1) for r in row_ids)
+            return [p for p in found if p >= 0]
+
+    def without_id(self) -> List[int]:
+        """Posiciones sin ID propio: vacío o repetido de otra fila."""
+        with self._lock:
+            return [i for i, r in enumerate(self._rows) if self._by_id.get(r.id, -1) != i]
+
+    def new_id(self) -> str:
+        with self._lock:
+            self._max_id += 1
+            return str(self._max_id)
+
+    def find(self, tel: str, dni: str = "") -> int:
+        """Primera posición cuyo Teléfono o DNI coincide (normalizados); -1 si no hay."""
+        with self._lock:
+            candidates = self._candidates(_phone_key(tel), _dni_key(dni))
+            return candidates[0] if candidates else -1
+
+    def locate(self, target: RowLike) -> int:
+        """Posición de la fila idéntica a target; si no hay, la primera que comparte Teléfono/DNI."""
+        target = Contact.from_row(target)
+        with self._lock:
+            if not target.tel_key and not target.dni_key:
+                return next((i for i, r in enumerate(self._rows) if r == target), -1)
+            candidates = self._candidates(target.tel_key, target.dni_key)
+            for i in candidates:
+                if self._rows[i] == target:
+                    return i
+            return candidates[0] if candidates else -1
+
+    def _candidates(self, tel: str, dni: str) -> List[int]:
+        found = list(self._by_phone.get(tel, [])) if tel else []
+        if dni:
+            found.extend(self._by_dni.get(dni, []))
+        return sorted(set(found))
+
+    def positions(self, estado: str) -> List[int]:
+        with self._lock:
+            return sorted(self._by_estado.get(estado, ()))
+
+    def reserved_by(self, owner_label: str) -> List[int]:
+        """Posiciones en "En contacto" a nombre de owner_label (compara por id si lo tiene)."""
+        key = owner_key_for(owner_label)
+        if not key:
+            return []
+        with self._lock:
+            return sorted(self._by_owner.get(key, ()))
+
+    def reserved(self) -> List[int]:
+        """Todas las posiciones reservadas, de cualquier dueño."""
+        with self._lock:
+            return sorted(p for bucket in self._by_owner.values() for p in bucket)
+
+    # --- escritura ---
+    def set_row(self, i: int, row: RowLike) -> Contact:
+        """Reemplaza la fila i; si la nueva no trae ID conserva el de la anterior."""
+        row = Contact.from_row(row)
+        with self._lock:
+            old = self._rows[i]
+            if not row.id:
+                row = row.replace(id=old.id)
+            self._unindex(i, old)
+            self._rows[i] = row
+            self._index(i, row)
+            self.version += 1
+            return row
+
+    def set_estado(self, i: int, estado: str, observacion: Optional[str] = None) -> Contact:
+        with self._lock:
+            row = self._rows[i].with_estado(estado, observacion)
+            self.set_row(i, row)
+            return row
+
+    def append(self, row: RowLike) -> int:
+        """Agrega al final; sin ID se le asigna uno nuevo."""
+        row = Contact.from_row(row)
+        with self._lock:
+            if not row.id:
+                row = row.replace(id=self.new_id())
+            self._rows.append(row)
+            i = len(self._rows) - 1
+            self._index(i, row)
+            self.version += 1
+            return i
+
+    def upsert(self, row: RowLike) -> Tuple[int, str]:
+        """Inserta o reemplaza por Teléfono/DNI. Devuelve (posición, 'new'|'updated')."""
+        row = Contact.from_row(row)
+        with self._lock:
+            i = self.find(row.telefono, row.dni)
+            if i >= 0:
+                self.set_row(i, row)
+                return i, "updated"
+            return self.append(row), "new"
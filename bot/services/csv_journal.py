@@ -0,0 +1,240 @@
+"""
+Journal append-only para el backend CSV (STORAGE_BACKEND=csv).
+
+Cada cambio de Estado/Observación o alta/edición de fila se agrega como una
+línea JSON en `<lista.csv>.journal` en lugar de reescribir todo el CSV. Las
+lecturas reproducen el journal sobre el CSV base y, cuando acumula
+CSV_JOURNAL_COMPACT_AT registros, una compactación en segundo plano lo vuelca
+al CSV y lo vacía.
+
+Registros (posición 0 = primera fila de datos):
+    {"p": 3, "row": [...]}             fila completa (si p == cantidad de filas, es un alta)
+    {"p": 3, "e": "Aceptado", "o": ""} Estado y, si "o" no es null, Observación
+
+Son idempotentes: reaplicar un journal ya volcado al CSV no cambia nada.
+"""
+import atexit
+import csv
+import json
+import logging
+import os
+import threading
+from typing import List, Optional
+
+from bot.config import CSV_HEADERS, IDX, CSV_JOURNAL_FSYNC_WINDOW, CSV_JOURNAL_COMPACT_AT
+from .contact import _pad_row
+
+
+def _read_csv(path: str) -> List[List[str]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, mode="r", encoding="utf-8-sig") as f:
+        return list(csv.reader(f))
+
+
+def _replay(body: List[List[str]], path: str) -> int:
+    """Aplica los registros de `path` sobre body; devuelve cuántos aplicó."""
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    with open(path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # Última línea cortada por una caída: se descarta
+                logging.warning("Registro de journal ilegible en %s; se ignora.", path)
+                continue
+            p = rec.get("p", -1)
+            if "row" in rec:
+                row = _pad_row(list(rec["row"]), len(CSV_HEADERS))
+                if p == len(body):
+                    body.append(row)
+                elif 0 <= p < len(body):
+                    body[p] = row
+                else:
+                    continue
+            elif 0 <= p < len(body):
+                row = _pad_row(body[p], len(CSV_HEADERS))
+                row[IDX["Estado"]] = rec.get("e", "")
+                if rec.get("o") is not None:
+                    row[IDX["Observación"]] = rec["o"]
+                body[p] = row
+            else:
+                continue
+            count += 1
+    return count
+
+
+def read_csv_with_journal(path: str) -> List[List[str]]:
+    """CSV completo (con encabezado) con el journal ya aplicado."""
+    rows = _read_csv(path)
+    header, body = (rows[0], rows[1:]) if rows else (list(CSV_HEADERS), [])
+    _replay(body, f"{path}.journal.compacting")
+    _replay(body, f"{path}.journal")
+    return [header] + body if (rows or body) else []
+
+
+class CsvJournal:
+    def __init__(self, path: str, window: float, compact_at: int):
+        self.path = path
+        self.journal = f"{path}.journal"
+        self.compacting = f"{path}.journal.compacting"
+        self.window = window
+        self.compact_at = compact_at
+        self.records = 0
+        self._epoch = 0
+        self._lock = threading.RLock()
+        self._fh = None
+        self._dirty = False
+        self._timer = None
+
+    # --- lectura ---
+    def read_rows(self) -> List[List[str]]:
+        rows = _read_csv(self.path)
+        body = rows[1:] if rows else []
+        with self._lock:
+            self.records = _replay(body, self.compacting) + _replay(body, self.journal)
+        return body
+
+    def header(self) -> List[str]:
+        """Encabezado del CSV base (sin leer el resto del archivo)."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, mode="r", encoding="utf-8-sig") as f:
+            return next(csv.reader(f), [])
+
+    # --- escritura ---
+    def set_row(self, pos: int, row: List[str]) -> None:
+        self._append({"p": pos, "row": _pad_row(list(row), len(CSV_HEADERS))})
+
+    def set_estado(self, pos: int, estado: str, observacion: Optional[str] = None) -> None:
+        self._append({"p": pos, "e": estado, "o": observacion})
+
+    def _append(self, rec: dict) -> None:
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._fh is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._fh = open(self.journal, "a", encoding="utf-8")
+            # flush(): el registro sobrevive a una caída del proceso; el fsync va agrupado
+            self._fh.write(line)
+            self._fh.flush()
+            self.records += 1
+            self._dirty = True
+        self._schedule_sync()
+
+    def _schedule_sync(self) -> None:
+        if self.window <= 0:
+            self.sync()
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.sync()
+        except Exception:
+            logging.exception("Falló el fsync del journal de %s.", self.path)
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._fh is not None and self._dirty:
+                os.fsync(self._fh.fileno())
+                self._dirty = False
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self.sync()
+                self._fh.close()
+                self._fh = None
+
+    def rewrite(self, rows: List[List[str]]) -> None:
+        """Reescritura completa (encabezado incluido): deja el journal vacío."""
+        with self._lock:
+            self._close()
+            _write_atomic(self.path, rows)
+            for p in (self.journal, self.compacting):
+                if os.path.exists(p):
+                    os.remove(p)
+            self.records = 0
+            self._epoch += 1
+
+    # --- compactación ---
+    def needs_compaction(self) -> bool:
+        return self.records >= self.compact_at
+
+    def begin_compaction(self) -> int:
+        """Aparta el journal actual; las escrituras siguientes van a uno nuevo. Devuelve la época."""
+        with self._lock:
+            self._close()
+            if os.path.exists(self.journal):
+                if os.path.exists(self.compacting):
+                    # Quedó uno de una compactación interrumpida: se acumulan
+                    with open(self.journal, "r", encoding="utf-8") as src, open(self.compacting, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal)
+                else:
+                    os.replace(self.journal, self.compacting)
+            self.records = 0
+            return self._epoch
+
+    def write_snapshot(self, rows: List[List[str]]) -> str:
+        tmp = f"{self.path}.compact.tmp"
+        _write_file(tmp, rows)
+        return tmp
+
+    def commit_compaction(self, tmp: str, epoch: int) -> bool:
+        with self._lock:
+            if epoch != self._epoch:
+                # Hubo una reescritura completa en el medio: este snapshot ya es viejo
+                os.remove(tmp)
+                return False
+            os.replace(tmp, self.path)
+            if os.path.exists(self.compacting):
+                os.remove(self.compacting)
+            return True
+
+
+def _write_file(path: str, rows: List[List[str]]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_atomic(path: str, rows: List[List[str]]) -> None:
+    # Escribimos a un temporal y reemplazamos: un lector nunca ve el archivo a medias
+    tmp = f"{path}.tmp"
+    _write_file(tmp, rows)
+    os.replace(tmp, path)
+
+
+_JOURNALS = {}
+
+
+def get_journal(path: str) -> CsvJournal:
+    journal = _JOURNALS.get(path)
+    if journal is None:
+        journal = _JOURNALS[path] = CsvJournal(path, CSV_JOURNAL_FSYNC_WINDOW, CSV_JOURNAL_COMPACT_AT)
+    return journal
+
+
+def flush_csv_journals() -> None:
+    for journal in list(_JOURNALS.values()):
+        try:
+            journal.sync()
+        except Exception:
+            logging.exception("No se pudo sincronizar el journal de %s.", journal.path)
+
+
+atexit.register(flush_csv_journals)
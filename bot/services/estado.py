@@ -0,0 +1,123 @@
+"""
+Parser del campo Estado.
+
+Una sola expresión compilada reconoce "En contacto - <dueño>" en todas las
+variantes que aparecen en la planilla (con nombre entre paréntesis, con guiones
+o corruptas con "Update(...)") y el resultado se memoiza por valor: cada Estado
+distinto se analiza una sola vez por proceso.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+PENDIENTE = "pendiente"
+EN_CONTACTO = "en_contacto"
+ACEPTADO = "aceptado"
+RECHAZADO = "rechazado"
+CONTACTAR_LUEGO = "contactar_luego"
+NUMERO_INCORRECTO = "numero_incorrecto"
+VACIO = "vacio"
+OTRO = "otro"
+
+_KINDS = {
+    "pendiente": PENDIENTE,
+    "aceptado": ACEPTADO,
+    "rechazado": RECHAZADO,
+    "numero incorrecto": NUMERO_INCORRECTO,
+}
+
+_EN_CONTACTO_RE = re.compile(
+    r"""
+    ^en\s*contacto\b\s*
+    (?:[-–—]\s*)?
+    (?:
+        (?P<owner>
+            \(?(?P<id>\d{5,})\b                      # id de Telegram, a veces tras '('
+            (?:\s*\((?P<name>[^)]+)\)                #   '<id> (<nombre>)'
+              |\s*[-–—]\s*(?P<alt>[^()]+)$           #   '<id> - <nombre>'
+            )?
+            .*
+        |.+)                                         # dueño sin id: se respeta tal cual
+    )?$
+    """,
+    re.IGNORECASE | re.DOTALL | re.VERBOSE,
+)
+_DIGITS_RE = re.compile(r"\b(\d{5,})\b")
+
+
+class EstadoInfo(NamedTuple):
+    kind: str
+    owner_id: str
+    owner_name: str
+    raw: str
+    # Texto después de "En contacto - " (etiqueta de reserva) y versión para mostrar
+    owner: str
+    display: str
+
+    @property
+    def en_contacto(self) -> bool:
+        return self.kind == EN_CONTACTO
+
+    @property
+    def owner_key(self) -> str:
+        """Clave del dueño para indexar reservas: el id si lo hay, si no la etiqueta."""
+        return self.owner_id or self.owner
+
+    def owned_by(self, owner_label: str) -> bool:
+        """¿La reserva es de owner_label? Compara ids si ambos lo tienen."""
+        if not self.en_contacto or not owner_label:
+            return False
+        other = parse_estado(f"En contacto - {owner_label}")
+        if self.owner_id and other.owner_id:
+            return self.owner_id == other.owner_id
+        return self.owner.startswith(owner_label.strip())
+
+
+def _fold(s: str) -> str:
+    s = "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+    return " ".join(s.lower().split())
+
+
+@lru_cache(maxsize=8192)
+def parse_estado(raw: str) -> EstadoInfo:
+    s = (raw or "").strip()
+    if not s:
+        return EstadoInfo(VACIO, "", "", raw or "", "", "")
+    m = _EN_CONTACTO_RE.match(s)
+    if m is None:
+        folded = _fold(s)
+        kind = _KINDS.get(folded) or (CONTACTAR_LUEGO if folded.startswith("contactar luego") else OTRO)
+        return EstadoInfo(kind, "", "", raw, "", s)
+    owner = (m.group("owner") or "").strip()
+    owner_id = m.group("id") or ""
+    name = (m.group("name") or m.group("alt") or "").strip()
+    if not owner_id and "Update(" in s:
+        found = _DIGITS_RE.search(s)
+        owner_id = found.group(1) if found else ""
+    if owner_id:
+        display = f"En contacto - {owner_id} ({name})" if name else f"En contacto - {owner_id}"
+    elif "Update(" in s:
+        display = "En contacto"
+    else:
+        display = s
+    return EstadoInfo(EN_CONTACTO, owner_id, name, raw, owner, display)
+
+
+def is_en_contacto(raw: str) -> bool:
+    return parse_estado(raw).kind == EN_CONTACTO
+
+
+def owner_of(raw: str) -> Optional[str]:
+    """Etiqueta del dueño de una reserva ('<id> (<nombre>)'), o None."""
+    info = parse_estado(raw)
+    return (info.owner or None) if info.en_contacto else None
+
+
+def owner_key_for(owner_label: str) -> str:
+    """Clave de índice que tendrán las reservas hechas con owner_label."""
+    return parse_estado(f"En contacto - {owner_label}").owner_key
+
+
+def estado_cache_info():
+    return parse_estado.cache_info()
@@ -0,0 +1,120 @@
+"""
+Marcas de las exportaciones delta.
+
+En EXPORT_STATE (JSON, escritura atómica) se guarda, por ID de fila, una
+huella del contenido y en qué generación cambió por última vez (la fila
+entera y, aparte, Nombre/Apellido/Teléfono); y por usuario y tipo de
+exportación, la generación que ya se llevó. La generación sólo avanza cuando
+una exportación ve filas distintas de las guardadas, así que cualquier cambio
+(desde el bot o a mano en la hoja, antes o después de un reinicio) aparece en
+el próximo delta de cada usuario.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from bot.config import EXPORT_STATE
+from .contact import Contact
+
+_LOCK = threading.Lock()
+# {"gen": int, "rows": {id: [huella, huella tarjeta, gen, gen tarjeta]}, "marks": {uid: {tipo: gen}}}
+_STATE: dict = {"data": None}
+# Última versión del store ya comparada (en este proceso): si no cambió, no se recalculan huellas
+_OBSERVED = {"version": None}
+
+
+def _fingerprint(*values: str) -> str:
+    return hashlib.blake2b("\x1f".join(values).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _write(data: dict) -> None:
+    tmp = f"{EXPORT_STATE}.tmp"
+    os.makedirs(os.path.dirname(EXPORT_STATE) or ".", exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, EXPORT_STATE)
+
+
+def _load() -> dict:
+    if _STATE["data"] is None:
+        data = {"gen": 0, "rows": {}, "marks": {}}
+        if os.path.exists(EXPORT_STATE):
+            with open(EXPORT_STATE, "r", encoding="utf-8") as f:
+                data.update(json.load(f))
+        _STATE["data"] = data
+    return _STATE["data"]
+
+
+def _observe(data: dict, rows: List[Contact], version: Optional[int]) -> None:
+    """Compara las filas con las huellas guardadas y avanza la generación si algo cambió."""
+    if version is not None and version == _OBSERVED["version"]:
+        return
+    old = data["rows"]
+    gen = data["gen"] + 1
+    fresh: Dict[str, list] = {}
+    changed = False
+    for r in rows:
+        if not r.id or r.id in fresh:
+            continue
+        full = _fingerprint(*r)
+        card = _fingerprint(r.nombre, r.apellido, r.telefono)
+        prev = old.get(r.id)
+        if prev is None:
+            fresh[r.id] = [full, card, gen, gen]
+            changed = True
+        elif prev[0] == full:
+            fresh[r.id] = prev
+        else:
+            fresh[r.id] = [full, card, gen, gen if prev[1] != card else prev[3]]
+            changed = True
+    if changed or len(fresh) != len(old):
+        if changed:
+            data["gen"] = gen
+        data["rows"] = fresh
+        _write(data)
+    _OBSERVED["version"] = version
+
+
+def current_mark(rows: List[Contact], version: Optional[int] = None) -> int:
+    """Generación que corresponde a estas filas (la marca a guardar tras exportarlas)."""
+    with _LOCK:
+        data = _load()
+        _observe(data, rows, version)
+        return data["gen"]
+
+
+def changed_since(rows: List[Contact], since: int, card_only: bool = False,
+                  version: Optional[int] = None) -> Tuple[int, List[Contact]]:
+    """
+    (generación actual, filas que cambiaron después de since). card_only mira
+    sólo Nombre/Apellido/Teléfono. Las filas sin ID se incluyen siempre.
+    """
+    which = 3 if card_only else 2
+    with _LOCK:
+        data = _load()
+        _observe(data, rows, version)
+        stamps = data["rows"]
+        picked = []
+        for r in rows:
+            stamp = stamps.get(r.id) if r.id else None
+            if stamp is None or stamp[which] > since:
+                picked.append(r)
+        return data["gen"], picked
+
+
+def get_mark(uid: int, kind: str) -> Optional[int]:
+    with _LOCK:
+        return _load()["marks"].get(str(uid), {}).get(kind)
+
+
+def set_mark(uid: int, kind: str, gen: int) -> None:
+    with _LOCK:
+        data = _load()
+        marks = data["marks"].setdefault(str(uid), {})
+        if marks.get(kind) != gen:
+            marks[kind] = gen
+            _write(data)
@@ -1,51 +1,217 @@
-import os
+"""
+Exportaciones de la lista (Google Contacts CSV y vCard).
+
+Los exportadores son generadores de bytes: se recorren las filas una vez y se
+vuelcan por bloques a un SpooledTemporaryFile (queda en memoria salvo que el
+archivo sea enorme), listo para subirlo a Telegram como documento. Por encima
+de EXPORT_COMPRESS_OVER bytes el archivo se envía comprimido en un .zip.
+
+Cache de exportaciones: por cada exportación se guarda la versión del store,
+el hash del contenido y el file_id que devolvió Telegram al subirla. Si la
+lista no cambió se reenvía por file_id sin generar nada; si cambió pero el
+contenido es idéntico (p. ej. la vCard no incluye el Estado) también.
+
+Exportaciones delta: sólo las filas agregadas o cambiadas después de la marca
+que el usuario se llevó en su última exportación (export_marks, persistido en
+disco). Para la vCard cuentan únicamente los cambios de Nombre/Apellido/Teléfono.
+"""
+import csv
+import hashlib
+import io
 import re
-from typing import List
+import shutil
+import tempfile
+import threading
+import zipfile
+from typing import IO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
-from bot.config import GOOGLE_HEADERS, CSV_HEADERS, IDX
-from .lista import read_lista_any, _pad_row
+from bot.config import GOOGLE_HEADERS, EXPORT_COMPRESS_OVER, EXPORT_SPOOL_MAX
+from .contact import Contact
+from .lista import read_lista_any, get_contact_store
+from .export_marks import current_mark, changed_since
 
-def gen_contacts_any(output_csv: str) -> str:
-    body = read_lista_any()
-    out_rows = [GOOGLE_HEADERS]
-    for row in body:
-        row = _pad_row(row, len(CSV_HEADERS))
-        given, family, phone, dni, labels = (
-            row[IDX["Nombre"]],
-            row[IDX["Apellido"]],
-            row[IDX["Teléfono"]],
-            row[IDX["DNI"]],
-            row[IDX["Estado"]],
-        )
-        out_rows.append([given, family, phone, labels, dni, row[IDX["Observación"]]])
-    os.makedirs(os.path.dirname(output_csv) or ".", exist_ok=True)
-    # simple CSV writer to avoid importing writer again
-    import csv as _csv
-    with open(output_csv, "w", encoding="utf-8", newline="") as f:
-        _csv.writer(f, lineterminator="\n").writerows(out_rows)
-    return output_csv
-
-def gen_vcard_from_rows(rows: List[List[str]], output_vcf: str, etiqueta: str = "General") -> str:
+_CHUNK_ROWS = 500
+_TEL_URI_RE = re.compile(r"[^\d+]")
+
+
+class Export(NamedTuple):
+    file: Optional[IO[bytes]]  # None si se reenvía por file_id
+    filename: str
+    size: int
+    rows: int
+    key: Tuple = ()
+    digest: str = ""
+    file_id: str = ""
+    mark: int = 0  # generación de export_marks exportada (marca para el próximo delta)
+
+
+def contacts_csv_chunks(rows: Iterable[Contact]) -> Iterator[bytes]:
+    """CSV para Google Contacts, de a _CHUNK_ROWS filas por bloque."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(GOOGLE_HEADERS)
+    for i, c in enumerate(rows, 1):
+        writer.writerow([c.nombre, c.apellido, c.telefono, c.estado, c.dni, c.observacion])
+        if i % _CHUNK_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def vcard_chunks(rows: Iterable[Contact], etiqueta: str = "General") -> Iterator[bytes]:
+    """Una vCard 4.0 por contacto con teléfono."""
     count = 0
-    os.makedirs(os.path.dirname(output_vcf) or ".", exist_ok=True)
-    with open(output_vcf, "w", encoding="utf-8", newline="") as f:
-        for row in rows:
-            row = _pad_row(row, len(CSV_HEADERS))
-            nombre = row[IDX["Nombre"]].strip()
-            telefono = row[IDX["Teléfono"]].strip()
-            if not telefono:
-                continue
-            count += 1
-            telefono_uri = re.sub(r"[^\d+]", "", telefono)
-            display = f"Fiscal {etiqueta} {nombre}" if nombre else f"Fiscal {etiqueta} {count}"
-            f.write("BEGIN:VCARD\n")
-            f.write("VERSION:4.0\n")
-            f.write(f"FN:{display}\n")
-            f.write(f"TEL;TYPE=CELL;VALUE=uri:tel:{telefono_uri}\n")
-            f.write("END:VCARD\n")
-    return output_vcf
+    for row in rows:
+        row = Contact.from_row(row)
+        nombre = row.nombre.strip()
+        telefono = row.telefono.strip()
+        if not telefono:
+            continue
+        count += 1
+        telefono_uri = _TEL_URI_RE.sub("", telefono)
+        display = f"Fiscal {etiqueta} {nombre}" if nombre else f"Fiscal {etiqueta} {count}"
+        yield (
+            "BEGIN:VCARD\n"
+            "VERSION:4.0\n"
+            f"FN:{display}\n"
+            f"TEL;TYPE=CELL;VALUE=uri:tel:{telefono_uri}\n"
+            "END:VCARD\n"
+        ).encode("utf-8")
 
-def gen_vcard_any(output_vcf: str, etiqueta: str = "General") -> str:
-    rows = read_lista_any()
-    return gen_vcard_from_rows(rows, output_vcf, etiqueta)
 
+class _Spool(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile con nombre: PTB lo lee como archivo (sin nombre falla)."""
+
+    def __init__(self, filename: str):
+        super().__init__(max_size=EXPORT_SPOOL_MAX)
+        self._filename = filename
+
+    @property
+    def name(self) -> str:
+        return self._filename
+
+
+def spool_export(chunks: Iterable[bytes], filename: str, rows: int = 0) -> Export:
+    """Vuelca los bloques a un buffer; si supera EXPORT_COMPRESS_OVER lo comprime en zip."""
+    raw = _Spool(filename)
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+        raw.write(chunk)
+    size = raw.tell()
+    raw.seek(0)
+    if EXPORT_COMPRESS_OVER <= 0 or size <= EXPORT_COMPRESS_OVER:
+        return Export(raw, filename, size, rows, digest=digest.hexdigest())
+    packed = _Spool(f"{filename}.zip")
+    with raw, zipfile.ZipFile(packed, "w", zipfile.ZIP_DEFLATED) as zf, zf.open(filename, "w") as dst:
+        shutil.copyfileobj(raw, dst)
+    size = packed.tell()
+    packed.seek(0)
+    return Export(packed, packed.name, size, rows, digest=digest.hexdigest())
+
+
+# (tipo, parámetro) -> {"version", "digest", "filename", "size", "rows", "file_id"}
+_EXPORT_CACHE: Dict[Tuple, dict] = {}
+_EXPORT_LOCK = threading.Lock()
+_EXPORT_STATS = {"hits": 0, "same_content": 0, "generated": 0}
+
+
+def _cached_export(key: Tuple, build) -> Export:
+    """Export de la versión vigente: del cache si hay file_id, si no generándolo."""
+    read_lista_any()  # refresca el store según la TTL
+    version, rows = get_contact_store().snapshot()
+    mark = current_mark(rows, version)
+    with _EXPORT_LOCK:
+        entry = _EXPORT_CACHE.get(key)
+        if entry and entry["version"] == version and entry["file_id"]:
+            _EXPORT_STATS["hits"] += 1
+            return Export(None, entry["filename"], entry["size"], entry["rows"], key, entry["digest"], entry["file_id"], mark)
+    export = build(rows)
+    with _EXPORT_LOCK:
+        _EXPORT_STATS["generated"] += 1
+        entry = _EXPORT_CACHE.get(key)
+        if entry and entry["digest"] == export.digest and entry["file_id"]:
+            # La lista cambió pero el archivo es el mismo: alcanza con el file_id
+            _EXPORT_STATS["same_content"] += 1
+            entry["version"] = version
+            export.file.close()
+            return export._replace(file=None, key=key, file_id=entry["file_id"], mark=mark)
+        _EXPORT_CACHE[key] = {
+            "version": version, "digest": export.digest, "filename": export.filename,
+            "size": export.size, "rows": export.rows, "file_id": "",
+        }
+    return export._replace(key=key, mark=mark)
+
+
+def remember_file_id(export: Export, file_id: str) -> None:
+    """Guarda el file_id que devolvió Telegram para ese contenido."""
+    with _EXPORT_LOCK:
+        entry = _EXPORT_CACHE.get(export.key)
+        if entry and entry["digest"] == export.digest:
+            entry["file_id"] = file_id
+
+
+def forget_file_id(export: Export) -> None:
+    """El file_id dejó de servir (Telegram lo rechazó): la próxima vez se sube de nuevo."""
+    with _EXPORT_LOCK:
+        _EXPORT_CACHE.pop(export.key, None)
+
+
+def export_cache_stats() -> Dict[str, int]:
+    with _EXPORT_LOCK:
+        return dict(_EXPORT_STATS, entries=len(_EXPORT_CACHE))
+
+
+def export_contacts_any() -> Export:
+    return _cached_export(
+        ("contacts",),
+        lambda rows: spool_export(contacts_csv_chunks(rows), "contacts.csv", len(rows)),
+    )
+
+
+def export_vcard_any(etiqueta: str = "General") -> Export:
+    return _cached_export(
+        ("vcard", etiqueta),
+        lambda rows: spool_export(vcard_chunks(rows, etiqueta), "lista.vcf", len(rows)),
+    )
+
+
+def export_contacts_delta(since: int) -> Export:
+    """Google Contacts CSV con lo agregado o cambiado después de la marca since."""
+    read_lista_any()
+    version, rows = get_contact_store().snapshot()
+    mark, rows = changed_since(rows, since, version=version)
+    return spool_export(contacts_csv_chunks(rows), "contacts_nuevos.csv", len(rows))._replace(mark=mark)
+
+
+def export_vcard_delta(since: int, etiqueta: str = "General") -> Export:
+    """vCard con los contactos nuevos o cuyo nombre/teléfono cambió después de since."""
+    read_lista_any()
+    version, rows = get_contact_store().snapshot()
+    mark, rows = changed_since(rows, since, card_only=True, version=version)
+    rows = [r for r in rows if r.telefono.strip()]
+    return spool_export(vcard_chunks(rows, etiqueta), "lista_nuevos.vcf", len(rows))._replace(mark=mark)
+
+
+def _write_chunks(chunks: Iterable[bytes], path: str) -> str:
+    import os
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
+
+
+# Versiones a disco (para usar desde la consola)
+def gen_contacts_any(output_csv: str) -> str:
+    return _write_chunks(contacts_csv_chunks(read_lista_any()), output_csv)
+
+
+def gen_vcard_from_rows(rows: List[Contact], output_vcf: str, etiqueta: str = "General") -> str:
+    return _write_chunks(vcard_chunks(rows, etiqueta), output_vcf)
+
+
+def gen_vcard_any(output_vcf: str, etiqueta: str = "General") -> str:
+    return gen_vcard_from_rows(read_lista_any(), output_vcf, etiqueta)
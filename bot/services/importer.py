@@ -0,0 +1,137 @@
+"""
+Importación masiva de contactos desde un CSV o XLSX.
+
+Las filas se validan a medida que se leen, con las mismas reglas que /add
+(teléfono limpio con _clean_phone), y se envían a bulk_upsert_any(), que
+resuelve altas/actualizaciones contra el índice en memoria y escribe todo en
+lotes, de a _CHUNK_ROWS filas: el archivo nunca se carga entero en memoria como
+contactos. XLSX requiere openpyxl (opcional).
+"""
+import csv
+import io
+import itertools
+import re
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .contact import Contact, _clean_phone
+from .lista import bulk_upsert_any
+
+try:
+    import openpyxl
+except ImportError:  # XLSX deshabilitado; CSV sigue funcionando
+    openpyxl = None
+
+_PHONE_RE = re.compile(r"\+?\d+")
+_MAX_ERRORS_KEPT = 20
+_CHUNK_ROWS = 1000
+
+# Encabezado normalizado -> campo de Contact
+_COLUMN_ALIASES = {
+    "nombre": "nombre",
+    "nombres": "nombre",
+    "apellido": "apellido",
+    "apellidos": "apellido",
+    "telefono": "telefono",
+    "celular": "telefono",
+    "tel": "telefono",
+    "dni": "dni",
+    "documento": "dni",
+    "estado": "estado",
+    "observacion": "observacion",
+    "observaciones": "observacion",
+}
+
+
+def _header_key(s) -> str:
+    s = "".join(c for c in unicodedata.normalize("NFKD", str(s or "")) if not unicodedata.combining(c))
+    return s.strip().lower()
+
+
+def _column_map(header: List[str]) -> Dict[str, int]:
+    cols: Dict[str, int] = {}
+    for i, name in enumerate(header):
+        field = _COLUMN_ALIASES.get(_header_key(name))
+        if field and field not in cols:
+            cols[field] = i
+    return cols
+
+
+def _csv_records(data: bytes) -> Iterator[List[str]]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("latin-1")
+    sample = text[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return csv.reader(io.StringIO(text), dialect)
+
+
+def _xlsx_records(data: bytes) -> Iterator[List[str]]:
+    if openpyxl is None:
+        raise RuntimeError("Para importar XLSX hace falta instalar openpyxl.")
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for values in wb.active.iter_rows(values_only=True):
+            yield ["" if v is None else _cell_text(v) for v in values]
+    finally:
+        wb.close()
+
+
+def _cell_text(v) -> str:
+    # Excel guarda teléfonos y DNI como número: 1123456789.0 -> "1123456789"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def parse_rows(data: bytes, filename: str) -> Iterator[Tuple[int, Optional[Contact], str]]:
+    """(línea, contacto o None, motivo del rechazo) por cada fila de datos del archivo."""
+    records = _xlsx_records(data) if filename.lower().endswith(".xlsx") else _csv_records(data)
+    header = next(records, None)
+    cols = _column_map(header or [])
+    if "telefono" not in cols and "dni" not in cols:
+        raise ValueError("El archivo necesita una columna Teléfono o DNI en la primera fila.")
+    for line, record in enumerate(records, start=2):
+        if not any(str(v).strip() for v in record):
+            continue
+        values = {f: (record[i].strip() if i < len(record) else "") for f, i in cols.items()}
+        phone = _clean_phone(values.get("telefono", ""))
+        if phone and not _PHONE_RE.fullmatch(phone):
+            yield line, None, f"teléfono inválido ({values['telefono']})"
+            continue
+        if not phone and not values.get("dni"):
+            yield line, None, "sin teléfono ni DNI"
+            continue
+        values["telefono"] = phone
+        yield line, Contact(**values), ""
+
+
+def import_contacts(data: bytes, filename: str) -> Dict[str, object]:
+    """Valida e inserta/actualiza; devuelve conteos y los primeros rechazos."""
+    errors: List[str] = []
+    rejected = [0]
+
+    def _valid(parsed: Iterable[Tuple[int, Optional[Contact], str]]) -> Iterator[Contact]:
+        for line, contact, reason in parsed:
+            if contact is None:
+                rejected[0] += 1
+                if len(errors) < _MAX_ERRORS_KEPT:
+                    errors.append(f"línea {line}: {reason}")
+                continue
+            yield contact
+
+    counts = {"new": 0, "updated": 0, "unchanged": 0}
+    contacts = _valid(parse_rows(data, filename))
+    new_positions: Set[int] = set()
+    # Cada tanda se valida antes de tomar el lock de escritura
+    while True:
+        chunk = list(itertools.islice(contacts, _CHUNK_ROWS))
+        if not chunk:
+            break
+        for key, n in bulk_upsert_any(chunk, new_positions).items():
+            counts[key] += n
+    return dict(counts, rejected=rejected[0], errors=errors)
@@ -1,133 +1,469 @@
 import os
-import csv
-import re
+import logging
+import threading
+import time
 import unicodedata
-from typing import List
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from bot.config import CSV_DEFAULT, CSV_HEADERS, IDX, USE_SHEETS
-from .sheets import _open_sheet
+from gspread.utils import rowcol_to_a1
+
+from bot.config import CSV_DEFAULT, CSV_HEADERS, IDX, STORAGE_BACKEND
+from .contact import Contact
+from .contact_store import ContactStore, RowLike
+from .sheets import _open_sheet, with_sheets_session
+from .sheets_writer import get_write_queue
+from .csv_journal import get_journal
+from .estado import EN_CONTACTO, PENDIENTE, parse_estado
+from . import sqlite_backend
+
+# Copia indexada de la lista: cache read-through con TTL, parcheada por cada escritura del bot
+_STORE = ContactStore()
+_TTL_SECONDS = float(os.environ.get("LISTA_CACHE_TTL", "15"))
+# Stale-while-revalidate: al vencer, devolver la copia actual y recargar en segundo plano
+_SWR = os.environ.get("LISTA_CACHE_SWR", "0").strip() == "1"
+_CACHE_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "reloads": 0, "estado_refreshes": 0}
+_REFRESH_LOCK = threading.Lock()
+_COMPACT_LOCK = threading.Lock()
+# Sheets: última vez que se revalidó solo la columna Estado (lectura proyectada)
+_ESTADOS_AT = [0.0]
+# Serializa las escrituras del proceso (store + backend) entre los hilos del pool
+_WRITE_LOCK = threading.RLock()
+# Se incrementa con cada escritura: una lectura que se cruzó con una escritura se descarta
+_WRITE_GEN = [0]
+
+def _serialized(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _WRITE_LOCK:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _WRITE_GEN[0] += 1
+    return wrapper
 
 def _norm(s: str) -> str:
     s = s.strip()
     s = "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
     return s.lower()
 
-def _clean_phone(s: str) -> str:
-    return s.strip().replace(" ", "").replace("-", "")
+def _compact_csv_in_background() -> None:
+    """Vuelca el journal del CSV al archivo base sin frenar las escrituras."""
+    journal = get_journal(CSV_DEFAULT)
+    if not journal.needs_compaction() or not _COMPACT_LOCK.acquire(blocking=False):
+        return
 
-def _read_csv_rows(path: str) -> List[List[str]]:
-    if not os.path.exists(path):
-        return []
-    with open(path, mode="r", encoding="utf-8-sig") as f:
-        return list(csv.reader(f))
+    def _run():
+        try:
+            with _WRITE_LOCK:
+                epoch = journal.begin_compaction()
+                snapshot = [CSV_HEADERS] + _STORE.rows()
+                _WRITE_GEN[0] += 1
+            tmp = journal.write_snapshot(snapshot)
+            with _WRITE_LOCK:
+                journal.commit_compaction(tmp, epoch)
+                _WRITE_GEN[0] += 1
+        except Exception:
+            logging.exception("Falló la compactación del journal de %s.", CSV_DEFAULT)
+        finally:
+            _COMPACT_LOCK.release()
 
-def _write_csv_rows(path: str, rows: List[List[str]]):
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, lineterminator="\n")
-        writer.writerows(rows)
+    threading.Thread(target=_run, name="csv-compact", daemon=True).start()
 
-def _pad_row(row: List[str], n: int) -> List[str]:
-    if len(row) < n:
-        return row + [""] * (n - len(row))
-    return row[:n]
+def get_contact_store() -> ContactStore:
+    """Store cargado (lee la lista solo si todavía no se cargó)."""
+    if not _STORE.loaded:
+        _ensure_loaded()
+    return _STORE
 
-def read_lista_any() -> List[List[str]]:
-    if USE_SHEETS:
-        ws = _open_sheet()
-        vals = ws.get_all_values()
-        body = [_pad_row(r, len(CSV_HEADERS)) for r in (vals[1:] if vals else [])]
-        return body
-    else:
-        rows = _read_csv_rows(CSV_DEFAULT)
-        body = [_pad_row(r, len(CSV_HEADERS)) for r in (rows[1:] if rows else [])]
-        return body
+def read_lista_any(fresh: bool = False) -> List[Contact]:
+    """Lista completa desde la cache; fresh=True fuerza leer el backend."""
+    _ensure_loaded(fresh)
+    return _STORE.rows()
 
-def set_lista_any(rows: List[List[str]]):
-    rows = [_pad_row(r, len(CSV_HEADERS)) for r in rows]
-    if USE_SHEETS:
+def _ensure_loaded(fresh: bool = False) -> None:
+    """Deja el store vigente según la TTL, sin copiar la lista."""
+    if not fresh and _STORE.loaded:
+        if time.monotonic() - _STORE.loaded_at < _TTL_SECONDS:
+            _CACHE_STATS["hits"] += 1
+            return
+        if _SWR:
+            _CACHE_STATS["stale"] += 1
+            _refresh_in_background()
+            return
+    _CACHE_STATS["misses"] += 1
+    _reload_store()
+
+def lista_cache_stats() -> Dict[str, int]:
+    return dict(_CACHE_STATS)
+
+def invalidate_lista_cache() -> None:
+    """La próxima lectura va al backend (p.ej. tras editar la hoja a mano)."""
+    _STORE.loaded_at = 0.0
+
+@with_sheets_session
+def _fetch_backend() -> List[List[str]]:
+    if STORAGE_BACKEND == "sheets":
         ws = _open_sheet()
-        ws.clear()
-        ws.update(values=[CSV_HEADERS] + rows, range_name="A1")
-    else:
-        _write_csv_rows(CSV_DEFAULT, [CSV_HEADERS] + rows)
+        writes = get_write_queue()
+        # Lectura y overlay sin un flush cruzado (no pierde ni duplica las escrituras propias)
+        return writes.read_consistent(
+            ws.get_all_values,
+            lambda vals: writes.overlay(ws, vals[1:] if vals else [], len(CSV_HEADERS)),
+        )
+    if STORAGE_BACKEND == "sqlite":
+        return sqlite_backend.read_rows()
+    return get_journal(CSV_DEFAULT).read_rows()
+
+def _reload_store() -> None:
+    for _ in range(2):
+        gen = _WRITE_GEN[0]
+        body = _fetch_backend()
+        with _WRITE_LOCK:
+            # Si alguien escribió mientras leíamos, lo leído puede no incluirlo
+            if gen == _WRITE_GEN[0] or not _STORE.loaded:
+                _STORE.load(body)
+                _assign_missing_ids()
+                _CACHE_STATS["reloads"] += 1
+                return
+    # Escrituras continuas: la copia en memoria ya está parcheada por ellas
+    _STORE.touch()
 
-def append_contact_any(row: List[str]) -> str:
+@with_sheets_session
+def _assign_missing_ids() -> None:
+    """
+    Migración: las filas sin ID (hoja/CSV de antes de la columna, filas agregadas
+    a mano o copiadas con el ID de otra) reciben uno nuevo y se guarda.
+    """
+    missing = _STORE.without_id()
+    if not missing:
+        return
+    new_ids = {p: _STORE.new_id() for p in missing}
+    if STORAGE_BACKEND == "sheets":
+        # Primero la hoja: si falla, el store no queda con IDs que no se guardaron
+        _write_id_column(_open_sheet(), new_ids)
+    assigned = {p: _STORE.set_row(p, _STORE.row(p).replace(id=row_id)) for p, row_id in new_ids.items()}
+    if STORAGE_BACKEND not in ("sheets", "sqlite"):
+        journal = get_journal(CSV_DEFAULT)
+        if "ID" not in journal.header():
+            journal.rewrite([CSV_HEADERS] + _STORE.rows())
+        else:
+            for p, row in assigned.items():
+                journal.set_row(p, row)
+            _compact_csv_in_background()
+    _WRITE_GEN[0] += 1
+    logging.info("Se asignó ID a %d fila(s) de la lista.", len(assigned))
+
+def _write_id_column(ws, new_ids: Dict[int, str]) -> None:
+    """
+    Encabezado e IDs de toda la columna en un único update (síncrono: un error
+    se propaga). Si la hoja no llega a esa columna, antes se agregan columnas.
+    """
+    col = _col_number_from_idx(IDX["ID"])
+    # Lo encolado (altas incluidas) tiene que estar en la hoja antes de escribir por posición
+    get_write_queue().flush()
+    if ws.col_count < col:
+        ws.add_cols(col - ws.col_count)
+    rows = _STORE.rows()
+    letter = _col_letter(IDX["ID"])
+    values = [["ID"]] + [[new_ids.get(p, r.id)] for p, r in enumerate(rows)]
+    ws.update(values=values, range_name=f"{letter}1:{letter}{len(rows) + 1}")
+    try:
+        ws.hide_columns(col - 1, col)
+    except Exception:
+        logging.warning("No se pudo ocultar la columna ID de la hoja.")
+
+def _refresh_in_background() -> None:
+    if not _REFRESH_LOCK.acquire(blocking=False):
+        return  # ya hay una recarga en curso
+
+    def _run():
+        try:
+            _reload_store()
+        except Exception:
+            logging.exception("Falló la recarga en segundo plano de la lista.")
+        finally:
+            _REFRESH_LOCK.release()
+
+    threading.Thread(target=_run, name="lista-refresh", daemon=True).start()
+
+@with_sheets_session
+@_serialized
+def append_contact_any(row: RowLike) -> str:
     """Inserta o actualiza por Teléfono/DNI. Devuelve 'new' o 'updated'."""
-    row = _pad_row(row, len(CSV_HEADERS))
-    if USE_SHEETS:
+    row = Contact.from_row(row)
+    store = get_contact_store()
+    if STORAGE_BACKEND == "sheets":
         ws = _open_sheet()
-        vals = ws.get_all_values()
-        if not vals:
+        writes = get_write_queue()
+        if not len(store) and not writes.has_pending(ws):
             ws.update(values=[CSV_HEADERS], range_name="A1")
-            ws.append_row(row)
-            return "new"
-        body = [_pad_row(r, len(CSV_HEADERS)) for r in vals[1:]]
-        for i, r in enumerate(body):
-            if r[IDX["Teléfono"]] == row[IDX["Teléfono"]] or (row[IDX["DNI"]] and r[IDX["DNI"]] == row[IDX["DNI"]]):
-                ws.update(values=[row], range_name=f"A{i+2}:F{i+2}")  # 6 columnas
-                return "updated"
-        ws.append_row(row)
+        i = store.find(row.telefono, row.dni)
+        if i >= 0:
+            writes.set_row(ws, i + 2, store.set_row(i, row))
+            return "updated"
+        i = store.append(row)
+        writes.append_row(ws, store.row(i))
         return "new"
-    else:
-        rows = read_lista_any()
-        for i, r in enumerate(rows):
-            if r[IDX["Teléfono"]] == row[IDX["Teléfono"]] or (row[IDX["DNI"]] and r[IDX["DNI"]] == row[IDX["DNI"]]):
-                rows[i] = row
-                set_lista_any(rows)
-                return "updated"
-        rows.append(row)
-        set_lista_any(rows)
+    elif STORAGE_BACKEND == "sqlite":
+        i = store.find(row.telefono, row.dni)
+        if i >= 0:
+            row = row.replace(id=store.row(i).id)
+            sqlite_backend.update_rows([row])
+            store.set_row(i, row)
+            return "updated"
+        store.append(row.replace(id=str(sqlite_backend.insert_row(row.replace(id="")))))
         return "new"
+    else:
+        i, result = store.upsert(row)
+        get_journal(CSV_DEFAULT).set_row(i, store.row(i))
+        _compact_csv_in_background()
+        return result
 
-def filter_by_status(rows: List[List[str]], estado: str) -> List[List[str]]:
-    return [r for r in rows if len(r) > IDX["Estado"] and r[IDX["Estado"]] == estado]
+@with_sheets_session
+@_serialized
+def bulk_upsert_any(rows: Iterable[RowLike], new_positions: Optional[Set[int]] = None) -> Dict[str, int]:
+    """
+    Alta/actualización masiva por Teléfono/DNI contra el índice en memoria, con
+    las escrituras en lote (Sheets: un batch_update y un append_rows). Una fila
+    sin Estado conserva el Estado/Observación actuales; si es nueva queda 'Pendiente'.
+    new_positions (opcional) junta las altas entre llamadas de una misma
+    importación por tandas, para que repetir una alta de otra tanda no cuente
+    como actualización. Devuelve {'new': n, 'updated': n, 'unchanged': n}.
+    """
+    store = get_contact_store()
+    counts = {"new": 0, "updated": 0, "unchanged": 0}
+    updated: Dict[int, Contact] = {}
+    added: List[int] = []
+    if new_positions is None:
+        new_positions = set()
+    for row in rows:
+        row = Contact.from_row(row)
+        i = store.find(row.telefono, row.dni)
+        if i >= 0:
+            current = store.row(i)
+            if not row.estado:
+                row = row.replace(estado=current.estado, observacion=current.observacion)
+            row = row.replace(id=current.id)
+            if row == current:
+                counts["unchanged"] += 1
+                continue
+            updated[i] = store.set_row(i, row)
+            if i not in new_positions:
+                counts["updated"] += 1
+        else:
+            i = store.append(row if row.estado else row.replace(estado="Pendiente"))
+            added.append(i)
+            new_positions.add(i)
+            counts["new"] += 1
+    # Una fila nueva que se repite en el archivo se escribe una sola vez, ya actualizada
+    added_now = set(added)
+    updated = {i: r for i, r in updated.items() if i not in added_now}
+    if STORAGE_BACKEND == "sheets":
+        ws = _open_sheet()
+        writes = get_write_queue()
+        if added and len(store) == len(added) and not writes.has_pending(ws):
+            ws.update(values=[CSV_HEADERS], range_name="A1")
+        # Todo junto: un batch_update para las actualizaciones y un append_rows para las altas
+        if updated:
+            writes.set_rows(ws, {i + 2: row for i, row in updated.items()})
+        if added:
+            writes.append_rows(ws, [store.row(i) for i in added])
+        writes.flush()
+    elif STORAGE_BACKEND == "sqlite":
+        sqlite_backend.update_rows(updated.values())
+        ids = sqlite_backend.insert_rows([store.row(i).replace(id="") for i in added])
+        for i, row_id in zip(added, ids):
+            store.set_row(i, store.row(i).replace(id=str(row_id)))
+    else:
+        journal = get_journal(CSV_DEFAULT)
+        for i in sorted(list(updated) + added):
+            journal.set_row(i, store.row(i))
+        _compact_csv_in_background()
+    return counts
+
+def read_by_status(estado: str) -> List[Contact]:
+    return [r for _, r in read_positions_by_status(estado)]
+
+def read_positions_by_status(estado: str) -> List[Tuple[int, Contact]]:
+    """
+    [(posición, fila)] con ese Estado. En Sheets, si la cache venció, solo se
+    vuelve a leer la columna Estado (no las seis) para revalidar los estados.
+    """
+    _revalidate_estados()
+    return [(p, _STORE.row(p)) for p in _STORE.positions(estado)]
+
+def read_reserved_positions(owner_label: Optional[str] = None) -> List[Tuple[int, Contact]]:
+    """[(posición, fila)] reservadas por owner_label (o por cualquiera), desde el índice por dueño."""
+    _revalidate_estados()
+    positions = _STORE.reserved() if owner_label is None else _STORE.reserved_by(owner_label)
+    return [(p, _STORE.row(p)) for p in positions]
+
+def _revalidate_estados() -> None:
+    if STORAGE_BACKEND == "sheets" and _STORE.loaded:
+        now = time.monotonic()
+        if now - max(_STORE.loaded_at, _ESTADOS_AT[0]) >= _TTL_SECONDS:
+            _refresh_estados()
+    else:
+        _ensure_loaded()
+
+# --- Lecturas proyectadas de Sheets (una columna / algunas filas) ---
+
+def _col_letter(idx0: int) -> str:
+    return rowcol_to_a1(1, idx0 + 1).rstrip("0123456789")
+
+def _sheet_columns(ws, idxs: List[int]) -> List[List[str]]:
+    """Valores de algunas columnas desde la fila 2 (un solo batch_get), con lo pendiente de la cola aplicado."""
+    letters = [_col_letter(i) for i in idxs]
+    writes = get_write_queue()
+
+    def read() -> List[List[str]]:
+        fetched = ws.batch_get([f"{letter}2:{letter}" for letter in letters], major_dimension="COLUMNS")
+        return [list(vals[0]) if vals else [] for vals in fetched]
+
+    def apply(columns: List[List[str]]) -> List[List[str]]:
+        return [writes.overlay_column(ws, column, i + 1) for column, i in zip(columns, idxs)]
+
+    # Igual que _fetch_backend: un flush que termina durante la lectura no borra los Estados propios
+    return writes.read_consistent(read, apply)
+
+@with_sheets_session
+def _refresh_estados() -> None:
+    """
+    Relee Estado e ID. Los IDs confirman el mapa ID -> fila que usan las
+    escrituras: si la hoja se reordenó a mano, se recarga todo.
+    """
+    gen = _WRITE_GEN[0]
+    column, ids = _sheet_columns(_open_sheet(), [IDX["Estado"], IDX["ID"]])
+    with _WRITE_LOCK:
+        if gen != _WRITE_GEN[0]:
+            return  # una escritura ya dejó el store al día
+        current = _STORE.rows()
+        if len(column) > len(current) or len(ids) > len(current):
+            # Aparecieron filas nuevas fuera del bot: hace falta la lectura completa
+            _reload_store()
+            return
+        ids += [""] * (len(current) - len(ids))
+        if any(row_id != r.id for row_id, r in zip(ids, current)):
+            logging.warning("La columna ID de la hoja no coincide con la lista en memoria (¿se reordenó?); se recarga.")
+            _reload_store()
+            return
+        column += [""] * (len(current) - len(column))
+        for p, actual in enumerate(column):
+            if current[p].estado != actual:
+                _STORE.set_estado(p, actual)
+        _ESTADOS_AT[0] = time.monotonic()
+        _CACHE_STATS["estado_refreshes"] += 1
 
 def _col_number_from_idx(idx0: int) -> int:
     return idx0 + 1
 
-def _find_by_keys_fallback(all_rows: List[List[str]], target: List[str]) -> int:
-    target = _pad_row(target, len(CSV_HEADERS))
-    tel = target[IDX["Teléfono"]].strip()
-    dni = target[IDX["DNI"]].strip()
-    for i, r in enumerate(all_rows):
-        r = _pad_row(r, len(CSV_HEADERS))
-        if (r[IDX["Teléfono"]].strip() == tel) or (dni and r[IDX["DNI"]].strip() == dni):
-            return i
-    return -1
-
-def update_estado_by_row_index(abs_index: int, nuevo_estado: str, base_rows: List[List[str]], observacion: str = "") -> None:
-    """Actualiza Estado (y Observación si aplica) en la fila real correspondiente."""
-    if USE_SHEETS:
-        all_rows = read_lista_any()
-        target = _pad_row(base_rows[abs_index], len(CSV_HEADERS))
-        try:
-            real_idx = next(i for i, r in enumerate(all_rows) if _pad_row(r, len(CSV_HEADERS)) == target)
-        except StopIteration:
-            real_idx = _find_by_keys_fallback(all_rows, target)
-        if real_idx < 0:
-            raise RuntimeError("No se encontró la fila a actualizar.")
+@with_sheets_session
+@_serialized
+def update_estado_by_id(row_id: str, nuevo_estado: str, observacion: str = "") -> None:
+    """
+    Actualiza Estado (y Observación si aplica) de la fila con ese ID: una sola
+    escritura, en la posición del índice en memoria (sin leer la hoja bajo el
+    lock; _refresh_estados verifica la columna ID y recarga si la hoja se movió).
+    """
+    store = get_contact_store()
+    row_id = str(row_id)
+    real_idx = store.position_of(row_id)
+    if real_idx < 0:
+        raise RuntimeError("No se encontró la fila a actualizar.")
+    kind = parse_estado(nuevo_estado).kind
+    if nuevo_estado == "Contactar Luego":
+        nueva_obs = observacion or ""
+    elif kind in (PENDIENTE, EN_CONTACTO):
+        nueva_obs = ""
+    else:
+        nueva_obs = None
+    if STORAGE_BACKEND == "sheets":
         ws = _open_sheet()
+        writes = get_write_queue()
         row = real_idx + 2  # header +1
-        ws.update_cell(row, _col_number_from_idx(IDX["Estado"]), nuevo_estado)
-        if nuevo_estado == "Contactar Luego":
-            ws.update_cell(row, _col_number_from_idx(IDX["Observación"]), observacion or "")
-        elif nuevo_estado == "Pendiente" or nuevo_estado.startswith("En contacto"):
-            ws.update_cell(row, _col_number_from_idx(IDX["Observación"]), "")
+        writes.set_cell(ws, row, _col_number_from_idx(IDX["Estado"]), nuevo_estado)
+        if nueva_obs is not None:
+            writes.set_cell(ws, row, _col_number_from_idx(IDX["Observación"]), nueva_obs)
+        store.set_estado(real_idx, nuevo_estado, nueva_obs)
+        return
+    if STORAGE_BACKEND == "sqlite":
+        sqlite_backend.set_estado(int(row_id), nuevo_estado, nueva_obs)
+        store.set_estado(real_idx, nuevo_estado, nueva_obs)
     else:
-        rows = read_lista_any()
-        target = _pad_row(base_rows[abs_index], len(CSV_HEADERS))
-        try:
-            real_idx = next(i for i, r in enumerate(rows) if _pad_row(r, len(CSV_HEADERS)) == target)
-        except StopIteration:
-            real_idx = _find_by_keys_fallback(rows, target)
-        if 0 <= real_idx < len(rows):
-            r = _pad_row(rows[real_idx], len(CSV_HEADERS))
-            r[IDX["Estado"]] = nuevo_estado
-            if nuevo_estado == "Contactar Luego":
-                r[IDX["Observación"]] = observacion or ""
-            elif nuevo_estado == "Pendiente" or nuevo_estado.startswith("En contacto"):
-                r[IDX["Observación"]] = ""
-            rows[real_idx] = r
-            set_lista_any(rows)
+        store.set_estado(real_idx, nuevo_estado, nueva_obs)
+        get_journal(CSV_DEFAULT).set_estado(real_idx, nuevo_estado, nueva_obs)
+        _compact_csv_in_background()
+
+@with_sheets_session
+@_serialized
+def compare_and_set_estado(expected: Dict[int, str], nuevo_estado: str, observacion: str = "") -> List[int]:
+    """
+    Compare-and-set por fila: {posición: Estado esperado}. Solo escribe nuevo_estado
+    (y Observación) donde el Estado actual del backend sigue siendo el esperado.
+    Devuelve las posiciones ganadas; las perdidas se corrigen en el store.
+    """
+    store = get_contact_store()
+    positions = [p for p in expected if 0 <= p < len(store)]
+    won: List[int] = []
+    if not positions:
+        return won
+    col = _col_number_from_idx(IDX["Estado"])
+    if STORAGE_BACKEND == "sheets":
+        ws = _open_sheet()
+        writes = get_write_queue()
+        id_col = _col_number_from_idx(IDX["ID"])
 
+        def apply(fetched) -> List[Tuple[str, str]]:
+            # Lo que aún no se envió manda sobre lo leído (aplicado sin un flush en el medio)
+            pending = writes.pending_cells(ws)
+            out = []
+            for p, value_range in zip(positions, fetched):
+                cells = list(value_range[0]) if value_range and value_range[0] else []
+                cells += [""] * (id_col - col + 1 - len(cells))
+                out.append((pending.get((p + 2, col), cells[0]), pending.get((p + 2, id_col), cells[-1])))
+            return out
+
+        # Una sola lectura de Estado..ID de las filas candidatas
+        current = writes.read_consistent(
+            lambda: ws.batch_get([f"{rowcol_to_a1(p + 2, col)}:{rowcol_to_a1(p + 2, id_col)}" for p in positions]),
+            apply,
+        )
+        moved = False
+        for p, (actual, actual_id) in zip(positions, current):
+            if actual_id and actual_id != store.row(p).id:
+                # La fila ya no es la que creemos (la hoja se reordenó): no se toca
+                moved = True
+                continue
+            if actual == expected[p]:
+                writes.set_cell(ws, p + 2, col, nuevo_estado)
+                writes.set_cell(ws, p + 2, _col_number_from_idx(IDX["Observación"]), observacion)
+                store.set_estado(p, nuevo_estado, observacion)
+                won.append(p)
+            elif store.row(p).estado != actual:
+                store.set_estado(p, actual)
+        if moved:
+            invalidate_lista_cache()
+    elif STORAGE_BACKEND == "sqlite":
+        for p in positions:
+            row_id = int(store.row(p).id)
+            if sqlite_backend.compare_and_set_estado(row_id, expected[p], nuevo_estado, observacion):
+                store.set_estado(p, nuevo_estado, observacion)
+                won.append(p)
+                continue
+            # Perdida: el store toma el Estado real, como en Sheets
+            actual = sqlite_backend.get_estado(row_id)
+            if actual is None:
+                invalidate_lista_cache()
+            elif store.row(p).estado != actual:
+                store.set_estado(p, actual)
+    else:
+        journal = get_journal(CSV_DEFAULT)
+        for p in positions:
+            if store.row(p).estado == expected[p]:
+                store.set_estado(p, nuevo_estado, observacion)
+                journal.set_estado(p, nuevo_estado, observacion)
+                won.append(p)
+        if won:
+            _compact_csv_in_background()
+    return won
@@ -0,0 +1,151 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from bot.config import RESERVATION_LEASE_MINUTES
+from .contact import Contact
+from .lista import compare_and_set_estado, get_contact_store, read_lista_any, read_reserved_positions
+
+PENDIENTE = "Pendiente"
+_MAX_RETRIES = 3
+_SPREAD = 4
+
+# Métricas de contención (acumuladas desde que arrancó el proceso)
+_STATS: Dict[str, int] = {
+    "requests": 0, "attempted": 0, "claimed": 0, "conflicts": 0, "retries": 0, "released": 0, "expired": 0,
+}
+_STATS_LOCK = threading.Lock()
+
+# Leases de reserva: ID del contacto -> (Estado reservado, vencimiento en time.monotonic())
+_LEASE_SECONDS = RESERVATION_LEASE_MINUTES * 60
+_LEASES: Dict[str, Tuple[str, float]] = {}
+_LEASES_LOCK = threading.Lock()
+
+
+def _count(**deltas: int) -> None:
+    with _STATS_LOCK:
+        for key, value in deltas.items():
+            _STATS[key] += value
+
+
+def reservation_stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def owner_estado(owner_label: str) -> str:
+    return f"En contacto - {owner_label}"
+
+
+def claim_pending(owner_label: str, limit: int = 5, preferred: Iterable[int] = ()) -> List[Tuple[int, Contact]]:
+    """
+    Reserva hasta `limit` filas 'Pendiente' para owner_label con compare-and-set por fila.
+    Primero intenta las posiciones `preferred` (p.ej. la tanda que se le mostró).
+    Si otro voluntario gana alguna fila, recarga y reintenta con otras.
+    Devuelve solo las filas efectivamente ganadas: [(posición, fila), ...].
+    """
+    _count(requests=1)
+    store = get_contact_store()
+    nuevo = owner_estado(owner_label)
+    preferred = list(preferred)
+    won: List[int] = []
+    tried = set()
+    for attempt in range(_MAX_RETRIES + 1):
+        need = limit - len(won)
+        if need <= 0:
+            break
+        ordered = store.positions(PENDIENTE)
+        pending = set(ordered)
+        candidates = [p for p in dict.fromkeys(preferred) if p in pending and p not in tried][:need]
+        if len(candidates) < need:
+            # Elegimos al azar dentro de las primeras pendientes para que voluntarios
+            # simultáneos no apunten todos a las mismas filas
+            window = [p for p in ordered if p not in tried and p not in candidates][: (need - len(candidates)) * _SPREAD]
+            candidates += random.sample(window, min(need - len(candidates), len(window)))
+        if not candidates:
+            break
+        tried.update(candidates)
+        got = compare_and_set_estado({p: PENDIENTE for p in candidates}, nuevo, "")
+        won.extend(got)
+        _grant_leases(got)
+        conflicts = len(candidates) - len(got)
+        _count(attempted=len(candidates), claimed=len(got), conflicts=conflicts)
+        if not conflicts:
+            break
+        logging.info("Reserva de %s: %d conflicto(s) en el intento %d", owner_label, conflicts, attempt + 1)
+        if attempt < _MAX_RETRIES:
+            _count(retries=1)
+            # Nuestra copia estaba vieja: recargar antes de elegir otras filas
+            read_lista_any(fresh=True)
+    return [(p, store.row(p)) for p in sorted(won)]
+
+
+def release_rows(expected: Dict[int, str]) -> List[int]:
+    """Devuelve a 'Pendiente' las posiciones cuyo Estado sigue siendo el esperado (la reserva propia)."""
+    store = get_contact_store()
+    ids = [store.row(p).id for p in expected if 0 <= p < len(store)]
+    released = compare_and_set_estado(expected, PENDIENTE, "")
+    _drop_leases(ids)
+    _count(released=len(released))
+    return released
+
+
+# --- Leases ---
+
+def _grant_leases(positions: Iterable[int]) -> None:
+    store = get_contact_store()
+    expires = time.monotonic() + _LEASE_SECONDS
+    rows = [store.row(p) for p in positions]
+    with _LEASES_LOCK:
+        for row in rows:
+            _LEASES[row.id] = (row.estado, expires)
+
+
+def _drop_leases(row_ids: Iterable[str]) -> None:
+    with _LEASES_LOCK:
+        for row_id in row_ids:
+            _LEASES.pop(row_id, None)
+
+
+def renew_leases(owner_label: str) -> None:
+    """El voluntario sigue activo: sus reservas vuelven a durar un lease completo."""
+    _grant_leases(get_contact_store().reserved_by(owner_label))
+
+
+def expire_leases() -> List[int]:
+    """
+    Devuelve a 'Pendiente', en una sola escritura, las reservas cuyo lease venció.
+    Una reserva sin lease conocido (hecha antes de un reinicio o a mano en la
+    hoja) recibe uno que empieza ahora, así también termina liberándose.
+    """
+    if _LEASE_SECONDS <= 0:
+        return []
+    reserved = {row.id: (p, row.estado) for p, row in read_reserved_positions()}
+    now = time.monotonic()
+    expired: Dict[int, str] = {}
+    with _LEASES_LOCK:
+        for row_id in list(_LEASES):
+            if row_id not in reserved:
+                del _LEASES[row_id]
+        for row_id, (p, estado) in reserved.items():
+            lease = _LEASES.get(row_id)
+            if lease is None or lease[0] != estado:
+                _LEASES[row_id] = (estado, now + _LEASE_SECONDS)
+            elif lease[1] <= now:
+                expired[p] = estado
+    if not expired:
+        return []
+    released = compare_and_set_estado(expired, PENDIENTE, "")
+    _drop_leases(row_id for row_id, (p, _) in reserved.items() if p in expired)
+    _count(expired=len(released))
+    if released:
+        logging.info("Leases vencidos: %d reserva(s) volvieron a 'Pendiente'.", len(released))
+    return released
+
+
+def lease_count() -> int:
+    with _LEASES_LOCK:
+        return len(_LEASES)
+
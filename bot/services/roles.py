@@ -1,35 +1,74 @@
-from typing import Dict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+import logging
 import os
+import threading
 import time
 
 from bot.config import SHEET_ALLOWED, SHEET_ADMINS, USE_SHEETS
-from .sheets import _ensure_worksheet
+from .sheets import _ensure_worksheet, _open_spreadsheet, with_sheets_session
 
-# Simple in-process cache to avoid hitting Sheets quota on every update
+# Simple in-process cache to avoid hitting Sheets quota on every update.
+# Se refresca en segundo plano (refresh_roles); los updates nunca esperan a la
+# hoja salvo la primera carga del proceso.
 _ADMIN_CACHE: dict = {"data": None, "ts": 0.0}
 _ALLOWED_CACHE: dict = {"data": None, "ts": 0.0}
 _TTL_SECONDS = int(os.environ.get("SHEETS_CACHE_TTL", "30"))
+_ROLES_LOCK = threading.Lock()
+# Refresco en curso y último intento (para no reintentar en ráfaga si Sheets falla)
+_REFRESH: dict = {"inflight": False, "attempt": 0.0}
+_RETRY_SECONDS = 5.0
+# Tope de decisiones memorizadas por snapshot (incluye las negativas de desconocidos)
+_MAX_DECISIONS = 10000
 
 
-def _cached_sheet_ids(title: str, cache_store: dict) -> Dict[int, str]:
-    now = time.monotonic()
-    if cache_store["data"] is not None and (now - cache_store["ts"]) < _TTL_SECONDS:
-        return cache_store["data"]
-    data = _read_ids_and_names_from_sheet(title)
-    cache_store["data"] = data
-    cache_store["ts"] = now
-    return data
+class AuthSnapshot(NamedTuple):
+    """
+    Foto inmutable de los roles: conjuntos de ids y nombres ya combinados
+    (entorno + hojas). Sólo se reconstruye cuando cambian los datos de origen.
+    """
+    admins: FrozenSet[int]
+    allowed: FrozenSet[int]
+    admin_names: Dict[int, str]
+    names: Dict[int, str]
+    locked: bool
+    # uid -> (permitido, admin), también para los rechazados
+    decisions: Dict[Optional[int], Tuple[bool, bool]]
 
+    def decide(self, uid: Optional[int]) -> Tuple[bool, bool]:
+        d = self.decisions.get(uid)
+        if d is None:
+            admin = uid is not None and uid in self.admins
+            # Si no hay nadie configurado, no restringimos (modo desarrollo)
+            allowed = (not self.locked) or (uid is not None and uid in self.allowed)
+            d = (allowed, admin)
+            if len(self.decisions) >= _MAX_DECISIONS:
+                self.decisions.clear()
+            self.decisions[uid] = d
+        return d
 
-def _read_ids_and_names_from_sheet(title: str) -> Dict[int, str]:
+
+# Snapshot vigente y las fuentes con que se armó (para saber si hay que rehacerlo)
+_AUTH: dict = {"snap": None, "sources": None}
+_AUTH_LOCK = threading.Lock()
+
+
+def _cached_sheet_ids(title: str, cache_store: dict) -> Dict[int, str]:
     """
-    Lee IDs/nombres (encabezados 'user_id','name' en A1:B1) y devuelve {id: name}.
-    Crea la hoja si no existe.
+    Copia en memoria de la hoja. Vencida se sigue sirviendo mientras se
+    refresca en segundo plano; solo la primera carga lee la hoja en línea.
     """
-    ws = _ensure_worksheet(title, headers=["user_id", "name"])
-    vals = ws.get_all_values()
+    data = cache_store["data"]
+    if data is None:
+        refresh_roles()
+        return cache_store["data"] or {}
+    if time.monotonic() - cache_store["ts"] >= _TTL_SECONDS:
+        _refresh_in_background()
+    return data
+
+
+def _parse_ids_and_names(vals: List[List[str]]) -> Dict[int, str]:
     out: Dict[int, str] = {}
-    for row in (vals[1:] if vals else []):
+    for row in vals:
         if not row:
             continue
         uid_str = (row[0] or "").strip()
@@ -39,6 +78,70 @@ def _read_ids_and_names_from_sheet(title: str) -> Dict[int, str]:
     return out
 
 
+@with_sheets_session
+def _read_ids_and_names_from_sheet(title: str) -> Dict[int, str]:
+    """
+    Lee IDs/nombres (encabezados 'user_id','name' en A1:B1) y devuelve {id: name}.
+    Crea la hoja si no existe.
+    """
+    ws = _ensure_worksheet(title, headers=["user_id", "name"])
+    vals = ws.get_all_values()
+    return _parse_ids_and_names(vals[1:] if vals else [])
+
+
+def _a1_title(title: str) -> str:
+    return "'" + title.replace("'", "''") + "'"
+
+
+@with_sheets_session
+def refresh_roles() -> bool:
+    """
+    Lee Admins y Usuarios permitidos en un único values_batch_get y reemplaza
+    las dos copias juntas. Si falla, se conserva la copia anterior.
+    """
+    if not USE_SHEETS:
+        return False
+    with _ROLES_LOCK:
+        _REFRESH["attempt"] = time.monotonic()
+    try:
+        # Crea las hojas si faltan (los handles quedan cacheados en la sesión)
+        _ensure_worksheet(SHEET_ADMINS, headers=["user_id", "name"])
+        _ensure_worksheet(SHEET_ALLOWED, headers=["user_id", "name"])
+        resp = _open_spreadsheet().values_batch_get(
+            [f"{_a1_title(SHEET_ADMINS)}!A2:B", f"{_a1_title(SHEET_ALLOWED)}!A2:B"]
+        )
+    finally:
+        with _ROLES_LOCK:
+            _REFRESH["inflight"] = False
+    ranges = resp.get("valueRanges", [])
+    admins, allowed = (_parse_ids_and_names(r.get("values", [])) for r in (ranges + [{}, {}])[:2])
+    now = time.monotonic()
+    with _ROLES_LOCK:
+        _ADMIN_CACHE["data"], _ADMIN_CACHE["ts"] = admins, now
+        _ALLOWED_CACHE["data"], _ALLOWED_CACHE["ts"] = allowed, now
+    return True
+
+
+def _refresh_in_background() -> None:
+    """Dispara refresh_roles en un hilo si no hay otro en curso (stale-while-revalidate)."""
+    now = time.monotonic()
+    with _ROLES_LOCK:
+        if _REFRESH["inflight"] or now - _REFRESH["attempt"] < _RETRY_SECONDS:
+            return
+        _REFRESH["inflight"] = True
+    threading.Thread(target=_refresh_quietly, name="roles-refresh", daemon=True).start()
+
+
+def _refresh_quietly() -> None:
+    try:
+        refresh_roles()
+    except Exception:
+        logging.exception("No se pudieron refrescar los roles; se sigue usando la copia anterior.")
+        with _ROLES_LOCK:
+            _REFRESH["inflight"] = False
+
+
+@with_sheets_session
 def _append_id_name_to_sheet(title: str, uid: int, name: str = "") -> None:
     ws = _ensure_worksheet(title, headers=["user_id", "name"])
     registry = _read_ids_and_names_from_sheet(title)
@@ -56,6 +159,7 @@ def _append_id_name_to_sheet(title: str, uid: int, name: str = "") -> None:
     _invalidate_cache_for(title)
 
 
+@with_sheets_session
 def _remove_id_from_sheet(title: str, uid: int) -> bool:
     ws = _ensure_worksheet(title, headers=["user_id", "name"])
     vals = ws.get_all_values()
@@ -71,34 +175,84 @@ def _remove_id_from_sheet(title: str, uid: int) -> bool:
 
 
 def _invalidate_cache_for(title: str) -> None:
-    if title == SHEET_ADMINS:
-        _ADMIN_CACHE["data"] = None
-    if title == SHEET_ALLOWED:
-        _ALLOWED_CACHE["data"] = None
+    # Lo llama quien acaba de escribir la hoja (un admin): se relee ya, sin dejar la cache vacía
+    if title in (SHEET_ADMINS, SHEET_ALLOWED):
+        try:
+            refresh_roles()
+        except Exception:
+            logging.exception("No se pudieron releer los roles después de modificarlos.")
+            with _ROLES_LOCK:
+                _ADMIN_CACHE["ts"] = _ALLOWED_CACHE["ts"] = 0.0
+
+
+def _env_ids(var: str) -> Dict[int, str]:
+    return {int(x): "" for x in os.environ.get(var, "").split(",") if x.strip().isdigit()}
+
+
+def _build_snapshot(env: Tuple[str, str, str], sheet_admins: Dict[int, str], sheet_allowed: Dict[int, str]) -> AuthSnapshot:
+    admins = _env_ids("ADMIN_USER_IDS")
+    admins.update(sheet_admins)
+    # Usuarios permitidos = Admins ∪ hoja Usuarios permitidos ∪ ALLOWED_USER_IDS (.env)
+    allowed = dict(admins)
+    allowed.update(sheet_allowed)
+    for k, v in _env_ids("ALLOWED_USER_IDS").items():
+        allowed.setdefault(k, v)
+    # FORCE_LOCK=1: el bot SIEMPRE está bloqueado (requiere whitelist), aunque no haya nadie configurado
+    locked = env[2] == "1" or bool(allowed)
+    return AuthSnapshot(frozenset(admins), frozenset(allowed), admins, allowed, locked, {})
+
+
+def _sheets_loaded() -> bool:
+    return _ADMIN_CACHE["data"] is not None and _ALLOWED_CACHE["data"] is not None
+
+
+def get_auth_snapshot() -> AuthSnapshot:
+    """Snapshot de roles vigente; lee las hojas sólo si venció su cache."""
+    env = (
+        os.environ.get("ADMIN_USER_IDS", ""),
+        os.environ.get("ALLOWED_USER_IDS", ""),
+        os.environ.get("FORCE_LOCK", "0").strip(),
+    )
+    sheet_admins: Dict[int, str] = {}
+    sheet_allowed: Dict[int, str] = {}
+    if USE_SHEETS:
+        _cached_sheet_ids(SHEET_ADMINS, _ADMIN_CACHE)  # carga inicial o refresco en segundo plano
+        # Las dos del mismo refresco (se reemplazan juntas)
+        with _ROLES_LOCK:
+            sheet_admins, sheet_allowed = _ADMIN_CACHE["data"] or {}, _ALLOWED_CACHE["data"] or {}
+    with _AUTH_LOCK:
+        sources = _AUTH["sources"]
+        if sources is not None and sources[0] == env and (
+            (sources[1] is sheet_admins and sources[2] is sheet_allowed)
+            or (sources[1] == sheet_admins and sources[2] == sheet_allowed)
+        ):
+            # Releer la hoja y obtener lo mismo no invalida las decisiones memorizadas
+            _AUTH["sources"] = (env, sheet_admins, sheet_allowed)
+            return _AUTH["snap"]
+        snap = _build_snapshot(env, sheet_admins, sheet_allowed)
+        _AUTH["snap"], _AUTH["sources"] = snap, (env, sheet_admins, sheet_allowed)
+        return snap
+
+
+def peek_auth_snapshot() -> Optional[AuthSnapshot]:
+    """El snapshot si se puede obtener sin tocar Sheets; None solo antes de la primera carga."""
+    if USE_SHEETS and not _sheets_loaded():
+        return None
+    return get_auth_snapshot()
 
 
 def get_admins_map() -> Dict[int, str]:
-    env_admins = {int(x): "" for x in os.environ.get("ADMIN_USER_IDS", "").split(",") if x.strip().isdigit()}
-    sheet_admins = _cached_sheet_ids(SHEET_ADMINS, _ADMIN_CACHE) if USE_SHEETS else {}
-    env_admins.update(sheet_admins)
-    return env_admins
+    return dict(get_auth_snapshot().admin_names)
 
 
 def get_allowed_map() -> Dict[int, str]:
     """Usuarios permitidos = Admins ∪ hoja Usuarios permitidos ∪ ALLOWED_USER_IDS (.env)."""
-    env_allowed = {int(x): "" for x in os.environ.get("ALLOWED_USER_IDS", "").split(",") if x.strip().isdigit()}
-    sheet_allowed = _cached_sheet_ids(SHEET_ALLOWED, _ALLOWED_CACHE) if USE_SHEETS else {}
-    all_allowed = get_admins_map()
-    all_allowed.update(sheet_allowed)
-    for k, v in env_allowed.items():
-        if k not in all_allowed:
-            all_allowed[k] = v
-    return all_allowed
+    return dict(get_auth_snapshot().names)
 
 
-def get_admin_ids() -> set[int]:
-    return set(get_admins_map().keys())
+def get_admin_ids() -> FrozenSet[int]:
+    return get_auth_snapshot().admins
 
 
-def get_allowed_ids() -> set[int]:
-    return set(get_allowed_map().keys())
+def get_allowed_ids() -> FrozenSet[int]:
+    return get_auth_snapshot().allowed
@@ -1,49 +1,147 @@
 import os
 import json
+import logging
+import threading
+from functools import wraps
 from typing import Optional, List
 
 import gspread
 from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
 
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
 ]
 
-def _gspread_client():
+# Sesión de proceso: un único cliente autorizado (con su pool HTTP), la planilla
+# abierta y un mapa título -> Worksheet. Se reconstruye con reset_sheets_session();
+# "epoch" cuenta las reconstrucciones (quien guarda handles sabe si quedaron viejos).
+_SESSION: dict = {"client": None, "spreadsheet": None, "sheet1": None, "worksheets": {}, "epoch": 0}
+_SESSION_LOCK = threading.RLock()
+_POOL_SIZE = int(os.environ.get("SHEETS_POOL_SIZE", "10"))
+
+
+def _load_credentials() -> Credentials:
     sa_file = os.environ.get("GOOGLE_SERVICE_ACCOUNT_FILE", "").strip()
     sa_json = os.environ.get("GOOGLE_SERVICE_ACCOUNT_JSON", "").strip()
     if sa_file:
         if not os.path.exists(sa_file):
             raise RuntimeError(f"GOOGLE_SERVICE_ACCOUNT_FILE no existe: {sa_file}")
-        creds = Credentials.from_service_account_file(sa_file, scopes=SCOPES)
-        return gspread.authorize(creds)
+        return Credentials.from_service_account_file(sa_file, scopes=SCOPES)
     if sa_json:
         try:
             info = json.loads(sa_json)
         except json.JSONDecodeError as e:
             raise RuntimeError("GOOGLE_SERVICE_ACCOUNT_JSON no es JSON válido.") from e
-        creds = Credentials.from_service_account_info(info, scopes=SCOPES)
-        return gspread.authorize(creds)
+        return Credentials.from_service_account_info(info, scopes=SCOPES)
     raise RuntimeError("Falta GOOGLE_SERVICE_ACCOUNT_FILE o GOOGLE_SERVICE_ACCOUNT_JSON")
 
+
+def _gspread_client():
+    """
+    Cliente gspread compartido por todo el proceso. La AuthorizedSession de
+    google-auth renueva el token sola, así que solo autorizamos una vez.
+    """
+    with _SESSION_LOCK:
+        client = _SESSION["client"]
+        if client is None:
+            client = gspread.authorize(_load_credentials())
+            adapter = HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE)
+            client.http_client.session.mount("https://", adapter)
+            _SESSION["client"] = client
+        return client
+
+
 def _open_spreadsheet():
-    gsid = os.environ.get("GSHEET_ID")
-    if not gsid:
-        raise RuntimeError("Falta GSHEET_ID")
-    return _gspread_client().open_by_key(gsid)
+    with _SESSION_LOCK:
+        sh = _SESSION["spreadsheet"]
+        if sh is None:
+            gsid = os.environ.get("GSHEET_ID")
+            if not gsid:
+                raise RuntimeError("Falta GSHEET_ID")
+            sh = _gspread_client().open_by_key(gsid)
+            _SESSION["spreadsheet"] = sh
+        return sh
+
 
 def _open_sheet():
-    return _open_spreadsheet().sheet1  # principal
+    with _SESSION_LOCK:
+        ws = _SESSION["sheet1"]
+        if ws is None:
+            ws = _open_spreadsheet().sheet1  # principal
+            _SESSION["sheet1"] = ws
+        return ws
+
 
 def _ensure_worksheet(title: str, headers: Optional[List[str]] = None):
     """Abre o crea (si no existe) una worksheet con el título indicado."""
-    sh = _open_spreadsheet()
-    try:
-        ws = sh.worksheet(title)
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title=title, rows=1000, cols=max(5, len(headers or [])))
-        if headers:
-            ws.update(values=[headers], range_name="A1")
-    return ws
+    with _SESSION_LOCK:
+        ws = _SESSION["worksheets"].get(title)
+        if ws is not None:
+            return ws
+        sh = _open_spreadsheet()
+        try:
+            ws = sh.worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            ws = sh.add_worksheet(title=title, rows=1000, cols=max(5, len(headers or [])))
+            if headers:
+                ws.update(values=[headers], range_name="A1")
+        _SESSION["worksheets"][title] = ws
+        return ws
 
+
+def reset_sheets_session(keep_client: bool = True) -> None:
+    """Descarta los handles cacheados (planilla y hojas); opcionalmente también el cliente."""
+    with _SESSION_LOCK:
+        if not keep_client:
+            _SESSION["client"] = None
+        _SESSION["spreadsheet"] = None
+        _SESSION["sheet1"] = None
+        _SESSION["worksheets"] = {}
+        _SESSION["epoch"] += 1
+
+
+def session_epoch() -> int:
+    return _SESSION["epoch"]
+
+
+def rebind_worksheet(ws):
+    """Handle de la sesión vigente para la misma hoja (por id) que ws."""
+    with _SESSION_LOCK:
+        sheet1 = _open_sheet()
+        if sheet1.id == ws.id:
+            return sheet1
+        for cached in _SESSION["worksheets"].values():
+            if cached.id == ws.id:
+                return cached
+        return _open_spreadsheet().get_worksheet_by_id(ws.id)
+
+
+def _is_stale_handle_error(exc: Exception) -> bool:
+    if isinstance(exc, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+        return True
+    if isinstance(exc, gspread.exceptions.APIError):
+        if exc.code in (401, 404):
+            return True
+        # Hoja borrada/renombrada: la API responde 400 con el rango que ya no existe
+        return exc.code == 400 and "Unable to parse range" in str(exc)
+    return False
+
+
+def with_sheets_session(fn):
+    """
+    Reintenta una vez la operación si los handles cacheados quedaron inválidos
+    (planilla/hoja borrada o credenciales revocadas), reconstruyendo la sesión.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as exc:
+            if not _is_stale_handle_error(exc):
+                raise
+            logging.warning("Sesión de Sheets inválida (%s); reconstruyendo handles.", exc)
+            reset_sheets_session(keep_client=not (isinstance(exc, gspread.exceptions.APIError) and exc.code == 401))
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,318 @@
+import atexit
+import logging
+import threading
+from typing import Callable, Dict, Iterator, List, Tuple, TypeVar
+
+from gspread.exceptions import APIError
+from gspread.utils import rowcol_to_a1
+
+from bot.config import SHEETS_WRITE_WINDOW
+from .sheets import _is_stale_handle_error, rebind_worksheet, session_epoch, with_sheets_session
+
+T = TypeVar("T")
+# Reintentos de un flush fallido: espera base (si la ventana es 0), tope y lecturas optimistas
+_RETRY_BASE = 1.0
+_RETRY_MAX = 60.0
+_READ_ATTEMPTS = 3
+
+
+class SheetsWriteQueue:
+    """
+    Cola write-behind para Google Sheets. Acumula celdas y filas nuevas durante
+    SHEETS_WRITE_WINDOW segundos y las manda en un único batch_update (más un
+    append_rows si hay altas) por worksheet. overlay() aplica lo pendiente sobre
+    una lectura para que el bot vea sus propias escrituras antes del flush.
+
+    Las lecturas van por read_consistent(): _flush_gen sube al empezar y al
+    terminar cada flush (impar = flush en vuelo), así una lectura que se cruzó
+    con un flush se descarta y se repite en vez de perder o duplicar escrituras.
+
+    Un error transitorio (red, 429, 5xx) deja todo encolado para el reintento;
+    uno permanente (4xx, p. ej. un rango fuera de la grilla) descarta sólo los
+    rangos rechazados, con un log, para no frenar al resto de las escrituras.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._worksheets: Dict[int, object] = {}
+        self._cells: Dict[int, Dict[Tuple[int, int], str]] = {}
+        self._appends: Dict[int, List[List[str]]] = {}
+        # Lo que se está enviando ahora: también cuenta para overlay()
+        self._inflight_cells: Dict[int, Dict[Tuple[int, int], str]] = {}
+        self._inflight_appends: Dict[int, List[List[str]]] = {}
+        self._flush_gen = 0
+        # Sesión de Sheets de la que vienen los handles guardados en _worksheets
+        self._epoch = session_epoch()
+        # Flushes fallidos seguidos (backoff exponencial del reintento)
+        self._failures = 0
+
+    # --- encolado ---
+    def set_cell(self, ws, row: int, col: int, value: str) -> None:
+        with self._lock:
+            self._worksheets[ws.id] = ws
+            self._cells.setdefault(ws.id, {})[(row, col)] = value
+        self._schedule()
+
+    def set_row(self, ws, row: int, values: List[str]) -> None:
+        with self._lock:
+            self._worksheets[ws.id] = ws
+            cells = self._cells.setdefault(ws.id, {})
+            for col, value in enumerate(values, start=1):
+                cells[(row, col)] = value
+        self._schedule()
+
+    def set_rows(self, ws, rows: Dict[int, List[str]]) -> None:
+        """Varias filas completas de una vez (un solo disparo del flush)."""
+        with self._lock:
+            self._worksheets[ws.id] = ws
+            cells = self._cells.setdefault(ws.id, {})
+            for row, values in rows.items():
+                for col, value in enumerate(values, start=1):
+                    cells[(row, col)] = value
+        self._schedule()
+
+    def append_row(self, ws, values: List[str]) -> None:
+        self.append_rows(ws, [values])
+
+    def append_rows(self, ws, rows: List[List[str]]) -> None:
+        with self._lock:
+            self._worksheets[ws.id] = ws
+            self._appends.setdefault(ws.id, []).extend(list(values) for values in rows)
+        self._schedule()
+
+    def has_pending(self, ws) -> bool:
+        with self._lock:
+            return bool(
+                self._cells.get(ws.id) or self._appends.get(ws.id)
+                or self._inflight_cells.get(ws.id) or self._inflight_appends.get(ws.id)
+            )
+
+    # --- lectura consistente ---
+    def pending_cells(self, ws) -> Dict[Tuple[int, int], str]:
+        """Celdas todavía no confirmadas por la API (en vuelo + pendientes)."""
+        with self._lock:
+            cells = dict(self._inflight_cells.get(ws.id, {}))
+            cells.update(self._cells.get(ws.id, {}))
+            return cells
+
+    def read_consistent(self, read: Callable[[], T], apply: Callable[[T], T]) -> T:
+        """
+        read() contra la API y apply() (un overlay) sobre el resultado, sin que un
+        flush se cuele en el medio: si _flush_gen cambió o había un flush en vuelo,
+        la lectura se repite; tras _READ_ATTEMPTS se lee bloqueando los flushes.
+        """
+        for _ in range(_READ_ATTEMPTS):
+            with self._lock:
+                gen = self._flush_gen
+            if gen % 2:
+                # Flush en vuelo: esperar a que termine antes de leer
+                with self._flush_lock:
+                    pass
+                continue
+            value = read()
+            with self._lock:
+                if self._flush_gen == gen:
+                    return apply(value)
+        with self._flush_lock:
+            return apply(read())
+
+    def overlay(self, ws, body: List[List[str]], width: int) -> List[List[str]]:
+        """Aplica altas y celdas pendientes sobre las filas de datos leídas (fila 2 = body[0])."""
+        with self._lock:
+            appends = self._inflight_appends.get(ws.id, []) + self._appends.get(ws.id, [])
+            cells = self.pending_cells(ws)
+        if not appends and not cells:
+            return body
+        body = body + [list(r) for r in appends]
+        for (row, col), value in cells.items():
+            i = row - 2
+            if not (0 <= i < len(body)) or col > width:
+                continue
+            if len(body[i]) < width:
+                body[i] = body[i] + [""] * (width - len(body[i]))
+            body[i][col - 1] = value
+        return body
+
+    def overlay_column(self, ws, values: List[str], col: int) -> List[str]:
+        """Como overlay() pero para una sola columna leída desde la fila 2."""
+        with self._lock:
+            appends = self._inflight_appends.get(ws.id, []) + self._appends.get(ws.id, [])
+            cells = self.pending_cells(ws)
+        if not appends and not cells:
+            return values
+        values = list(values) + [r[col - 1] if len(r) >= col else "" for r in appends]
+        for (row, c), value in cells.items():
+            i = row - 2
+            if c != col or i < 0:
+                continue
+            if i >= len(values):
+                values += [""] * (i + 1 - len(values))
+            values[i] = value
+        return values
+
+    # --- envío ---
+    def _schedule(self, delay: float = None) -> None:
+        if self.window <= 0 and delay is None:
+            self.flush()
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.window if delay is None else delay, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            _flush_in_session(self)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+                delay = min(_RETRY_MAX, max(self.window, _RETRY_BASE) * 2 ** (self._failures - 1))
+            logging.exception("Falló el flush a Google Sheets; se reintenta en %.0fs.", delay)
+            self._schedule(delay)
+
+    def _rebind(self) -> None:
+        """Si la sesión de Sheets se reconstruyó, cambia los handles guardados por los nuevos."""
+        epoch = session_epoch()
+        if epoch == self._epoch:
+            return
+        with self._lock:
+            worksheets = dict(self._worksheets)
+        fresh = {ws_id: rebind_worksheet(ws) for ws_id, ws in worksheets.items()}
+        with self._lock:
+            self._worksheets.update(fresh)
+            self._epoch = epoch
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            self._rebind()
+            with self._lock:
+                self._inflight_cells, self._cells = self._cells, {}
+                self._inflight_appends, self._appends = self._appends, {}
+                worksheets = dict(self._worksheets)
+                self._flush_gen += 1
+            try:
+                for ws_id in set(self._inflight_cells) | set(self._inflight_appends):
+                    ws = worksheets[ws_id]
+                    appends = self._inflight_appends.get(ws_id)
+                    if appends:
+                        # Primero las altas: las celdas encoladas pueden apuntar a esas filas
+                        try:
+                            ws.append_rows(appends)
+                        except Exception as exc:
+                            if not _is_permanent(exc):
+                                raise
+                            logging.error("Sheets rechazó %d alta(s) en '%s' (%s); se descartan: %s",
+                                          len(appends), ws.title, exc, appends)
+                        with self._lock:
+                            self._inflight_appends.pop(ws_id)
+                    cells = self._inflight_cells.get(ws_id)
+                    if cells:
+                        self._send_cells(ws, ws_id, cells)
+            except Exception:
+                self._requeue_inflight()
+                raise
+            else:
+                with self._lock:
+                    self._failures = 0
+            finally:
+                with self._lock:
+                    self._inflight_cells, self._inflight_appends = {}, {}
+                    self._flush_gen += 1
+
+    def _send_cells(self, ws, ws_id: int, cells: Dict[Tuple[int, int], str]) -> None:
+        runs = list(_cell_runs(cells))
+        try:
+            ws.batch_update([item for item, _ in runs])
+        except Exception as exc:
+            if not _is_permanent(exc):
+                raise
+            # Un rango rechazado no tiene que arrastrar al resto: se mandan de a uno
+            logging.warning("Sheets rechazó el lote de '%s' (%s); se reenvía rango por rango.", ws.title, exc)
+            for item, keys in runs:
+                try:
+                    ws.batch_update([item])
+                except Exception as exc:
+                    if not _is_permanent(exc):
+                        raise
+                    logging.error("Sheets rechazó %s en '%s' (%s); se descarta: %s",
+                                  item["range"], ws.title, exc, item["values"])
+                with self._lock:
+                    sent = self._inflight_cells[ws_id]
+                    for key in keys:
+                        sent.pop(key, None)
+        with self._lock:
+            self._inflight_cells.pop(ws_id)
+
+    def _requeue_inflight(self) -> None:
+        with self._lock:
+            for ws_id, cells in self._inflight_cells.items():
+                merged = dict(cells)
+                merged.update(self._cells.get(ws_id, {}))
+                self._cells[ws_id] = merged
+            for ws_id, rows in self._inflight_appends.items():
+                self._appends[ws_id] = rows + self._appends.get(ws_id, [])
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """4xx de la API que no se arregla reintentando (sí se reintentan 408/429 y los de sesión vieja)."""
+    return (
+        isinstance(exc, APIError) and 400 <= exc.code < 500
+        and exc.code not in (408, 429) and not _is_stale_handle_error(exc)
+    )
+
+
+def _cell_runs(cells: Dict[Tuple[int, int], str]) -> Iterator[Tuple[dict, List[Tuple[int, int]]]]:
+    """(rango A1 con sus valores, celdas que cubre) por cada tramo de celdas contiguas de una fila."""
+    by_row: Dict[int, List[int]] = {}
+    for r, c in cells:
+        by_row.setdefault(r, []).append(c)
+    for row in sorted(by_row):
+        cols = sorted(by_row[row])
+        run = [cols[0]]
+        for col in cols[1:] + [None]:
+            if col is not None and col == run[-1] + 1:
+                run.append(col)
+                continue
+            start, end = rowcol_to_a1(row, run[0]), rowcol_to_a1(row, run[-1])
+            item = {
+                "range": start if start == end else f"{start}:{end}",
+                "values": [[cells[(row, c)] for c in run]],
+            }
+            yield item, [(row, c) for c in run]
+            if col is not None:
+                run = [col]
+
+
+def _cells_to_ranges(cells: Dict[Tuple[int, int], str]) -> List[dict]:
+    """Agrupa celdas contiguas de una misma fila en un solo rango A1."""
+    return [item for item, _ in _cell_runs(cells)]
+
+
+@with_sheets_session
+def _flush_in_session(queue: "SheetsWriteQueue") -> None:
+    # Si los handles quedaron viejos, with_sheets_session reconstruye la sesión y flush() los renueva
+    queue.flush()
+
+
+_WRITES = SheetsWriteQueue(SHEETS_WRITE_WINDOW)
+
+
+def get_write_queue() -> SheetsWriteQueue:
+    return _WRITES
+
+
+def flush_pending_writes() -> None:
+    """Envía ya todo lo pendiente (usado al apagar el bot)."""
+    try:
+        _WRITES.flush()
+    except Exception:
+        logging.exception("No se pudieron enviar las escrituras pendientes a Google Sheets.")
+
+
+atexit.register(flush_pending_writes)
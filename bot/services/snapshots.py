@@ -0,0 +1,181 @@
+"""
+Snapshots de la lista compartidos entre sesiones.
+
+En vez de guardar una copia de la lista en user_data ("list_rows",
+"edit_base_rows"), cada sesión guarda una vista: {"snapshot": id, "estado": ...,
+"positions": ...}. Las posiciones de una vista por IDs se resuelven contra el
+mismo snapshot, así una recarga que mueve filas no cambia qué contactos muestra. El snapshot es una tupla inmutable de Contact asociada a una
+versión del store; todas las sesiones que abren la lista en la misma versión
+comparten el mismo. Se cuentan referencias y un snapshot sin referencias se
+descarta apenas deja de ser el más reciente.
+"""
+import threading
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from .contact import Contact
+from . import lista
+
+
+class _Snapshot:
+    __slots__ = ("id", "version", "rows", "views", "refs", "by_id")
+
+    def __init__(self, snap_id: int, version: int, rows: Sequence[Contact]):
+        self.id = snap_id
+        self.version = version
+        self.rows: Tuple[Contact, ...] = tuple(rows)
+        # Estado -> filas filtradas (se calcula una vez por snapshot)
+        self.views: Dict[str, Tuple[Contact, ...]] = {}
+        self.refs = 0
+        # ID -> posición (se arma la primera vez que se pide)
+        self.by_id: Optional[Dict[str, int]] = None
+
+
+class SnapshotRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snaps: Dict[int, _Snapshot] = {}
+        self._latest: Optional[_Snapshot] = None
+        self._next_id = 1
+
+    def publish(self, version: int, rows: Sequence[Contact], acquire: bool = False) -> int:
+        """Id del snapshot de esa versión; lo crea si la última publicada es otra."""
+        with self._lock:
+            latest = self._latest
+            if latest is not None and latest.version == version:
+                snap = latest
+            else:
+                snap = _Snapshot(self._next_id, version, rows)
+                self._next_id += 1
+                self._snaps[snap.id] = snap
+                self._latest = snap
+                if latest is not None and latest.refs <= 0:
+                    self._snaps.pop(latest.id, None)
+            if acquire:
+                snap.refs += 1
+            return snap.id
+
+    def acquire(self, snap_id: int) -> bool:
+        with self._lock:
+            snap = self._snaps.get(snap_id)
+            if snap is None:
+                return False
+            snap.refs += 1
+            return True
+
+    def release(self, snap_id: int) -> None:
+        with self._lock:
+            snap = self._snaps.get(snap_id)
+            if snap is None:
+                return
+            snap.refs -= 1
+            if snap.refs <= 0 and snap is not self._latest:
+                del self._snaps[snap_id]
+
+    def positions_of(self, snap_id: int, row_ids: Iterable[str]) -> Tuple[int, ...]:
+        """Posiciones en ese snapshot de los IDs que existen en él, en el mismo orden."""
+        with self._lock:
+            snap = self._snaps.get(snap_id)
+        if snap is None:
+            return ()
+        if snap.by_id is None:
+            by_id: Dict[str, int] = {}
+            for i, r in enumerate(snap.rows):
+                if r.id:
+                    by_id.setdefault(r.id, i)
+            snap.by_id = by_id
+        found = (snap.by_id.get(str(r), -1) for r in row_ids)
+        return tuple(p for p in found if p >= 0)
+
+    def rows(self, snap_id: int, estado: Optional[str] = None,
+             positions: Optional[Iterable[int]] = None) -> Sequence[Contact]:
+        """Filas de una vista (tupla compartida: no se copia la lista completa)."""
+        with self._lock:
+            snap = self._snaps.get(snap_id)
+        if snap is None:
+            return ()
+        if positions is not None:
+            return tuple(snap.rows[p] for p in positions if 0 <= p < len(snap.rows))
+        if estado is None:
+            return snap.rows
+        picked = snap.views.get(estado)
+        if picked is None:
+            picked = snap.views[estado] = tuple(r for r in snap.rows if r.estado == estado)
+        return picked
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "snapshots": len(self._snaps),
+                "refs": sum(s.refs for s in self._snaps.values()),
+                "rows": sum(len(s.rows) for s in self._snaps.values()),
+            }
+
+
+_REGISTRY = SnapshotRegistry()
+
+
+def snapshot_stats() -> Dict[str, int]:
+    return _REGISTRY.stats()
+
+
+def current_snapshot(estado: Optional[str] = None, acquire: bool = False) -> int:
+    """Snapshot de la versión vigente de la lista (leyendo el backend si la cache venció)."""
+    if estado is None:
+        lista.read_lista_any()
+    else:
+        lista.read_positions_by_status(estado)
+    version, rows = lista.get_contact_store().snapshot()
+    return _REGISTRY.publish(version, rows, acquire=acquire)
+
+
+def open_view(user_data: dict, slot: str, estado: Optional[str] = None,
+              ids: Optional[Iterable[str]] = None) -> Sequence[Contact]:
+    """
+    Guarda en user_data[slot] una vista sobre el snapshot vigente (toda la
+    lista, un Estado o los contactos con esos IDs) y devuelve sus filas. Libera
+    la vista que ocupaba ese slot.
+    """
+    snap_id = current_snapshot(estado if ids is None else None, acquire=True)
+    close_view(user_data, slot)
+    user_data[slot] = {
+        "snapshot": snap_id,
+        "estado": estado,
+        "positions": _REGISTRY.positions_of(snap_id, ids) if ids is not None else None,
+    }
+    return view_rows(user_data, slot)
+
+
+def share_view(user_data: dict, src: str, dst: str) -> Sequence[Contact]:
+    """Copia la vista de un slot a otro (mismo snapshot, una referencia más)."""
+    view = user_data.get(src)
+    if not view or not _REGISTRY.acquire(view["snapshot"]):
+        return ()
+    close_view(user_data, dst)
+    user_data[dst] = dict(view)
+    return view_rows(user_data, dst)
+
+
+def view_rows(user_data: dict, slot: str) -> Sequence[Contact]:
+    view = user_data.get(slot)
+    if not view:
+        return ()
+    return _REGISTRY.rows(view["snapshot"], view.get("estado"), view.get("positions"))
+
+
+def view_key(user_data: dict, slot: str) -> Optional[tuple]:
+    """Identifica la vista (snapshot + filtro); sirve de clave para caches de render."""
+    view = user_data.get(slot)
+    if not view:
+        return None
+    return view["snapshot"], view.get("estado"), view.get("positions")
+
+
+def view_estado(user_data: dict, slot: str) -> Optional[str]:
+    view = user_data.get(slot)
+    return view.get("estado") if view else None
+
+
+def close_view(user_data: dict, slot: str) -> None:
+    view = user_data.pop(slot, None)
+    if view:
+        _REGISTRY.release(view["snapshot"])
@@ -0,0 +1,202 @@
+"""
+Backend SQLite para la lista (STORAGE_BACKEND=sqlite).
+
+Una fila por contacto con índices por Estado, Teléfono y DNI (normalizados) y
+modo WAL para que las lecturas no bloqueen a las escrituras. El id de la tabla
+es el ID estable del contacto (columna "ID" de la lista). Las posiciones de
+read_rows() siguen el orden de id, igual que las filas de la hoja/CSV.
+
+Importar/exportar desde la consola:
+    python -m bot.services.sqlite_backend import lista.csv
+    python -m bot.services.sqlite_backend export lista.csv
+    python -m bot.services.sqlite_backend import-sheets
+    python -m bot.services.sqlite_backend export-sheets
+"""
+import csv
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from bot.config import CSV_DEFAULT, CSV_HEADERS, SQLITE_PATH
+from .contact import Contact
+from .contact_store import RowLike
+from .csv_journal import read_csv_with_journal
+
+_COLUMNS = ["nombre", "apellido", "telefono", "dni", "estado", "observacion"]  # orden de CSV_HEADERS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contactos (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre      TEXT NOT NULL DEFAULT '',
+    apellido    TEXT NOT NULL DEFAULT '',
+    telefono    TEXT NOT NULL DEFAULT '',
+    dni         TEXT NOT NULL DEFAULT '',
+    estado      TEXT NOT NULL DEFAULT '',
+    observacion TEXT NOT NULL DEFAULT '',
+    tel_key     TEXT NOT NULL DEFAULT '',
+    dni_key     TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS ix_contactos_estado ON contactos(estado);
+CREATE INDEX IF NOT EXISTS ix_contactos_tel_key ON contactos(tel_key);
+CREATE INDEX IF NOT EXISTS ix_contactos_dni_key ON contactos(dni_key);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    os.makedirs(os.path.dirname(SQLITE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _local.conn = conn
+    with _init_lock:
+        if not _initialized:
+            conn.executescript(_SCHEMA)
+            _initialized = True
+            if conn.execute("SELECT COUNT(*) FROM contactos").fetchone()[0] == 0 and os.path.exists(CSV_DEFAULT):
+                count = import_csv(CSV_DEFAULT)
+                logging.info("SQLite vacío: importadas %d filas desde %s", count, CSV_DEFAULT)
+    return conn
+
+
+def _params(row: Contact) -> Tuple[str, ...]:
+    return tuple(getattr(row, c) for c in _COLUMNS) + (row.tel_key, row.dni_key)
+
+
+def _row_id(row: Contact) -> Optional[int]:
+    # Un ID que no es número (lista importada de otro lado) se reemplaza por uno de la tabla
+    return int(row.id) if row.id.isdigit() else None
+
+
+_INSERT = f"INSERT INTO contactos (id, {', '.join(_COLUMNS)}, tel_key, dni_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_UPDATE = f"UPDATE contactos SET {', '.join(c + ' = ?' for c in _COLUMNS)}, tel_key = ?, dni_key = ? WHERE id = ?"
+
+
+def read_rows() -> List[List[str]]:
+    """Filas en orden de id, con el id como columna ID."""
+    cur = _connect().execute(f"SELECT {', '.join(_COLUMNS)}, id FROM contactos ORDER BY id")
+    return [list(rec[:-1]) + [str(rec[-1])] for rec in cur]
+
+
+def replace_all(rows: Iterable[RowLike]) -> List[int]:
+    """Reemplaza toda la tabla conservando los IDs; devuelve los ids en orden."""
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM contactos")
+        return [_insert(conn, Contact.from_row(r)) for r in rows]
+
+
+def _insert(conn: sqlite3.Connection, row: Contact) -> int:
+    row_id = _row_id(row)
+    if row_id is not None and conn.execute("SELECT 1 FROM contactos WHERE id = ?", (row_id,)).fetchone():
+        row_id = None  # ID repetido: la fila recibe uno nuevo
+    return conn.execute(_INSERT, (row_id,) + _params(row)).lastrowid
+
+
+def insert_row(row: RowLike) -> int:
+    conn = _connect()
+    with conn:
+        return _insert(conn, Contact.from_row(row))
+
+
+def insert_rows(rows: Iterable[RowLike]) -> List[int]:
+    """Varias altas en una sola transacción; devuelve sus ids."""
+    conn = _connect()
+    with conn:
+        return [_insert(conn, Contact.from_row(r)) for r in rows]
+
+
+def update_rows(rows: Iterable[Contact]) -> None:
+    """UPDATE por ID dentro de una sola transacción."""
+    conn = _connect()
+    with conn:
+        conn.executemany(_UPDATE, [_params(row) + (int(row.id),) for row in rows])
+
+
+def set_estado(row_id: int, estado: str, observacion: Optional[str] = None) -> bool:
+    conn = _connect()
+    with conn:
+        if observacion is None:
+            cur = conn.execute("UPDATE contactos SET estado = ? WHERE id = ?", (estado, row_id))
+        else:
+            cur = conn.execute(
+                "UPDATE contactos SET estado = ?, observacion = ? WHERE id = ?", (estado, observacion, row_id)
+            )
+        return cur.rowcount == 1
+
+
+def compare_and_set_estado(row_id: int, expected: str, estado: str, observacion: Optional[str] = None) -> bool:
+    """UPDATE condicional: solo cambia la fila si su Estado sigue siendo `expected`."""
+    conn = _connect()
+    with conn:
+        cur = conn.execute(
+            "UPDATE contactos SET estado = ?, observacion = COALESCE(?, observacion) WHERE id = ? AND estado = ?",
+            (estado, observacion, row_id, expected),
+        )
+        return cur.rowcount == 1
+
+
+def get_estado(row_id: int) -> Optional[str]:
+    """Estado actual de la fila; None si ya no existe."""
+    rec = _connect().execute("SELECT estado FROM contactos WHERE id = ?", (row_id,)).fetchone()
+    return rec[0] if rec else None
+
+
+# --- Import / export en el formato de la lista (CSV_HEADERS) ---
+
+def import_csv(path: str) -> int:
+    # Incluye lo que el backend CSV todavía tenga solo en su journal
+    rows = read_csv_with_journal(path)
+    return len(replace_all(rows[1:] if rows else []))
+
+
+def export_csv(path: str) -> int:
+    rows = read_rows()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows([CSV_HEADERS] + rows)
+    return len(rows)
+
+
+def import_sheets() -> int:
+    from .sheets import _open_sheet
+    vals = _open_sheet().get_all_values()
+    return len(replace_all(vals[1:] if vals else []))
+
+
+def export_sheets() -> int:
+    from .sheets import _open_sheet
+    rows = read_rows()
+    ws = _open_sheet()
+    ws.clear()
+    ws.update(values=[CSV_HEADERS] + rows, range_name="A1")
+    return len(rows)
+
+
+def _cli(argv: List[str]) -> int:
+    actions = {
+        "import": lambda: import_csv(argv[1] if len(argv) > 1 else CSV_DEFAULT),
+        "export": lambda: export_csv(argv[1] if len(argv) > 1 else CSV_DEFAULT),
+        "import-sheets": import_sheets,
+        "export-sheets": export_sheets,
+    }
+    if not argv or argv[0] not in actions:
+        print(__doc__)
+        return 2
+    print(f"{argv[0]}: {actions[argv[0]]()} filas ({SQLITE_PATH})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_cli(sys.argv[1:]))
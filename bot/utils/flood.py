@@ -0,0 +1,114 @@
+"""
+Corte de floods antes de los handlers (TypeHandler en el grupo -1).
+
+- Usuarios no autorizados: se les contesta "Acceso denegado" una vez y durante
+  FLOOD_DENY_COOLDOWN segundos sus updates se descartan sin responder ni
+  consultar roles.
+- Usuarios autorizados: token bucket por usuario (FLOOD_BURST clics de ráfaga,
+  FLOOD_RATE por segundo sostenidos). Lo que excede se descarta avisando una
+  sola vez por ráfaga.
+
+Usa el snapshot de roles en memoria: no agrega lecturas a Sheets.
+"""
+import logging
+import time
+from typing import Dict, List
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from bot.config import FLOOD_RATE, FLOOD_BURST, FLOOD_DENY_COOLDOWN
+from bot.services.roles import peek_auth_snapshot
+
+# uid -> vencimiento del silencio para rechazados
+_DENIED: Dict[int, float] = {}
+# uid -> [tokens, último relleno, ya avisado en esta ráfaga]
+_BUCKETS: Dict[int, List] = {}
+_MAX_TRACKED = 5000
+_FLOOD_STATS = {"passed": 0, "denied": 0, "denied_dropped": 0, "throttled": 0}
+# Reloj de los buckets y silencios (los tests lo reemplazan)
+_clock = time.monotonic
+
+
+def flood_stats() -> Dict[str, int]:
+    return dict(_FLOOD_STATS, silenced=len(_DENIED), tracked=len(_BUCKETS))
+
+
+def _prune(now: float) -> None:
+    for uid in [u for u, until in _DENIED.items() if until <= now]:
+        del _DENIED[uid]
+    if FLOOD_RATE > 0:
+        idle = FLOOD_BURST / FLOOD_RATE
+        for uid in [u for u, b in _BUCKETS.items() if now - b[1] >= idle]:
+            del _BUCKETS[uid]
+
+
+def _take_token(uid: int, now: float) -> List:
+    """Bucket del usuario ya rellenado; b[0] >= 1 si puede pasar."""
+    b = _BUCKETS.get(uid)
+    if b is None:
+        if len(_BUCKETS) >= _MAX_TRACKED:
+            _prune(now)
+        b = _BUCKETS[uid] = [float(FLOOD_BURST), now, False]
+    else:
+        b[0] = min(float(FLOOD_BURST), b[0] + (now - b[1]) * FLOOD_RATE)
+        b[1] = now
+    return b
+
+
+async def _deny(update: Update) -> None:
+    try:
+        if update.callback_query:
+            await update.callback_query.answer("⛔ Acceso denegado", show_alert=True)
+        elif update.effective_message:
+            await update.effective_message.reply_text("⛔ Acceso denegado.")
+    except Exception:
+        logging.debug("No se pudo avisar el acceso denegado.", exc_info=True)
+
+
+async def _throttled(update: Update) -> None:
+    try:
+        if update.callback_query:
+            await update.callback_query.answer("🐢 Muchos clics seguidos; esperá unos segundos.")
+        elif update.effective_message:
+            await update.effective_message.reply_text("🐢 Muchos mensajes seguidos; esperá unos segundos.")
+    except Exception:
+        logging.debug("No se pudo avisar el límite de clics.", exc_info=True)
+
+
+async def flood_guard(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Corta (ApplicationHandlerStop) los updates de rechazados en silencio y los excesos de clics."""
+    if not isinstance(update, Update) or not update.effective_user:
+        return
+    snap = peek_auth_snapshot()
+    if snap is None:
+        # Roles todavía sin cargar: decide require_auth
+        return
+    uid = update.effective_user.id
+    now = _clock()
+    if not snap.decide(uid)[0]:
+        until = _DENIED.get(uid)
+        if until is not None and until > now:
+            _FLOOD_STATS["denied_dropped"] += 1
+            raise ApplicationHandlerStop
+        if len(_DENIED) >= _MAX_TRACKED:
+            _prune(now)
+        _DENIED[uid] = now + FLOOD_DENY_COOLDOWN
+        _FLOOD_STATS["denied"] += 1
+        await _deny(update)
+        raise ApplicationHandlerStop
+    _DENIED.pop(uid, None)
+    if FLOOD_RATE <= 0:
+        _FLOOD_STATS["passed"] += 1
+        return
+    b = _take_token(uid, now)
+    if b[0] >= 1:
+        b[0] -= 1
+        b[2] = False
+        _FLOOD_STATS["passed"] += 1
+        return
+    _FLOOD_STATS["throttled"] += 1
+    if not b[2]:
+        b[2] = True
+        await _throttled(update)
+    raise ApplicationHandlerStop
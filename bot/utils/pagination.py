@@ -1,51 +1,58 @@
-from typing import List
-import re
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
 
-from bot.config import CSV_HEADERS, IDX
-from bot.services.lista import _pad_row
+from bot.services.contact import Contact
+from bot.services.estado import CONTACTAR_LUEGO, parse_estado
+
+# Páginas ya renderizadas (texto + teclado), LRU. La clave incluye el id del
+# snapshot, que cambia con cada versión de la lista: nunca hace falta invalidar.
+_PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", "256"))
+_PAGE_CACHE: "OrderedDict[Hashable, object]" = OrderedDict()
+_PAGE_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
 
 def _clean_estado_for_display(est: str) -> str:
     if not est:
         return est
-    s = est.strip()
-    # Formato preferido: 'En contacto - <id> (<nombre>)' o sin nombre
-    m = re.match(r"^En contacto\s*[-–—]\s*(\d{5,})(?:\s*\(([^)]+)\))?", s)
-    if m:
-        nombre = m.group(2).strip() if m.group(2) else ""
-        return f"En contacto - {m.group(1)} ({nombre})" if nombre else f"En contacto - {m.group(1)}"
-    # Alternativa con guiones: 'En contacto - <id> - <nombre>'
-    m = re.match(r"^En contacto\s*[-–—]\s*(\d{5,})\s*[-–—]\s*(.+)", s)
-    if m:
-        nombre = m.group(2).strip()
-        return f"En contacto - {m.group(1)} ({nombre})" if nombre else f"En contacto - {m.group(1)}"
-    # Casos corruptos: "En contacto - (6415..., Update(...))" o "En contacto - 6415..., Update(...)"
-    m = re.match(r"^En contacto\s*[-–—]\s*\((\d{5,})\b.*", s)
-    if m:
-        return f"En contacto - {m.group(1)}"
-    m = re.match(r"^En contacto\s*[-–—]\s*(\d{5,})\b.*", s)
-    if m:
-        return f"En contacto - {m.group(1)}"
-    if s.startswith("En contacto") and "Update(" in s:
-        m = re.search(r"\b(\d{5,})\b", s)
-        return f"En contacto - {m.group(1)}" if m else "En contacto"
-    # Normal: "En contacto - quien" lo dejamos igual
-    return s
+    return parse_estado(est).display
 
 def _chunk_rows(rows, size=10):
     for i in range(0, len(rows), size):
         yield rows[i:i+size]
 
-def _format_persona(row: List[str]) -> str:
+def _page_bounds(total: int, page: int, size: int) -> Tuple[int, int, int]:
+    """(página acotada, cantidad de páginas, índice de la primera fila) sin partir toda la lista."""
+    pages = max(1, (total + size - 1) // size)
+    page = max(0, min(page, pages - 1))
+    return page, pages, page * size
+
+def cached_page(key: Optional[Hashable], render: Callable[[], object]):
+    """Devuelve render() cacheado por key (None = sin cache)."""
+    if key is None:
+        return render()
+    hit = _PAGE_CACHE.get(key)
+    if hit is not None:
+        _PAGE_CACHE.move_to_end(key)
+        _PAGE_STATS["hits"] += 1
+        return hit
+    _PAGE_STATS["misses"] += 1
+    value = _PAGE_CACHE[key] = render()
+    while len(_PAGE_CACHE) > _PAGE_CACHE_SIZE:
+        _PAGE_CACHE.popitem(last=False)
+        _PAGE_STATS["evictions"] += 1
+    return value
+
+def page_cache_stats() -> Dict[str, int]:
+    return dict(_PAGE_STATS, size=len(_PAGE_CACHE))
+
+def _format_persona(row) -> str:
     try:
-        row = _pad_row(row, len(CSV_HEADERS))
-        tel = row[IDX["Teléfono"]]
-        nom = row[IDX["Nombre"]]
-        ape = row[IDX["Apellido"]]
-        est = _clean_estado_for_display(row[IDX["Estado"]])
-        obs = row[IDX["Observación"]]
+        c = Contact.from_row(row)
+        info = parse_estado(c.estado)
+        est = info.display
         tail = f" - {est}" if est else ""
-        if est.startswith("Contactar Luego") and obs:
-            tail += f" ({obs})"
-        return f"{tel}: {nom}, {ape}{tail}"
+        if info.kind == CONTACTAR_LUEGO and c.observacion:
+            tail += f" ({c.observacion})"
+        return f"{c.telefono}: {c.nombre}, {c.apellido}{tail}"
     except Exception:
         return "Fila inválida"
@@ -0,0 +1,173 @@
+"""
+Despachador de salida hacia la Bot API (rate limiter de PTB).
+
+Todas las llamadas del bot pasan por acá. Las que mandan algo a un chat
+(sendMessage, editMessageText, sendDocument, ...) toman una ficha de dos token
+buckets: uno global (OUTBOUND_GLOBAL_RATE por segundo) y otro por chat
+(OUTBOUND_CHAT_RATE por segundo con ráfaga OUTBOUND_CHAT_BURST en privados,
+OUTBOUND_GROUP_PER_MINUTE en grupos). Las respuestas interactivas tienen
+prioridad: un envío masivo (rate_limit_args=BULK) deja libre una reserva del
+bucket global y espera mientras haya respuestas interactivas para el mismo
+chat. Un RetryAfter pausa ese chat el tiempo que pide Telegram y se reintenta.
+Como mucho OUTBOUND_MAX_CONCURRENT llamadas en vuelo a la vez.
+"""
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from bot.config import (
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_GROUP_PER_MINUTE,
+    OUTBOUND_MAX_CONCURRENT,
+    OUTBOUND_MAX_RETRIES,
+)
+
+# Para pasar en rate_limit_args de los envíos masivos (listas largas, difusiones)
+BULK = "bulk"
+
+# Llamadas que no mandan mensajes a un chat: no se limitan (getUpdates es long polling)
+_UNLIMITED = {"getUpdates", "answerCallbackQuery", "answerInlineQuery", "getMe", "getFile",
+              "setWebhook", "deleteWebhook", "getWebhookInfo", "setMyCommands", "close", "logOut"}
+_MAX_CHATS = 5000
+_OUTBOUND_STATS = {"sent": 0, "delayed": 0, "retry_after": 0, "bulk": 0}
+
+
+def outbound_stats() -> Dict[str, int]:
+    return dict(_OUTBOUND_STATS)
+
+
+class _Bucket:
+    __slots__ = ("rate", "capacity", "tokens", "ts")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.ts = now
+
+    def wait(self, now: float) -> float:
+        """Segundos hasta que haya una ficha (0 = ya hay)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+def _retry_seconds(exc: RetryAfter) -> float:
+    delay = exc.retry_after
+    return delay.total_seconds() if isinstance(delay, datetime.timedelta) else float(delay)
+
+
+def _is_bulk(rate_limit_args: Optional[Any]) -> bool:
+    if isinstance(rate_limit_args, dict):
+        return rate_limit_args.get("priority") == BULK
+    return rate_limit_args == BULK
+
+
+class OutboundRateLimiter(BaseRateLimiter[Union[str, Dict[str, Any]]]):
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Coroutine[Any, Any, None]] = asyncio.sleep,
+    ):
+        # Inyectables para los tests
+        self._clock = clock
+        self._sleep = sleep
+        self._global = _Bucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_RATE, clock())
+        self._chats: Dict[Union[int, str], _Bucket] = {}
+        # Pausas por RetryAfter: chat -> monotonic hasta cuándo
+        self._paused: Dict[Union[int, str], float] = {}
+        # Fichas globales que los envíos masivos no pueden usar
+        self._reserve = min(5.0, OUTBOUND_GLOBAL_RATE * 0.2)
+        # Respuestas interactivas esperando ficha, por chat
+        self._waiting_by_chat: Dict[Union[int, str], int] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def initialize(self) -> None:
+        self._semaphore = asyncio.Semaphore(OUTBOUND_MAX_CONCURRENT)
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> _Bucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            now = self._clock()
+            if len(self._chats) >= _MAX_CHATS:
+                for key in [k for k, b in self._chats.items() if b.wait(now) == 0 and b.tokens >= b.capacity]:
+                    del self._chats[key]
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = _Bucket(OUTBOUND_GROUP_PER_MINUTE / 60.0, OUTBOUND_CHAT_BURST, now)
+            else:
+                bucket = _Bucket(OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, chat_id: Union[int, str], bulk: bool) -> None:
+        bucket = self._chat_bucket(chat_id)
+        if not bulk:
+            self._waiting_by_chat[chat_id] = self._waiting_by_chat.get(chat_id, 0) + 1
+        delayed = False
+        try:
+            while True:
+                now = self._clock()
+                wait = max(self._paused.get(chat_id, now) - now, self._global.wait(now), bucket.wait(now))
+                if bulk and wait <= 0 and (self._global.tokens < 1 + self._reserve or self._waiting_by_chat.get(chat_id)):
+                    # Cede el lugar a las respuestas interactivas
+                    wait = 0.05
+                if wait <= 0:
+                    self._paused.pop(chat_id, None)
+                    self._global.tokens -= 1
+                    bucket.tokens -= 1
+                    return
+                if not delayed:
+                    delayed = True
+                    _OUTBOUND_STATS["delayed"] += 1
+                await self._sleep(wait)
+        finally:
+            if not bulk:
+                left = self._waiting_by_chat[chat_id] - 1
+                if left:
+                    self._waiting_by_chat[chat_id] = left
+                else:
+                    del self._waiting_by_chat[chat_id]
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]], None]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Union[str, Dict[str, Any]]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]], None]:
+        chat_id = data.get("chat_id")
+        if endpoint in _UNLIMITED or chat_id is None:
+            return await callback(*args, **kwargs)
+        bulk = _is_bulk(rate_limit_args)
+        if bulk:
+            _OUTBOUND_STATS["bulk"] += 1
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(OUTBOUND_MAX_CONCURRENT)
+        for attempt in range(OUTBOUND_MAX_RETRIES + 1):
+            await self._acquire(chat_id, bulk)
+            async with self._semaphore:
+                try:
+                    result = await callback(*args, **kwargs)
+                    _OUTBOUND_STATS["sent"] += 1
+                    return result
+                except RetryAfter as exc:
+                    _OUTBOUND_STATS["retry_after"] += 1
+                    delay = _retry_seconds(exc) + 0.1
+                    if attempt >= OUTBOUND_MAX_RETRIES:
+                        raise
+                    logging.warning("RetryAfter de Telegram en %s (chat %s): reintento en %.1fs.", endpoint, chat_id, delay)
+                    self._paused[chat_id] = self._clock() + delay
+        return None
@@ -0,0 +1,47 @@
+"""
+bot.config lee el entorno al importarse: antes de cualquier import de bot se
+apunta todo a un directorio temporal y al backend CSV (sin Google Sheets).
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ.update({
+    "STORAGE_BACKEND": "csv",
+    "USE_SHEETS": "0",
+    "LISTA_CSV": os.path.join(_TMP, "lista.csv"),
+    "EXPORT_STATE": os.path.join(_TMP, "export_state.json"),
+    "BROADCAST_STATE": os.path.join(_TMP, "broadcast_state.json"),
+    "CSV_JOURNAL_FSYNC_WINDOW": "0",
+    "SHEETS_WRITE_WINDOW": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sheets_backend(monkeypatch):
+    """Lista sobre una FakeWorksheet: devuelve una función (filas, col_count) -> (hoja, cola)."""
+    from bot.services import lista
+    from bot.services.sheets_writer import SheetsWriteQueue
+    from fake_sheets import FakeWorksheet
+
+    queues = []
+
+    def build(rows, col_count=26):
+        ws = FakeWorksheet(rows, col_count=col_count)
+        queue = SheetsWriteQueue(3600)
+        queues.append(queue)
+        monkeypatch.setattr(lista, "STORAGE_BACKEND", "sheets")
+        monkeypatch.setattr(lista, "_open_sheet", lambda: ws)
+        monkeypatch.setattr(lista, "get_write_queue", lambda: queue)
+        lista.read_lista_any(fresh=True)
+        return ws, queue
+
+    yield build
+    for queue in queues:
+        if queue._timer is not None:
+            queue._timer.cancel()
+    lista.invalidate_lista_cache()
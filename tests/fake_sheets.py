@@ -0,0 +1,119 @@
+"""Hoja de Google Sheets en memoria con la parte de la API de gspread que usa el bot."""
+import threading
+
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range
+
+
+class _Response:
+    def __init__(self, code, message):
+        self.text = message
+        self._error = {"code": code, "message": message, "status": ""}
+
+    def json(self):
+        return {"error": self._error}
+
+
+def api_error(code, message):
+    return APIError(_Response(code, message))
+
+
+class FakeWorksheet:
+    title = "Lista"
+
+    def __init__(self, rows, fail_batches=0, col_count=26):
+        self.id = 1
+        self.grid = [list(r) for r in rows]
+        self.fail_batches = fail_batches
+        self.col_count = col_count
+        self.calls = []
+        # Si se setea, append_rows / batch_get ya hicieron lo suyo pero esperan este evento para volver
+        self.hold = None
+        self.holding = threading.Event()
+
+    def _wait(self):
+        if self.hold is not None:
+            self.holding.set()
+            self.hold.wait(5)
+
+    def _check_grid(self, rng, label):
+        if rng["endColumnIndex"] > self.col_count:
+            raise api_error(400, f"Range ({label}) exceeds grid limits. Max columns: {self.col_count}")
+
+    def _cell(self, r, c):
+        return self.grid[r][c] if r < len(self.grid) and c < len(self.grid[r]) else ""
+
+    def _put(self, r, c, value):
+        while len(self.grid) <= r:
+            self.grid.append([])
+        row = self.grid[r]
+        if len(row) <= c:
+            row.extend([""] * (c + 1 - len(row)))
+        row[c] = value
+
+    def _values(self, label):
+        rng = a1_range_to_grid_range(label)
+        r0, c0, c1 = rng["startRowIndex"], rng["startColumnIndex"], rng["endColumnIndex"]
+        r1 = rng.get("endRowIndex", len(self.grid))
+        rows = [[self._cell(r, c) for c in range(c0, c1)] for r in range(r0, r1)]
+        # Como la API: sin filas ni celdas vacías al final
+        rows = [row[:max([i + 1 for i, v in enumerate(row) if v] or [0])] for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    # --- lectura ---
+    def get_all_values(self):
+        return [list(r) for r in self.grid]
+
+    def _get(self, label, major_dimension):
+        rows = self._values(label)
+        if major_dimension == "COLUMNS":
+            width = max((len(r) for r in rows), default=0)
+            rows = [[r[c] if c < len(r) else "" for r in rows] for c in range(width)]
+        return rows
+
+    def get(self, label, major_dimension="ROWS"):
+        self.calls.append(("get", label))
+        return self._get(label, major_dimension)
+
+    def batch_get(self, labels, major_dimension="ROWS"):
+        self.calls.append(("batch_get", len(labels)))
+        out = [self._get(label, major_dimension) for label in labels]
+        self._wait()
+        return out
+
+    # --- escritura ---
+    def append_rows(self, rows):
+        self.calls.append(("append_rows", len(rows)))
+        self.grid.extend(list(r) for r in rows)
+        self._wait()
+
+    def batch_update(self, data):
+        if self.fail_batches:
+            self.fail_batches -= 1
+            raise ConnectionError("API caída")
+        for item in data:
+            # Un rango fuera de la grilla rechaza todo el lote
+            self._check_grid(a1_range_to_grid_range(item["range"]), item["range"])
+        self.calls.append(("batch_update", len(data)))
+        for item in data:
+            self._write(item["range"], item["values"])
+
+    def update(self, values, range_name):
+        self._check_grid(a1_range_to_grid_range(range_name), range_name)
+        self.calls.append(("update", range_name))
+        self._write(range_name, values)
+
+    def _write(self, label, values):
+        rng = a1_range_to_grid_range(label)
+        for dr, row in enumerate(values):
+            for dc, value in enumerate(row):
+                self._put(rng["startRowIndex"] + dr, rng["startColumnIndex"] + dc, value)
+
+    def add_cols(self, n):
+        self.calls.append(("add_cols", n))
+        self.col_count += n
+
+    def hide_columns(self, start, end):
+        pass
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from bot.handlers import jobs
+from bot.services import broadcast
+
+
+class _Bot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture
+def running(tmp_path, monkeypatch):
+    monkeypatch.setattr(broadcast, "BROADCAST_STATE", str(tmp_path / "broadcast_state.json"))
+    monkeypatch.setattr(broadcast, "_ACTIVE", {"state": None, "loaded": True})
+    monkeypatch.setattr(jobs, "BROADCAST_CONCURRENCY", 2)
+    monkeypatch.setattr(jobs, "BROADCAST_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(broadcast, "recipients", lambda audience: [11, 12, 13, 14])
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    async def names():
+        return {}
+
+    monkeypatch.setattr(jobs.asyncio, "sleep", sleep)
+    monkeypatch.setattr(jobs, "aget_allowed_map", names)
+    return broadcast.start_broadcast("Hola {nombre}", "todos", 99), sleeps
+
+
+def _fail_batches(monkeypatch, n):
+    record = broadcast.record_batch
+    left = [n]
+
+    def flaky(state, results):
+        if left[0]:
+            left[0] -= 1
+            raise OSError("disco lleno")
+        record(state, results)
+
+    monkeypatch.setattr(broadcast, "record_batch", flaky)
+
+
+def test_failed_batch_is_retried_with_backoff(running, monkeypatch):
+    state, sleeps = running
+    _fail_batches(monkeypatch, 2)
+    bot = _Bot()
+    asyncio.run(jobs.run_broadcast(bot))
+    assert state["status"] == "done"
+    assert sleeps == [jobs.BROADCAST_RETRY_SECONDS, 2 * jobs.BROADCAST_RETRY_SECONDS]
+    # La tanda que no se pudo registrar se reenvía
+    assert [uid for uid, _ in bot.sent].count(11) == 3
+    assert bot.sent[-1][0] == 99 and "terminada" in bot.sent[-1][1]
+
+
+def test_broadcast_is_marked_failed_after_the_last_attempt(running, monkeypatch):
+    state, sleeps = running
+    _fail_batches(monkeypatch, 3)
+    bot = _Bot()
+    asyncio.run(jobs.run_broadcast(bot))
+    assert state["status"] == "failed"
+    assert len(sleeps) == 2
+    assert bot.sent[-1][0] == 99 and "interrumpida" in bot.sent[-1][1]
+    # Ya no bloquea una difusión nueva, y el archivo guardó el 'failed'
+    broadcast._ACTIVE["loaded"] = False
+    assert broadcast.load_state()["status"] == "failed"
+    assert broadcast.start_broadcast("Otra", "todos", 99)["status"] == "running"
@@ -0,0 +1,68 @@
+import os
+
+from bot.config import CSV_HEADERS
+from bot.services.csv_journal import CsvJournal, _read_csv, read_csv_with_journal
+
+
+def _row(n, estado="Pendiente"):
+    return [f"Nombre{n}", "Apellido", f"11{n:08d}", str(n), estado, "", str(n)]
+
+
+def _journal(tmp_path):
+    journal = CsvJournal(str(tmp_path / "lista.csv"), window=0, compact_at=1000)
+    journal.rewrite([CSV_HEADERS] + [_row(n) for n in range(1, 4)])
+    return journal
+
+
+def test_replay_applies_estados_edits_and_appends(tmp_path):
+    journal = _journal(tmp_path)
+    journal.set_estado(0, "Aceptado", "llamar de nuevo")
+    journal.set_row(1, _row(2, "Rechazado"))
+    journal.set_row(3, _row(4))
+    journal.set_estado(2, "Aceptado")
+    rows = read_csv_with_journal(journal.path)
+    assert rows[0] == CSV_HEADERS
+    assert [r[4] for r in rows[1:]] == ["Aceptado", "Rechazado", "Aceptado", "Pendiente"]
+    assert rows[1][5] == "llamar de nuevo"
+    assert journal.read_rows() == rows[1:]
+    assert journal.records == 4
+
+
+def test_compaction_leaves_base_file_equal_to_replay(tmp_path):
+    journal = _journal(tmp_path)
+    journal.set_estado(0, "Aceptado")
+    journal.set_row(3, _row(4))
+    replayed = read_csv_with_journal(journal.path)
+
+    epoch = journal.begin_compaction()
+    # Una escritura durante la compactación va al journal nuevo
+    journal.set_estado(1, "Rechazado")
+    tmp = journal.write_snapshot(replayed)
+    assert journal.commit_compaction(tmp, epoch)
+
+    assert not os.path.exists(journal.compacting)
+    assert _read_csv(journal.path) == replayed
+    after = read_csv_with_journal(journal.path)
+    assert after[:2] == replayed[:2]
+    assert after[2][4] == "Rechazado"
+    assert after[3:] == replayed[3:]
+
+
+def test_interrupted_compaction_still_replays(tmp_path):
+    journal = _journal(tmp_path)
+    journal.set_estado(0, "Aceptado")
+    journal.begin_compaction()
+    # Se cae antes del commit: queda el .compacting y el CSV base viejo
+    journal.set_estado(2, "Rechazado")
+    rows = read_csv_with_journal(journal.path)
+    assert [r[4] for r in rows[1:]] == ["Aceptado", "Pendiente", "Rechazado"]
+
+
+def test_rewrite_during_compaction_discards_the_old_snapshot(tmp_path):
+    journal = _journal(tmp_path)
+    journal.set_estado(0, "Aceptado")
+    epoch = journal.begin_compaction()
+    tmp = journal.write_snapshot(read_csv_with_journal(journal.path))
+    journal.rewrite([CSV_HEADERS, _row(9)])
+    assert not journal.commit_compaction(tmp, epoch)
+    assert _read_csv(journal.path) == [CSV_HEADERS, _row(9)]
@@ -0,0 +1,47 @@
+import pytest
+
+from bot.services.estado import (
+    ACEPTADO, CONTACTAR_LUEGO, EN_CONTACTO, NUMERO_INCORRECTO, OTRO, PENDIENTE, RECHAZADO, VACIO,
+    owner_key_for, owner_of, parse_estado,
+)
+
+
+@pytest.mark.parametrize("raw, kind, owner_id, name, display", [
+    ("En contacto - 123456789 (Ana Pérez)", EN_CONTACTO, "123456789", "Ana Pérez", "En contacto - 123456789 (Ana Pérez)"),
+    ("en contacto - 123456789 (Ana)", EN_CONTACTO, "123456789", "Ana", "En contacto - 123456789 (Ana)"),
+    ("EN CONTACTO-123456789 (Ana)", EN_CONTACTO, "123456789", "Ana", "En contacto - 123456789 (Ana)"),
+    ("  En contacto – 123456789 (Ana)  ", EN_CONTACTO, "123456789", "Ana", "En contacto - 123456789 (Ana)"),
+    # Forma vieja '<id> - <nombre>': se muestra como '<id> (<nombre>)'
+    ("En contacto - 123456789 - Ana Pérez", EN_CONTACTO, "123456789", "Ana Pérez", "En contacto - 123456789 (Ana Pérez)"),
+    ("En contacto - (123456789 (Ana)", EN_CONTACTO, "123456789", "Ana", "En contacto - 123456789 (Ana)"),
+    ("En contacto - 123456789", EN_CONTACTO, "123456789", "", "En contacto - 123456789"),
+    ("En contacto Update(123456789)", EN_CONTACTO, "123456789", "", "En contacto - 123456789"),
+    ("En contacto - Juan", EN_CONTACTO, "", "", "En contacto - Juan"),
+    ("En contacto", EN_CONTACTO, "", "", "En contacto"),
+    # Sin el prefijo no es una reserva
+    ("123456789 - Ana", OTRO, "", "", "123456789 - Ana"),
+    ("Pendiente", PENDIENTE, "", "", "Pendiente"),
+    ("PENDIENTE ", PENDIENTE, "", "", "PENDIENTE"),
+    (" número  incorrecto", NUMERO_INCORRECTO, "", "", "número  incorrecto"),
+    ("Contactar luego (martes)", CONTACTAR_LUEGO, "", "", "Contactar luego (martes)"),
+    ("Aceptado", ACEPTADO, "", "", "Aceptado"),
+    ("rechazado", RECHAZADO, "", "", "rechazado"),
+    ("cualquier cosa", OTRO, "", "", "cualquier cosa"),
+    ("", VACIO, "", "", ""),
+    ("   ", VACIO, "", "", ""),
+    (None, VACIO, "", "", ""),
+])
+def test_parse_estado(raw, kind, owner_id, name, display):
+    info = parse_estado(raw)
+    assert (info.kind, info.owner_id, info.owner_name, info.display) == (kind, owner_id, name, display)
+
+
+def test_owner_is_matched_by_telegram_id_when_both_have_one():
+    info = parse_estado("En contacto - 123456789 - Ana Vieja")
+    assert info.owned_by("123456789 (Ana Nueva)")
+    assert not info.owned_by("987654321 (Ana Vieja)")
+    assert parse_estado("En contacto - Juan").owned_by("Juan")
+    assert not parse_estado("Pendiente").owned_by("Juan")
+    assert owner_key_for("123456789 (Ana)") == parse_estado("en contacto-123456789 - Ana").owner_key == "123456789"
+    assert owner_of("En contacto - 123456789 (Ana)") == "123456789 (Ana)"
+    assert owner_of("Aceptado") is None
@@ -0,0 +1,28 @@
+from bot.services import export_marks
+from bot.services.contact import Contact
+
+
+def _restart():
+    export_marks._STATE["data"] = None
+    export_marks._OBSERVED["version"] = None
+
+
+def test_delta_marks_survive_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_marks, "EXPORT_STATE", str(tmp_path / "export_state.json"))
+    _restart()
+    rows = [Contact("Ana", "A", "111", id="1"), Contact("Beto", "B", "222", id="2")]
+    export_marks.set_mark(7, "contacts", export_marks.current_mark(rows))
+    export_marks.set_mark(7, "vcard", export_marks.current_mark(rows))
+
+    _restart()
+    rows = [rows[0].with_estado("Aceptado"), rows[1], Contact("Caro", "C", "333", id="3")]
+    _, changed = export_marks.changed_since(rows, export_marks.get_mark(7, "contacts"))
+    assert [r.id for r in changed] == ["1", "3"]
+    # Un cambio sólo de Estado no cuenta para la vCard
+    _, changed = export_marks.changed_since(rows, export_marks.get_mark(7, "vcard"), card_only=True)
+    assert [r.id for r in changed] == ["3"]
+
+    export_marks.set_mark(7, "contacts", export_marks.current_mark(rows))
+    _restart()
+    assert export_marks.changed_since(rows, export_marks.get_mark(7, "contacts"))[1] == []
+    assert export_marks.get_mark(8, "contacts") is None
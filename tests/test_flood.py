@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+
+import pytest
+from telegram import Chat, Message, Update, User
+from telegram.ext import ApplicationHandlerStop
+
+from bot.utils import flood
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Snapshot:
+    def __init__(self, allowed):
+        self.allowed = allowed
+
+    def decide(self, uid):
+        return uid in self.allowed, False
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    clock = _Clock()
+    notices = []
+    monkeypatch.setattr(flood, "_clock", clock)
+    monkeypatch.setattr(flood, "FLOOD_BURST", 3)
+    monkeypatch.setattr(flood, "FLOOD_RATE", 1.0)
+    monkeypatch.setattr(flood, "FLOOD_DENY_COOLDOWN", 60)
+    monkeypatch.setattr(flood, "peek_auth_snapshot", lambda: _Snapshot({1}))
+    monkeypatch.setattr(flood, "_BUCKETS", {})
+    monkeypatch.setattr(flood, "_DENIED", {})
+
+    async def notice(kind, update):
+        notices.append((kind, update.effective_user.id))
+
+    monkeypatch.setattr(flood, "_deny", lambda update: notice("deny", update))
+    monkeypatch.setattr(flood, "_throttled", lambda update: notice("throttled", update))
+
+    def send(uid):
+        """True si el update llega a los handlers."""
+        user = User(uid, "Usuario", False)
+        update = Update(1, message=Message(1, datetime.datetime.now(), Chat(uid, "private"), from_user=user))
+        try:
+            asyncio.run(flood.flood_guard(update, None))
+        except ApplicationHandlerStop:
+            return False
+        return True
+
+    return send, clock, notices
+
+
+def test_burst_then_refill_at_the_sustained_rate(guard):
+    send, clock, notices = guard
+    assert [send(1) for _ in range(4)] == [True, True, True, False]
+    # Un solo aviso por ráfaga
+    assert not send(1)
+    assert notices == [("throttled", 1)]
+    clock.now += 1.0
+    # Pasar uno rearma el aviso para la ráfaga siguiente
+    assert [send(1), send(1)] == [True, False]
+    assert len(notices) == 2
+    clock.now += 10.0
+    # El bucket se llena hasta FLOOD_BURST, no más
+    assert [send(1) for _ in range(4)] == [True, True, True, False]
+
+
+def test_denied_user_is_answered_once_per_cooldown(guard):
+    send, clock, notices = guard
+    assert not send(2)
+    clock.now += 59.0
+    assert not send(2)
+    assert notices == [("deny", 2)]
+    clock.now += 1.0
+    assert not send(2)
+    assert notices == [("deny", 2), ("deny", 2)]
+    # El bucket de otro usuario no se ve afectado
+    assert send(1)
@@ -0,0 +1,57 @@
+import pytest
+
+from bot.config import CSV_DEFAULT, CSV_HEADERS
+from bot.services import importer
+from bot.services.csv_journal import get_journal
+from bot.services.importer import import_contacts, parse_rows
+from bot.services.lista import invalidate_lista_cache, read_lista_any
+
+
+@pytest.fixture
+def lista():
+    rows = [["Ana", "A", "1100000001", "", "Aceptado", "llamada", "1"], ["Beto", "B", "1100000002", "222", "Pendiente", "", "2"]]
+    get_journal(CSV_DEFAULT).rewrite([CSV_HEADERS] + rows)
+    invalidate_lista_cache()
+    read_lista_any(fresh=True)
+    yield
+    invalidate_lista_cache()
+
+
+@pytest.mark.parametrize("sep", [",", ";", "\t"])
+def test_delimiter_is_detected(sep):
+    data = sep.join(["Nombre", "Apellido", "Teléfono", "DNI"]) + "\n" + sep.join(["Caro", "C", "11 0000-0003", "333"]) + "\n"
+    (line, contact, reason), = parse_rows(data.encode("utf-8"), "contactos.csv")
+    assert (line, reason) == (2, "")
+    assert (contact.nombre, contact.apellido, contact.telefono, contact.dni) == ("Caro", "C", "1100000003", "333")
+
+
+def test_header_without_phone_or_dni_is_refused():
+    with pytest.raises(ValueError):
+        list(parse_rows(b"Nombre;Apellido\nAna;A\n", "contactos.csv"))
+
+
+def test_chunked_import_counts(lista, monkeypatch):
+    # Tandas de 2 filas: la repetida y la existente caen en tandas distintas a su alta
+    monkeypatch.setattr(importer, "_CHUNK_ROWS", 2)
+    data = "\n".join([
+        "Nombre;Apellido;Celular;Documento",
+        "Ana;A;1100000001;",           # igual a la de la lista
+        "Beto;Bis;1100000002;222",     # cambia el apellido
+        "Caro;C;1100000003;",
+        "Sin;Datos;;",
+        ";;;",                         # vacía: no cuenta
+        "Dani;D;11abc;",
+        "Eli;E;;555",
+        "Caro;Cambiada;1100000003;",   # repite una alta de la tanda anterior
+    ]).encode("latin-1")
+    result = import_contacts(data, "contactos.csv")
+    assert result["rejected"] == 2
+    assert result["errors"] == ["línea 5: sin teléfono ni DNI", "línea 7: teléfono inválido (11abc)"]
+    # Los conteos no dependen del tamaño de tanda: la repetición de Caro sigue siendo una alta
+    assert {k: result[k] for k in ("new", "updated", "unchanged")} == {"new": 2, "updated": 1, "unchanged": 1}
+    rows = {r.telefono or r.dni: r for r in read_lista_any(fresh=True)}
+    assert len(rows) == 4
+    assert (rows["1100000001"].estado, rows["1100000001"].observacion) == ("Aceptado", "llamada")
+    assert rows["1100000002"].apellido == "Bis"
+    assert (rows["1100000003"].apellido, rows["1100000003"].estado) == ("Cambiada", "Pendiente")
+    assert rows["555"].estado == "Pendiente"
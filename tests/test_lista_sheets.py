@@ -0,0 +1,48 @@
+from bot.config import CSV_HEADERS
+from bot.services.lista import _refresh_estados, get_contact_store, update_estado_by_id
+
+OLD_HEADERS = CSV_HEADERS[:6]
+
+
+def _old_rows(n):
+    return [[f"Nombre{i}", "Apellido", f"11{i:08d}", str(i), "Pendiente", ""] for i in range(1, n + 1)]
+
+
+def test_missing_ids_grow_the_grid_and_go_in_one_update(sheets_backend):
+    ws, queue = sheets_backend([OLD_HEADERS] + _old_rows(4), col_count=6)
+    store = get_contact_store()
+    assert ws.col_count == 7
+    assert [c for c in ws.calls if c[0] in ("add_cols", "update", "batch_update")] == [("add_cols", 1), ("update", "G1:G5")]
+    assert [r[6] for r in ws.get_all_values()] == ["ID"] + [r.id for r in store.rows()]
+    assert all(r.id for r in store.rows())
+    assert not queue.has_pending(ws)
+
+    # Las escrituras de Estado siguientes no quedan trabadas detrás del encabezado
+    update_estado_by_id(store.row(1).id, "Aceptado")
+    queue.flush()
+    assert ws.get_all_values()[2][4] == "Aceptado"
+
+
+def _rows(n):
+    return [[f"Nombre{i}", "Apellido", f"11{i:08d}", str(i), "Pendiente", "", str(i)] for i in range(1, n + 1)]
+
+
+def test_estado_write_does_not_read_the_sheet(sheets_backend):
+    ws, queue = sheets_backend([CSV_HEADERS] + _rows(3))
+    ws.calls.clear()
+    update_estado_by_id("2", "Aceptado")
+    assert ws.calls == []
+    assert queue.pending_cells(ws)[(3, 5)] == "Aceptado"
+
+
+def test_estado_refresh_reloads_when_the_sheet_was_reordered(sheets_backend):
+    ws, queue = sheets_backend([CSV_HEADERS] + _rows(3))
+    ws.grid[1], ws.grid[3] = ws.grid[3], ws.grid[1]
+    ws.grid[2][4] = "Rechazado"
+    _refresh_estados()
+    store = get_contact_store()
+    assert [r.id for r in store.rows()] == ["3", "2", "1"]
+    assert store.row(store.position_of("2")).estado == "Rechazado"
+    update_estado_by_id("1", "Aceptado")
+    queue.flush()
+    assert ws.get_all_values()[3][4] == "Aceptado"
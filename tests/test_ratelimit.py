@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from bot.utils import ratelimit
+from bot.utils.ratelimit import OutboundRateLimiter
+
+
+class _Clock:
+    """Reloj falso: sleep() adelanta el tiempo en vez de esperar."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, "OUTBOUND_MAX_RETRIES", 2)
+    clock = _Clock()
+    return OutboundRateLimiter(clock=clock, sleep=clock.sleep), clock
+
+
+def _send_times(limiter, clock, chat_id, n, callback=None):
+    sent = []
+
+    async def ok():
+        sent.append(round(clock.now - 1000.0, 6))
+        return True
+
+    async def run():
+        for _ in range(n):
+            await limiter.process_request(callback or ok, (), {}, "sendMessage", {"chat_id": chat_id}, None)
+
+    asyncio.run(run())
+    return sent
+
+
+def test_private_chat_burst_then_chat_rate(limiter):
+    limiter, clock = limiter
+    # Ráfaga de OUTBOUND_CHAT_BURST (3) y después OUTBOUND_CHAT_RATE (1 por segundo)
+    assert _send_times(limiter, clock, 42, 5) == [0, 0, 0, 1, 2]
+
+
+def test_group_chat_uses_the_per_minute_rate(limiter):
+    limiter, clock = limiter
+    # 20 por minuto: una cada 3 s pasada la ráfaga
+    assert _send_times(limiter, clock, -100, 5) == [0, 0, 0, 3, 6]
+
+
+def test_unlimited_endpoints_skip_the_buckets(limiter):
+    limiter, clock = limiter
+
+    async def run():
+        for _ in range(10):
+            await limiter.process_request(lambda: asyncio.sleep(0, True), (), {}, "answerCallbackQuery", {"chat_id": 42}, None)
+
+    asyncio.run(run())
+    assert clock.sleeps == []
+
+
+def test_retry_after_pauses_the_chat_and_retries(limiter):
+    limiter, clock = limiter
+    calls = []
+    before = ratelimit.outbound_stats()["retry_after"]
+
+    async def flaky():
+        calls.append(clock.now - 1000.0)
+        if len(calls) == 1:
+            raise RetryAfter(5)
+        return True
+
+    _send_times(limiter, clock, 42, 1, flaky)
+    assert calls == [0, pytest.approx(5.1)]
+    assert ratelimit.outbound_stats()["retry_after"] == before + 1
+    # La pausa es solo de ese chat
+    assert _send_times(limiter, clock, 43, 1) == [pytest.approx(5.1)]
+
+
+def test_retry_after_gives_up_after_max_retries(limiter):
+    limiter, clock = limiter
+    calls = []
+
+    async def always_busy():
+        calls.append(clock.now)
+        raise RetryAfter(1)
+
+    with pytest.raises(RetryAfter):
+        _send_times(limiter, clock, 42, 1, always_busy)
+    assert len(calls) == 3
@@ -0,0 +1,67 @@
+import threading
+
+from bot.config import CSV_DEFAULT, CSV_HEADERS
+from bot.services.csv_journal import get_journal
+from bot.services.lista import invalidate_lista_cache, read_lista_any
+from bot.services.reservations import claim_pending, owner_estado
+
+
+def _reset_lista(n):
+    rows = [[f"Nombre{i}", "Apellido", f"11{i:08d}", str(i), "Pendiente", "", str(i)] for i in range(1, n + 1)]
+    get_journal(CSV_DEFAULT).rewrite([CSV_HEADERS] + rows)
+    invalidate_lista_cache()
+    read_lista_any(fresh=True)
+
+
+def test_claim_pending_hands_out_each_row_once_across_threads():
+    _reset_lista(100)
+    owners = [f"{100 + t} (Voluntario {t})" for t in range(12)]
+    claimed = {}
+    start = threading.Barrier(len(owners))
+
+    def worker(owner):
+        start.wait()
+        claimed[owner] = [row.id for _, row in claim_pending(owner, 5)]
+
+    threads = [threading.Thread(target=worker, args=(o,)) for o in owners]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    ids = [i for got in claimed.values() for i in got]
+    assert len(ids) == len(set(ids))
+    # Lo que quedó escrito coincide con lo que cada uno cree haber ganado, y nada más
+    expected = {i: owner_estado(owner) for owner, got in claimed.items() for i in got}
+    for row in read_lista_any(fresh=True):
+        assert row.estado == expected.get(row.id, "Pendiente")
+    assert all(claimed.get(o) for o in owners)
+
+
+def test_claim_pending_stops_when_nothing_is_left():
+    _reset_lista(3)
+    assert len(claim_pending("1 (Ana)", 5)) == 3
+    assert claim_pending("2 (Beto)", 5) == []
+
+
+def test_sheets_compare_and_set_ignores_a_read_crossed_by_a_flush(sheets_backend):
+    from bot.services.lista import compare_and_set_estado, get_contact_store, update_estado_by_id
+
+    taken = owner_estado("7 (Ana)")
+    ws, queue = sheets_backend([CSV_HEADERS, ["Ana", "A", "111", "1", taken, "", "1"]])
+    store = get_contact_store()
+    # Ana suelta la fila: la escritura queda en la cola, todavía no en la hoja
+    update_estado_by_id("1", "Pendiente")
+    ws.hold = threading.Event()
+    result = []
+    claimer = threading.Thread(target=lambda: result.append(compare_and_set_estado({0: "Pendiente"}, owner_estado("8 (Beto)"))))
+    claimer.start()
+    # La lectura ya trajo el Estado viejo de la hoja; el flush termina antes de que se mire la cola
+    assert ws.holding.wait(5)
+    queue.flush()
+    ws.hold.set()
+    claimer.join(5)
+    assert result == [[0]]
+    assert store.row(0).estado == owner_estado("8 (Beto)")
+    queue.flush()
+    assert ws.get_all_values()[1][4] == owner_estado("8 (Beto)")
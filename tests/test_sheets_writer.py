@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+from gspread.exceptions import APIError
+
+from bot.services import sheets_writer
+from bot.services.sheets_writer import SheetsWriteQueue, _cells_to_ranges
+from fake_sheets import FakeWorksheet, api_error
+
+WIDTH = 3
+
+
+def _sheet():
+    return FakeWorksheet([["Nombre", "Apellido", "Estado"], ["Ana", "A", "Pendiente"], ["Beto", "B", "Pendiente"]])
+
+
+def _read(queue, ws):
+    return queue.read_consistent(ws.get_all_values, lambda vals: queue.overlay(ws, vals[1:], WIDTH))
+
+
+def test_overlay_shows_pending_writes_before_flush():
+    queue, ws = SheetsWriteQueue(3600), _sheet()
+    queue.set_cell(ws, 3, 3, "Aceptado")
+    queue.append_row(ws, ["Caro", "C", "Pendiente"])
+    assert ws.calls == []
+    assert _read(queue, ws) == [["Ana", "A", "Pendiente"], ["Beto", "B", "Aceptado"], ["Caro", "C", "Pendiente"]]
+    queue._timer.cancel()
+
+
+def test_flush_sends_one_append_and_one_batch_update():
+    queue, ws = SheetsWriteQueue(3600), _sheet()
+    queue.set_cell(ws, 2, 3, "Rechazado")
+    queue.set_row(ws, 3, ["Beto", "Bis", "Aceptado"])
+    queue.append_rows(ws, [["Caro", "C", "Pendiente"], ["Dani", "D", "Pendiente"]])
+    queue._timer.cancel()
+    expected = _read(queue, ws)
+    queue.flush()
+    assert ws.calls == [("append_rows", 2), ("batch_update", 2)]
+    assert not queue.has_pending(ws)
+    # Ya confirmado: la hoja sola da lo mismo que antes daba el overlay, sin altas duplicadas
+    assert ws.get_all_values()[1:] == expected
+    assert _read(queue, ws) == expected
+
+
+def test_failed_flush_keeps_writes_for_the_retry():
+    queue, ws = SheetsWriteQueue(3600), FakeWorksheet(_sheet().grid, fail_batches=1)
+    queue.set_cell(ws, 2, 3, "Aceptado")
+    queue._timer.cancel()
+    try:
+        queue.flush()
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("el flush debía fallar")
+    assert queue.has_pending(ws)
+    assert _read(queue, ws)[0] == ["Ana", "A", "Aceptado"]
+    queue.set_cell(ws, 3, 3, "Rechazado")
+    queue._timer.cancel()
+    queue.flush()
+    assert [r[2] for r in ws.get_all_values()[1:]] == ["Aceptado", "Rechazado"]
+
+
+def test_permanent_error_drops_only_the_rejected_range():
+    queue, ws = SheetsWriteQueue(3600), FakeWorksheet(_sheet().grid, col_count=WIDTH)
+    queue.set_cell(ws, 1, 7, "ID")
+    queue.set_cell(ws, 2, 3, "En contacto - 7 (Ana)")
+    queue._timer.cancel()
+    queue.flush()
+    assert not queue.has_pending(ws)
+    assert ws.get_all_values()[1] == ["Ana", "A", "En contacto - 7 (Ana)"]
+    # La siguiente escritura ya no arrastra el rango rechazado
+    queue.set_cell(ws, 3, 3, "Aceptado")
+    queue.flush()
+    assert ws.calls[-1] == ("batch_update", 1)
+
+
+def test_transient_api_error_keeps_everything_queued():
+    queue, ws = SheetsWriteQueue(3600), _sheet()
+    queue.set_cell(ws, 2, 3, "Aceptado")
+    queue._timer.cancel()
+
+    def busy(data):
+        raise api_error(429, "Quota exceeded")
+
+    ws.batch_update = busy
+    with pytest.raises(APIError):
+        queue.flush()
+    assert queue.pending_cells(ws) == {(2, 3): "Aceptado"}
+
+
+def test_flush_uses_fresh_handles_after_a_session_rebuild(monkeypatch):
+    queue, stale = SheetsWriteQueue(3600), _sheet()
+    fresh = FakeWorksheet(stale.grid)
+    queue.set_cell(stale, 2, 3, "Aceptado")
+    queue._timer.cancel()
+    monkeypatch.setattr(sheets_writer, "session_epoch", lambda: queue._epoch + 1)
+    monkeypatch.setattr(sheets_writer, "rebind_worksheet", lambda ws: fresh)
+    queue.flush()
+    assert stale.calls == []
+    assert fresh.get_all_values()[1][2] == "Aceptado"
+
+
+def test_read_during_inflight_flush_sees_each_row_once():
+    queue, ws = SheetsWriteQueue(3600), _sheet()
+    queue.append_row(ws, ["Caro", "C", "Pendiente"])
+    queue._timer.cancel()
+    ws.hold = threading.Event()
+    flusher = threading.Thread(target=queue.flush)
+    flusher.start()
+    assert ws.holding.wait(5)
+    reader_result = []
+    reader = threading.Thread(target=lambda: reader_result.append(_read(queue, ws)))
+    reader.start()
+    reader.join(0.2)
+    ws.hold.set()
+    flusher.join(5)
+    reader.join(5)
+    assert [r[0] for r in reader_result[0]] == ["Ana", "Beto", "Caro"]
+
+
+def test_cells_to_ranges_groups_contiguous_cells_per_row():
+    cells = {(2, 1): "a", (2, 2): "b", (2, 3): "c", (2, 5): "e", (4, 2): "x", (3, 7): "g"}
+    assert _cells_to_ranges(cells) == [
+        {"range": "A2:C2", "values": [["a", "b", "c"]]},
+        {"range": "E2", "values": [["e"]]},
+        {"range": "G3", "values": [["g"]]},
+        {"range": "B4", "values": [["x"]]},
+    ]
+
+
+def test_cells_to_ranges_empty():
+    assert _cells_to_ranges({}) == []
@@ -0,0 +1,32 @@
+from bot.config import CSV_DEFAULT, CSV_HEADERS
+from bot.services.csv_journal import get_journal
+from bot.services.lista import invalidate_lista_cache, read_lista_any
+from bot.services.snapshots import close_view, open_view, view_rows
+
+
+def _row(n):
+    return [f"Nombre{n}", "Apellido", f"11{n:08d}", str(n), "Pendiente", "", str(n)]
+
+
+def _write_lista(rows):
+    get_journal(CSV_DEFAULT).rewrite([CSV_HEADERS] + rows)
+    invalidate_lista_cache()
+
+
+def test_view_by_ids_resolves_positions_after_the_reload():
+    _write_lista([_row(n) for n in range(1, 6)])
+    read_lista_any(fresh=True)
+    user_data = {}
+    # La hoja cambia por fuera (una fila nueva arriba) y la copia en memoria venció
+    _write_lista([_row(9)] + [_row(n) for n in range(1, 6)])
+    rows = open_view(user_data, "edit_view", ids=["2", "4"])
+    assert [r.id for r in rows] == ["2", "4"]
+    assert [r.id for r in view_rows(user_data, "edit_view")] == ["2", "4"]
+    close_view(user_data, "edit_view")
+
+
+def test_view_by_ids_skips_ids_that_no_longer_exist():
+    _write_lista([_row(n) for n in range(1, 4)])
+    user_data = {}
+    assert [r.id for r in open_view(user_data, "edit_view", ids=["3", "7", "1"])] == ["3", "1"]
+    close_view(user_data, "edit_view")
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from bot.services import lista, sqlite_backend
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_backend, "SQLITE_PATH", str(tmp_path / "lista.db"))
+    # Sin CSV al lado: la tabla vacía no se importa sola
+    monkeypatch.setattr(sqlite_backend, "CSV_DEFAULT", str(tmp_path / "no-existe.csv"))
+    monkeypatch.setattr(sqlite_backend, "_local", threading.local())
+    monkeypatch.setattr(sqlite_backend, "_initialized", False)
+    yield sqlite_backend
+    conn = getattr(sqlite_backend._local, "conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def _row(n, estado="Pendiente", row_id=""):
+    return ["Nombre%d" % n, "Apellido", "11%08d" % n, str(n), estado, "", row_id]
+
+
+def test_replace_all_keeps_ids_and_renumbers_missing_or_repeated(db):
+    ids = db.replace_all([_row(1, row_id="5"), _row(2, row_id="9"), _row(3), _row(4, row_id="5"), _row(5, row_id="x")])
+    assert ids[:2] == [5, 9]
+    assert len(set(ids)) == 5
+    assert [r[-1] for r in db.read_rows()] == [str(i) for i in sorted(ids)]
+    # Reemplazar de nuevo con las filas leídas no cambia ningún ID
+    assert db.replace_all(db.read_rows()) == sorted(ids)
+
+
+def test_insert_rows_assigns_ids_in_one_transaction(db):
+    first = db.insert_row(_row(1))
+    ids = db.insert_rows([_row(2), _row(3, row_id=str(first)), _row(4, row_id="40")])
+    assert ids[0] > first and ids[1] > first and ids[1] != ids[0]
+    assert ids[2] == 40
+    assert [r[0] for r in db.read_rows()] == ["Nombre1", "Nombre2", "Nombre3", "Nombre4"]
+
+
+def test_compare_and_set_estado_only_when_expected(db):
+    row_id = db.insert_row(_row(1))
+    assert db.compare_and_set_estado(row_id, "Pendiente", "En contacto - 7 (Ana)", "")
+    assert not db.compare_and_set_estado(row_id, "Pendiente", "En contacto - 8 (Beto)", "")
+    assert db.get_estado(row_id) == "En contacto - 7 (Ana)"
+    # Observación None deja la que estaba
+    db.set_estado(row_id, "En contacto - 7 (Ana)", "llamar a la tarde")
+    assert db.compare_and_set_estado(row_id, "En contacto - 7 (Ana)", "Aceptado", None)
+    assert db.read_rows()[0][4:6] == ["Aceptado", "llamar a la tarde"]
+    assert db.get_estado(row_id + 100) is None
+
+
+def test_lost_compare_and_set_refreshes_the_store(db, monkeypatch):
+    monkeypatch.setattr(lista, "STORAGE_BACKEND", "sqlite")
+    db.replace_all([_row(1), _row(2)])
+    lista.read_lista_any(fresh=True)
+    store = lista.get_contact_store()
+    # Otro proceso reservó la fila 0 por fuera de este store
+    db.set_estado(int(store.row(0).id), "En contacto - 9 (Caro)", "")
+    won = lista.compare_and_set_estado({0: "Pendiente", 1: "Pendiente"}, "En contacto - 7 (Ana)")
+    assert won == [1]
+    assert store.row(0).estado == "En contacto - 9 (Caro)"
+    assert [r[4] for r in db.read_rows()] == ["En contacto - 9 (Caro)", "En contacto - 7 (Ana)"]
+    lista.invalidate_lista_cache()
+